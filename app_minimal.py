@@ -2,17 +2,27 @@ from flask import Flask, render_template, request, redirect, url_for, flash, ses
 import pandas as pd
 import os
 import random
+import uuid
 from datetime import datetime
 import json
 
+from cooccurrence import CoOccurrence
+from event_log import EventLog
+from memory_store import MemoryStore
+
 app = Flask(__name__, template_folder='E-Commerece-Recommendation-System-Machine-Learning-Product-Recommendation-system-/templates')
-# In-memory storage for demo
-users = {}
-cart_items = {}
-orders = {}
-wishlist = {}
+# In-memory storage for demo; accounts, carts, wishlists and orders are safe under threaded servers
 reviews = {}
-order_counter = 1000
+store = MemoryStore(snapshot_path=os.environ.get('STORE_SNAPSHOT_PATH'))
+
+# Live "customers also viewed/bought" models, fed by the routes below
+also_viewed = CoOccurrence()
+also_bought = CoOccurrence(half_life=24 * 3600)
+VIEWED_WEIGHTS = {'view': 1.0, 'wishlist': 2.0, 'cart': 3.0}
+BOUGHT_WEIGHTS = {'cart': 1.0, 'order': 3.0}
+
+# Interaction events for offline training; disabled unless EVENT_LOG_DIR is set
+event_log = EventLog(directory=os.environ.get('EVENT_LOG_DIR'))
 
 # Sample products with prices
 sample_products = [
@@ -22,6 +32,7 @@ sample_products = [
     {'id': 4, 'name': 'Coffee Maker', 'price': 89.99, 'category': 'Home', 'stock': 15},
     {'id': 5, 'name': 'Laptop Bag', 'price': 49.99, 'category': 'Accessories', 'stock': 40}
 ]
+products_by_id = {p['id']: p for p in sample_products}
 
 app.secret_key = 'your-secret-key-here'
 
@@ -52,11 +63,29 @@ def get_recommendations(product_name, top_n=10):
         print(f"Recommendation error: {e}")
         return train_data.head(top_n)
 
+def session_key():
+    """Stable id for the browsing session, for anonymous visitors too"""
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+def track(product_id, kind, weight=1.0):
+    """Feed an interaction to the live models and the event log"""
+    sid = session_key()
+    if kind in VIEWED_WEIGHTS:
+        also_viewed.add(sid, product_id, weight=VIEWED_WEIGHTS[kind])
+    if kind in BOUGHT_WEIGHTS:
+        also_bought.add(sid, product_id, weight=BOUGHT_WEIGHTS[kind])
+    event_log.log(session.get('user_id') or sid, product_id, kind, weight)
+
+def related_products(model, product_id, top_n=4):
+    return [products_by_id[i] for i, _ in model.related(product_id, top_n) if i in products_by_id]
+
 @app.context_processor
 def inject_user():
     user_id = session.get('user_id')
-    cart_count = len(cart_items.get(user_id, [])) if user_id else 0
-    return {'logged_in': bool(user_id), 'cart_count': cart_count, 'current_user': users.get(user_id)}
+    cart_count = store.cart_count(user_id) if user_id else 0
+    return {'logged_in': bool(user_id), 'cart_count': cart_count, 'current_user': store.user(user_id)}
 
 @app.route('/')
 def index():
@@ -94,8 +123,8 @@ def profile():
     if 'user_id' not in session:
         return redirect(url_for('index'))
     
-    user = users.get(session['user_id'])
-    user_orders = orders.get(session['user_id'], [])
+    user = store.user(session['user_id'])
+    user_orders = store.orders(session['user_id'])
     return render_template('profile.html', user=user, orders=user_orders)
 
 @app.route('/cart')
@@ -103,7 +132,7 @@ def cart():
     if 'user_id' not in session:
         return redirect(url_for('index'))
     
-    user_cart = cart_items.get(session['user_id'], [])
+    user_cart = store.cart(session['user_id'])
     total = sum(item['price'] * item['quantity'] for item in user_cart)
     return render_template('cart.html', cart_items=user_cart, total=total)
 
@@ -114,21 +143,13 @@ def add_to_cart(product_id):
         flash('Please login first!', 'warning')
         return redirect(url_for('index'))
     
-    product = next((p for p in sample_products if p['id'] == product_id), None)
+    product = products_by_id.get(product_id)
     if not product:
         flash('Product not found!', 'error')
         return redirect(url_for('products'))
     
-    user_id = session['user_id']
-    if user_id not in cart_items:
-        cart_items[user_id] = []
-    
-    # Check if item already in cart
-    existing = next((item for item in cart_items[user_id] if item['id'] == product_id), None)
-    if existing:
-        existing['quantity'] += 1
-    else:
-        cart_items[user_id].append({**product, 'quantity': 1})
+    store.add_to_cart(session['user_id'], product)
+    track(product_id, 'cart')
     
     flash('Added to cart!', 'success')
     return redirect(request.referrer or url_for('products'))
@@ -136,9 +157,7 @@ def add_to_cart(product_id):
 @app.route('/remove_from_cart/<int:product_id>')
 def remove_from_cart(product_id):
     if 'user_id' in session:
-        user_id = session['user_id']
-        if user_id in cart_items:
-            cart_items[user_id] = [item for item in cart_items[user_id] if item['id'] != product_id]
+        store.remove_from_cart(session['user_id'], product_id)
         flash('Removed from cart!', 'info')
     return redirect(url_for('cart'))
 
@@ -147,7 +166,7 @@ def checkout():
     if 'user_id' not in session:
         return redirect(url_for('index'))
     
-    user_cart = cart_items.get(session['user_id'], [])
+    user_cart = store.cart(session['user_id'])
     if not user_cart:
         flash('Cart is empty!', 'warning')
         return redirect(url_for('cart'))
@@ -160,31 +179,14 @@ def place_order():
     if 'user_id' not in session:
         return redirect(url_for('index'))
     
-    global order_counter
-    user_id = session['user_id']
-    user_cart = cart_items.get(user_id, [])
-    
-    if not user_cart:
+    # Takes the cart, empties it and allocates the order id in one step
+    order = store.place_order(session['user_id'])
+    if order is None:
         flash('Cart is empty!', 'warning')
         return redirect(url_for('cart'))
     
-    total = sum(item['price'] * item['quantity'] for item in user_cart)
-    
-    order = {
-        'id': order_counter,
-        'items': user_cart.copy(),
-        'total': total,
-        'date': datetime.now().strftime('%Y-%m-%d %H:%M'),
-        'status': 'Processing'
-    }
-    
-    if user_id not in orders:
-        orders[user_id] = []
-    orders[user_id].append(order)
-    
-    # Clear cart
-    cart_items[user_id] = []
-    order_counter += 1
+    for item in order['items']:
+        track(item['id'], 'order', item['quantity'])
     
     flash('Order placed successfully!', 'success')
     return redirect(url_for('order_success', order_id=order['id']))
@@ -194,8 +196,7 @@ def order_success(order_id):
     if 'user_id' not in session:
         return redirect(url_for('index'))
     
-    user_orders = orders.get(session['user_id'], [])
-    order = next((o for o in user_orders if o['id'] == order_id), None)
+    order = store.order(session['user_id'], order_id)
     
     return render_template('order_success.html', order=order)
 
@@ -204,7 +205,7 @@ def view_wishlist():
     if 'user_id' not in session:
         return redirect(url_for('index'))
     
-    user_wishlist = wishlist.get(session['user_id'], [])
+    user_wishlist = store.wishlist(session['user_id'])
     return render_template('wishlist.html', wishlist=user_wishlist)
 
 @app.route('/add_to_wishlist/<int:product_id>')
@@ -213,14 +214,10 @@ def add_to_wishlist(product_id):
         flash('Please login first!', 'warning')
         return redirect(url_for('index'))
     
-    product = next((p for p in sample_products if p['id'] == product_id), None)
+    product = products_by_id.get(product_id)
     if product:
-        user_id = session['user_id']
-        if user_id not in wishlist:
-            wishlist[user_id] = []
-        
-        if not any(item['id'] == product_id for item in wishlist[user_id]):
-            wishlist[user_id].append(product)
+        if store.add_to_wishlist(session['user_id'], product):
+            track(product_id, 'wishlist')
             flash('Added to wishlist!', 'success')
         else:
             flash('Already in wishlist!', 'info')
@@ -229,12 +226,15 @@ def add_to_wishlist(product_id):
 
 @app.route('/product/<int:product_id>')
 def product_detail(product_id):
-    product = next((p for p in sample_products if p['id'] == product_id), None)
+    product = products_by_id.get(product_id)
     if not product:
         return redirect(url_for('products'))
     
+    track(product_id, 'view')
     product_reviews = reviews.get(product_id, [])
-    return render_template('product_detail.html', product=product, reviews=product_reviews)
+    return render_template('product_detail.html', product=product, reviews=product_reviews,
+                           also_viewed=related_products(also_viewed, product_id),
+                           also_bought=related_products(also_bought, product_id))
 
 @app.route('/add_review/<int:product_id>', methods=['POST'])
 def add_review(product_id):
@@ -244,7 +244,7 @@ def add_review(product_id):
     
     rating = int(request.form.get('rating', 5))
     comment = request.form.get('comment', '')
-    user = users.get(session['user_id'])
+    user = store.user(session['user_id'])
     
     if product_id not in reviews:
         reviews[product_id] = []
@@ -255,6 +255,7 @@ def add_review(product_id):
         'comment': comment,
         'date': datetime.now().strftime('%Y-%m-%d')
     })
+    track(product_id, 'review', rating)
     
     flash('Review added!', 'success')
     return redirect(url_for('product_detail', product_id=product_id))
@@ -264,6 +265,12 @@ def add_review(product_id):
 def api_products():
     return jsonify(sample_products)
 
+@app.route('/api/products/<int:product_id>/also')
+def api_also(product_id):
+    top_n = request.args.get('top_n', 4, type=int)
+    return jsonify({'viewed': related_products(also_viewed, product_id, top_n),
+                    'bought': related_products(also_bought, product_id, top_n)})
+
 @app.route('/api/search')
 def api_search():
     query = request.args.get('q', '')
@@ -277,11 +284,9 @@ def signup():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        if username in users:
+        if store.add_user(username, email=email, password=password) is None:
             flash('Username already exists!', 'error')
         else:
-            user_id = len(users) + 1
-            users[user_id] = {'username': username, 'email': email, 'password': password}
             flash('Registration successful!', 'success')
     return redirect(url_for('index'))
 
@@ -291,7 +296,9 @@ def signin():
         username = request.form.get('signinUsername')
         password = request.form.get('signinPassword')
         
-        user = next((uid for uid, u in users.items() if u['username'] == username and u['password'] == password), None)
+        user = store.user_id(username)
+        if user and store.user(user)['password'] != password:
+            user = None
         
         if user:
             session['user_id'] = user
@@ -1,5 +1,6 @@
 import os
 import logging
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 import secrets
@@ -7,15 +8,27 @@ import hashlib
 import json
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from flask import Flask, request, render_template, session, redirect, url_for, flash, jsonify, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_caching import Cache
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from cache_layer import TieredCache, auth_variant
+from recommender import make_recommender, normalize_query
+from scoring_pool import ScoringPool, PoolSaturated, DeadlineExceeded
+from task_queue import make_celery, coalesce, release
+from http_cache import HttpCache
+import db_routing
+from db_routing import read_only
+import shm_ratelimit  # registers the shm:// limiter storage
+from auth_hashing import PasswordHasher, HashingOverloaded
+from event_log import EventLog
+from item_filters import ItemFilter
+from autocomplete import Autocomplete
+from fuzzy_resolver import FuzzyResolver
+from cart_buffer import CartBuffer
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Initialize Flask app
@@ -26,8 +39,37 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///ecommerce.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    CACHE_TYPE = 'simple'
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+    # shm:// shares counters between the workers on this host; use redis:// to share across hosts
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'shm://')
+    RATELIMIT_STRATEGY = 'fixed-window'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 16))
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    CACHE_REDIS_URL = os.environ.get('REDIS_URL')
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_LOCAL_MAXSIZE = int(os.environ.get('CACHE_LOCAL_MAXSIZE', 1024))
+    CACHE_LOCAL_TIMEOUT = int(os.environ.get('CACHE_LOCAL_TIMEOUT', 5))
+    # 'tfidf' (sparse) or 'lsa' (dense, memory-mapped embeddings)
+    RECOMMENDER_BACKEND = os.environ.get('RECOMMENDER_BACKEND', 'tfidf')
+    LSA_COMPONENTS = int(os.environ.get('LSA_COMPONENTS', 128))
+    LSA_EMBEDDINGS_PATH = os.environ.get('LSA_EMBEDDINGS_PATH', 'models/lsa_embeddings.npy')
+    LSA_QUANTIZE = os.environ.get('LSA_QUANTIZE', 'false').lower() == 'true'
+    # 'sharded' backend: 'category' or 'hash' shards; a query searches FANOUT related category shards
+    RECOMMENDER_SHARD_BY = os.environ.get('RECOMMENDER_SHARD_BY', 'category')
+    RECOMMENDER_SHARDS = int(os.environ.get('RECOMMENDER_SHARDS', 8))
+    RECOMMENDER_FANOUT = int(os.environ.get('RECOMMENDER_FANOUT', 3))
+    SCORING_POOL_WORKERS = int(os.environ.get('SCORING_POOL_WORKERS', min(4, os.cpu_count() or 1)))
+    SCORING_POOL_MAX_PENDING = int(os.environ.get('SCORING_POOL_MAX_PENDING', 16))
+    SCORING_DEADLINE = float(os.environ.get('SCORING_DEADLINE', 2.0))
+    CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or os.environ.get('REDIS_URL')
+    CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_ALWAYS_EAGER', 'false').lower() == 'true' or not CELERY_BROKER_URL
+    EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR')
+    EVENT_LOG_FLUSH_SECONDS = float(os.environ.get('EVENT_LOG_FLUSH_SECONDS', 1.0))
+    USER_RECS_COALESCE_SECONDS = int(os.environ.get('USER_RECS_COALESCE_SECONDS', 10))
+    # Add-to-cart clicks are buffered and written to the Cart table in batches this often
+    CART_FLUSH_SECONDS = float(os.environ.get('CART_FLUSH_SECONDS', 1.0))
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     SESSION_COOKIE_SECURE = os.environ.get('FLASK_ENV') == 'production'
@@ -35,15 +77,22 @@ class Config:
     SESSION_COOKIE_SAMESITE = 'Lax'
 
 app.config.from_object(Config)
+db_routing.configure(app.config)
 
 # Production middleware
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
 # Initialize extensions
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': db_routing.RoutingSession})
+db_routing.init_app(app)
 migrate = Migrate(app, db)
-cache = Cache(app)
-limiter = Limiter(app, key_func=get_remote_address, default_limits=["200 per day", "50 per hour"])
+cache = TieredCache(app)
+scoring_pool = ScoringPool(app)
+celery = make_celery(app)
+http_cache = HttpCache(cache)
+password_hasher = PasswordHasher(app)
+event_log = EventLog(app)
+limiter = Limiter(get_remote_address, app=app, default_limits=["200 per day", "50 per hour"])
 
 # Configure logging
 if not app.debug:
@@ -61,10 +110,17 @@ class User(db.Model):
     last_login = db.Column(db.DateTime)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    
+    def verify_and_upgrade(self, password):
+        """Check the password and rehash it if the configured cost has changed"""
+        ok, new_hash = password_hasher.verify_and_upgrade(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return ok
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -82,6 +138,8 @@ class Product(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Cart(db.Model):
+    # One line per (user, product), so adding to a line is a single upsert
+    __table_args__ = (db.Index('uq_cart_user_product', 'user_id', 'product_id', unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
@@ -95,6 +153,18 @@ class Order(db.Model):
     status = db.Column(db.String(50), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, default=1)
+    price = db.Column(db.Float, nullable=False)
+
+class CoPurchase(db.Model):
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    other_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
 # Load ML data
 try:
     trending_products = pd.read_csv("models/trending_products.csv")
@@ -106,6 +176,61 @@ except Exception as e:
     trending_products = pd.DataFrame()
     train_data = pd.DataFrame()
 
+recommender_options = {}
+if app.config['RECOMMENDER_BACKEND'] == 'lsa':
+    recommender_options = {'n_components': app.config['LSA_COMPONENTS'],
+                           'embeddings_path': app.config['LSA_EMBEDDINGS_PATH'],
+                           'quantize': app.config['LSA_QUANTIZE']}
+elif app.config['RECOMMENDER_BACKEND'] == 'sharded':
+    recommender_options = {'shard_by': app.config['RECOMMENDER_SHARD_BY'],
+                           'n_shards': app.config['RECOMMENDER_SHARDS'],
+                           'fanout': app.config['RECOMMENDER_FANOUT'] or None}
+recommender = make_recommender(train_data, app.config['RECOMMENDER_BACKEND'], **recommender_options)
+# Availability/category/price masks applied inside scoring, before top-k
+item_filter = ItemFilter.from_catalog(train_data)
+_filter_state = {'version': None}
+# Typeahead over names, brands and categories; built once per worker
+completions = Autocomplete.from_catalog(train_data)
+# Fallback for misspelled search queries that match no name exactly
+fuzzy_names = FuzzyResolver(recommender.names)
+
+def write_cart_deltas(rows):
+    """Add (user_id, product_id, delta) rows to the cart in one upsert statement and one commit"""
+    with app.app_context():
+        values = [{'user_id': u, 'product_id': p, 'quantity': q, 'created_at': datetime.utcnow()}
+                  for u, p, q in rows]
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = (sqlite if dialect == 'sqlite' else postgresql).insert(Cart).values(values)
+            stmt = insert.on_conflict_do_update(index_elements=['user_id', 'product_id'],
+                                                set_={'quantity': Cart.quantity + insert.excluded.quantity})
+        elif dialect in ('mysql', 'mariadb'):
+            insert = mysql.insert(Cart).values(values)
+            stmt = insert.on_duplicate_key_update(quantity=Cart.quantity + insert.inserted.quantity)
+        else:
+            # No portable upsert: update existing lines and insert the rest in the same transaction
+            for row in values:
+                item = Cart.query.filter_by(user_id=row['user_id'], product_id=row['product_id']).first()
+                if item:
+                    item.quantity += row['quantity']
+                else:
+                    db.session.add(Cart(**row))
+            db.session.commit()
+            return
+        db.session.execute(stmt)
+        db.session.commit()
+
+cart_buffer = CartBuffer(app, backend=cache.backend, writer=write_cart_deltas)
+
+def sync_cart(user_id):
+    """Write a user's pending cart changes; False if another flush held them past the wait"""
+    try:
+        cart_buffer.flush_user(user_id)
+        return True
+    except TimeoutError as e:
+        app.logger.warning(f"Serving the last persisted cart: {e}")
+        return False
+
 # Utility functions
 def login_required(f):
     @wraps(f)
@@ -119,7 +244,102 @@ def login_required(f):
 def truncate(text, length):
     return text[:length] + "..." if len(str(text)) > length else str(text)
 
-@cache.memoize(timeout=300)
+UNRESOLVED = -1
+
+def resolve_product(product_name, fuzzy=False):
+    """Catalog row for a product name or search query; misses are cached too
+
+    With ``fuzzy`` a query that no name contains falls back to the closest
+    name (for typed searches; stored product names stay exact).
+    """
+    key = 'resolve:%s:%d:%s' % (recommender.version, fuzzy, normalize_query(product_name))
+    row = cache.get(key)
+    if row is None:
+        row = recommender.resolve(product_name)
+        if row is None and fuzzy:
+            row = fuzzy_names.resolve(product_name)
+        row = UNRESOLVED if row is None else row
+        cache.set(key, row, timeout=300, tags=('recommendations',))
+    return None if row == UNRESOLVED else row
+
+def sync_availability(products):
+    """Set the catalog rows of ``products`` from their live stock, active flag and price"""
+    rows, flags, prices = [], [], []
+    for product in products:
+        row = recommender.row_for_name(product.name)
+        if row is not None:
+            rows.append(row)
+            flags.append(bool(product.is_active) and (product.stock or 0) > 0)
+            prices.append(product.price)
+    if rows:
+        item_filter.set_available(rows, flags)
+        item_filter.set_prices(rows, prices)
+
+def load_availability(build=False):
+    """Load the published availability mask; with ``build`` compute and publish it when there is none"""
+    version = cache.tag_version('availability')
+    packed = cache.get('availability:%s' % version)
+    if packed is not None:
+        item_filter.load_packed(packed)
+    elif build:
+        sync_availability(Product.query.all())
+        cache.set('availability:%s' % version, item_filter.packed(), timeout=24 * 3600)
+    else:
+        return False
+    _filter_state['version'] = version
+    return True
+
+@celery.task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def rebuild_availability():
+    """Compute the availability mask from the database and publish it to all workers"""
+    release(cache, 'availability')
+    if not recommender.empty:
+        load_availability(build=True)
+
+def current_filter():
+    """The item filter, reloaded when another worker has published a stock change
+
+    Never reads the database: a missing mask is rebuilt by the warm-up or a
+    background task, and requests use the last loaded one until then.
+    """
+    if recommender.empty:
+        return item_filter
+    if _filter_state['version'] != cache.tag_version('availability') and not load_availability():
+        if coalesce(cache, 'availability', 60):
+            rebuild_availability.delay()
+    return item_filter
+
+def refresh_availability(product_ids):
+    """Update the mask for products whose stock changed and publish it to all workers"""
+    if recommender.empty:
+        return
+    current_filter()
+    if _filter_state['version'] is None:
+        # Nothing published yet; the scheduled full rebuild reads these products too
+        return
+    sync_availability(Product.query.filter(Product.id.in_(product_ids)).all())
+    cache.invalidate_tags('availability')
+    version = cache.tag_version('availability')
+    cache.set('availability:%s' % version, item_filter.packed(), timeout=24 * 3600)
+    _filter_state['version'] = version
+
+def request_constraints():
+    """(category, min_price, max_price) from the query string"""
+    return (request.args.get('category') or None,
+            request.args.get('min_price', type=float), request.args.get('max_price', type=float))
+
+def scoring_mask(constraints=(None, None, None)):
+    """(mask, cache key part) for the current availability and constraints"""
+    mask = current_filter().mask(*constraints)
+    return mask, '%s:%s' % (_filter_state['version'], ':'.join('' if c is None else str(c) for c in constraints))
+
+def similar_items(row, top_n=10, constraints=(None, None, None)):
+    """Compact (int32 ids, float32 scores) for a catalog row, available items only"""
+    mask, variant = scoring_mask(constraints)
+    key = 'rec:%s:%d:%d:%s' % (recommender.version, row, top_n, variant)
+    return cache.get_or_set(key, lambda: recommender.similar(row, top_n, mask=mask),
+                            timeout=300, tags=('recommendations',))
+
 def get_recommendations(product_name, top_n=10):
     """Get product recommendations using ML"""
     if train_data.empty:
@@ -127,65 +347,154 @@ def get_recommendations(product_name, top_n=10):
     
     try:
         # Find product
-        matches = train_data[train_data['Name'].str.contains(product_name, case=False, na=False)]
-        if matches.empty:
+        row = resolve_product(product_name, fuzzy=True)
+        if row is None:
             return train_data.head(top_n)
         
-        # TF-IDF similarity
-        tfidf = TfidfVectorizer(stop_words='english', max_features=1000)
-        tfidf_matrix = tfidf.fit_transform(train_data['Tags'].fillna(''))
-        
-        idx = matches.index[0]
-        cosine_sim = cosine_similarity(tfidf_matrix[idx:idx+1], tfidf_matrix).flatten()
-        similar_indices = cosine_sim.argsort()[-top_n-1:-1][::-1]
-        
-        return train_data.iloc[similar_indices]
+        ids, _ = similar_items(row, top_n)
+        return recommender.hydrate(ids)
     except Exception as e:
         app.logger.error(f"Recommendation error: {e}")
         return train_data.head(top_n)
 
+# Background tasks
+def user_history_rows(user_id):
+    """Catalog rows and weights for a user's cart and order history"""
+    weights = {}
+    # Add the write-behind deltas instead of flushing them: this runs inline on every click without a broker
+    quantities = dict(db.session.query(Cart.product_id, Cart.quantity).filter(Cart.user_id == user_id))
+    for product_id, delta in cart_buffer.pending(user_id).items():
+        quantities[product_id] = quantities.get(product_id, 0) + delta
+    names = dict(db.session.query(Product.id, Product.name).filter(Product.id.in_(quantities))) if quantities else {}
+    cart_rows = [(names[pid], qty) for pid, qty in quantities.items() if pid in names and qty > 0]
+    order_rows = (db.session.query(Product.name, OrderItem.quantity)
+                  .join(OrderItem, OrderItem.product_id == Product.id)
+                  .join(Order, Order.id == OrderItem.order_id)
+                  .filter(Order.user_id == user_id).all())
+    # Purchases say more about taste than items merely sitting in the cart
+    for (name, qty), weight in [(r, 1.0) for r in cart_rows] + [(r, 2.0) for r in order_rows]:
+        row = recommender.row_for_name(name)
+        if row is not None:
+            weights[row] = weights.get(row, 0.0) + weight * (qty or 1)
+    return list(weights), list(weights.values())
+
+@celery.task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def refresh_user_recommendations(user_id, top_n=10):
+    """Recompute and store a user's personalised recommendations"""
+    if recommender.empty:
+        return
+    rows, weights = user_history_rows(user_id)
+    if not rows:
+        cache.delete('user_recs:%s' % user_id)
+        return
+    ids, scores = recommender.similar_to_many(rows, weights, top_n, mask=current_filter().mask())
+    cache.set('user_recs:%s' % user_id, (ids, scores), timeout=24 * 3600)
+
+@celery.task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def update_copurchase(product_ids):
+    """Increment pairwise co-purchase counts for one order"""
+    product_ids = sorted(set(product_ids))
+    for a in product_ids:
+        for b in product_ids:
+            if a == b:
+                continue
+            pair = CoPurchase.query.get((a, b))
+            if pair is None:
+                db.session.add(CoPurchase(product_id=a, other_id=b, count=1))
+            else:
+                pair.count += 1
+    db.session.commit()
+
+def schedule_user_refresh(user_id):
+    """Queue a recompute, folding bursts of events into one task
+
+    The coalescing key is left to expire after ``window`` rather than released
+    by the task, so an eager (inline) run does not reopen the window at once.
+    """
+    window = app.config['USER_RECS_COALESCE_SECONDS']
+    if coalesce(cache, 'user_recs:%s' % user_id, window):
+        refresh_user_recommendations.apply_async((user_id,), countdown=window)
+
 # Context processors
 @app.context_processor
 def inject_user():
     user_id = session.get('user_id')
     if user_id:
         user = User.query.get(user_id)
-        cart_count = Cart.query.filter_by(user_id=user_id).count()
+        # Lines still in the write-behind buffer count too, without forcing a flush per page
+        lines = {pid for (pid,) in db.session.query(Cart.product_id).filter(Cart.user_id == user_id)}
+        lines.update(pid for pid, delta in cart_buffer.pending(user_id).items() if delta > 0)
+        cart_count = len(lines)
         return {'logged_in': True, 'current_user': user, 'cart_count': cart_count}
     return {'logged_in': False, 'cart_count': 0}
 
+# Page sections are cached as rendered HTML; the page around them (cart badge,
+# flashes, login state) is rendered per request
+FRAGMENT_TIMEOUT = 300
+
+def render_fragment(template, **context):
+    """Render a partial without the context processors, so no per-user state ends up in a shared fragment"""
+    return app.jinja_env.get_template(template).render(truncate=truncate, **context)
+
+def trending_fragment():
+    return cache.fragment('trending', (recommender.version,),
+                          lambda: render_fragment('partials/trending.html', trending_products=trending_products.head(10)),
+                          FRAGMENT_TIMEOUT, tags=('trending',))
+
+def featured_fragment():
+    variant = auth_variant()
+    def render():
+        featured_products = Product.query.filter_by(is_active=True).limit(8).all()
+        return render_fragment('partials/product_grid.html', products=featured_products, logged_in=variant == 'user')
+    return cache.fragment('featured', (variant,), render, FRAGMENT_TIMEOUT, tags=('catalog', 'availability', 'featured'))
+
 # Routes
 @app.route('/')
-@cache.cached(timeout=300)
 def index():
-    featured_products = Product.query.filter_by(is_active=True).limit(8).all()
-    return render_template('index.html', 
-                         trending_products=trending_products.head(10),
-                         featured_products=featured_products,
-                         truncate=truncate)
+    return render_template('index.html', trending_html=trending_fragment(), featured_html=featured_fragment())
 
 @app.route('/products')
+@read_only
 def products():
     page = request.args.get('page', 1, type=int)
     category = request.args.get('category')
     search = request.args.get('search')
     
-    query = Product.query.filter_by(is_active=True)
-    
-    if category:
-        query = query.filter_by(category=category)
-    if search:
-        query = query.filter(Product.name.contains(search))
+    variant = auth_variant()
     
-    products = query.paginate(page=page, per_page=12, error_out=False)
-    categories = db.session.query(Product.category).distinct().all()
+    def render():
+        query = Product.query.filter_by(is_active=True)
+        if category:
+            query = query.filter_by(category=category)
+        if search:
+            query = query.filter(Product.name.contains(search))
+        products = query.paginate(page=page, per_page=12, error_out=False)
+        return render_fragment('partials/product_grid.html', products=products.items, pagination=products,
+                               category=category, search=search, logged_in=variant == 'user')
     
-    return render_template('products.html', products=products, categories=categories)
+    product_grid = cache.fragment('product_grid', (variant, page, category, search), render,
+                                  FRAGMENT_TIMEOUT, tags=('catalog', 'availability'))
+    categories = cache.get_or_set('categories', lambda: [c for (c,) in db.session.query(Product.category).distinct()],
+                                  timeout=3600, tags=('catalog',))
+    return render_template('products.html', product_grid=product_grid, categories=categories,
+                           category=category, search=search)
 
 @app.route('/product/<int:product_id>')
+@read_only
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
-    related = Product.query.filter_by(category=product.category).filter(Product.id != product_id).limit(4).all()
+    # Related ids are cached with the catalog, so a warm page is a single query
+    related_ids = cache.get('related:%s' % product_id)
+    if related_ids is None:
+        product = Product.query.get_or_404(product_id)
+        related = Product.query.filter_by(category=product.category).filter(Product.id != product_id).limit(4).all()
+        cache.set('related:%s' % product_id, [p.id for p in related], timeout=3600, tags=('catalog',))
+    else:
+        rows = {p.id: p for p in Product.query.filter(Product.id.in_([product_id] + related_ids)).all()}
+        if product_id not in rows:
+            abort(404)
+        product = rows[product_id]
+        related = [rows[i] for i in related_ids if i in rows]
+    event_log.log(session.get('user_id'), product_id, 'view')
     return render_template('product_detail.html', product=product, related_products=related)
 
 @app.route('/signup', methods=['GET', 'POST'])
@@ -237,7 +546,7 @@ def signin():
         
         user = User.query.filter_by(username=username, is_active=True).first()
         
-        if user and user.check_password(password):
+        if user and user.verify_and_upgrade(password):
             session.permanent = True
             session['user_id'] = user.id
             user.last_login = datetime.utcnow()
@@ -258,6 +567,7 @@ def logout():
 
 @app.route('/profile')
 @login_required
+@read_only
 def profile():
     user = User.query.get(session['user_id'])
     orders = Order.query.filter_by(user_id=user.id).order_by(Order.created_at.desc()).all()
@@ -270,24 +580,21 @@ def add_to_cart(product_id):
     product = Product.query.get_or_404(product_id)
     
     if product.stock <= 0:
+        # Recommendations still offered it, so the mask was stale
+        refresh_availability([product_id])
         flash('Product out of stock.', 'error')
         return redirect(request.referrer or url_for('products'))
     
-    cart_item = Cart.query.filter_by(user_id=session['user_id'], product_id=product_id).first()
-    
-    if cart_item:
-        cart_item.quantity += 1
-    else:
-        cart_item = Cart(user_id=session['user_id'], product_id=product_id)
-        db.session.add(cart_item)
-    
-    db.session.commit()
+    cart_buffer.add(session['user_id'], product_id)
+    event_log.log(session['user_id'], product_id, 'cart')
+    schedule_user_refresh(session['user_id'])
     flash('Item added to cart!', 'success')
     return redirect(request.referrer or url_for('products'))
 
 @app.route('/cart')
 @login_required
 def cart():
+    sync_cart(session['user_id'])
     cart_items = db.session.query(Cart, Product).join(Product).filter(Cart.user_id == session['user_id']).all()
     total = sum(item.Product.price * item.Cart.quantity for item in cart_items)
     return render_template('cart.html', cart_items=cart_items, total=total)
@@ -295,6 +602,7 @@ def cart():
 @app.route('/checkout')
 @login_required
 def checkout():
+    sync_cart(session['user_id'])
     cart_items = db.session.query(Cart, Product).join(Product).filter(Cart.user_id == session['user_id']).all()
     if not cart_items:
         flash('Your cart is empty.', 'warning')
@@ -307,6 +615,9 @@ def checkout():
 @login_required
 @limiter.limit("5 per minute")
 def place_order():
+    if not sync_cart(session['user_id']):
+        flash('Your cart is still being updated. Please try again.', 'warning')
+        return redirect(url_for('checkout'))
     cart_items = Cart.query.filter_by(user_id=session['user_id']).all()
     if not cart_items:
         flash('Your cart is empty.', 'warning')
@@ -316,10 +627,23 @@ def place_order():
     
     order = Order(user_id=session['user_id'], total_amount=total)
     db.session.add(order)
+    db.session.flush()
+    ordered = [(item.product_id, item.quantity) for item in cart_items]
+    product_ids = [product_id for product_id, _ in ordered]
+    for item in cart_items:
+        product = Product.query.get(item.product_id)
+        product.stock = max(0, (product.stock or 0) - item.quantity)
+        db.session.add(OrderItem(order_id=order.id, product_id=item.product_id, quantity=item.quantity,
+                                 price=product.price))
     
     # Clear cart
     Cart.query.filter_by(user_id=session['user_id']).delete()
     db.session.commit()
+    for product_id, quantity in ordered:
+        event_log.log(session['user_id'], product_id, 'order', quantity)
+    refresh_availability(product_ids)
+    update_copurchase.delay(product_ids)
+    schedule_user_refresh(session['user_id'])
     
     flash('Order placed successfully!', 'success')
     return redirect(url_for('order_success', order_id=order.id))
@@ -342,29 +666,131 @@ def recommendations():
         flash('Please enter a search term.', 'warning')
         return redirect(url_for('search'))
     
-    recommendations = get_recommendations(query)
-    return render_template('search.html', 
-                         recommendations=recommendations,
-                         query=query,
-                         truncate=truncate)
+    recommendations_html = cache.fragment(
+        'recommendations', (recommender.version, cache.tag_version('availability'), normalize_query(query)),
+        lambda: render_fragment('partials/recommendations.html', recommendations=get_recommendations(query)),
+        FRAGMENT_TIMEOUT, tags=('recommendations',))
+    return render_template('search.html', recommendations_html=recommendations_html, query=query)
 
 # API Routes
+CATALOG_CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=300'
+AUTOCOMPLETE_CACHE_CONTROL = 'public, max-age=3600'
+RECOMMENDATION_CACHE_CONTROL = 'public, max-age=300, stale-while-revalidate=600'
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+def catalog_version():
+    return '%s:%s:%s' % (cache.tag_version('catalog'), cache.tag_version('availability'), recommender.version)
+
 @app.route('/api/products')
 @limiter.limit("100 per minute")
-def api_products():
-    products = Product.query.filter_by(is_active=True).limit(50).all()
-    return jsonify([{
-        'id': p.id,
-        'name': p.name,
-        'price': p.price,
-        'category': p.category,
-        'rating': p.rating
-    } for p in products])
+@read_only
+async def api_products():
+    etag = http_cache.etag_for('api_products', catalog_version())
+    
+    def build():
+        products = Product.query.filter_by(is_active=True).limit(50).all()
+        return [{
+            'id': p.id,
+            'name': p.name,
+            'price': p.price,
+            'category': p.category,
+            'rating': p.rating
+        } for p in products]
+    return http_cache.json(etag, build, CATALOG_CACHE_CONTROL, tags=('catalog',))
+
+@app.route('/api/autocomplete')
+@limiter.limit("600 per minute")
+def api_autocomplete():
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 8, type=int), completions.k)
+    # Fired on every keystroke: answered straight from the index, no cache round trip
+    etag = http_cache.etag_for('autocomplete', recommender.version, normalize_query(query), limit)
+    return http_cache.direct(etag, lambda: completions.complete(query, limit), AUTOCOMPLETE_CACHE_CONTROL)
+
+async def scored_items(row, top_n, constraints=(None, None, None)):
+    """similar_items() with cache misses scored on the worker pool"""
+    mask, variant = scoring_mask(constraints)
+    key = 'rec:%s:%d:%d:%s' % (recommender.version, row, top_n, variant)
+    result = cache.get(key)
+    if result is None:
+        result = await scoring_pool.run_async(recommender.similar, row, top_n, mask=mask)
+        cache.set(key, result, timeout=300, tags=('recommendations',))
+    return result
+
+def serialize_recommendations(ids, scores):
+    rows = recommender.hydrate(ids)
+    columns = [c for c in ('Name', 'Brand', 'Rating', 'ReviewCount', 'ImageURL') if c in rows.columns]
+    items = rows[columns].to_dict(orient='records')
+    for item, row_id, score in zip(items, ids, scores):
+        item['row'] = int(row_id)
+        item['score'] = round(float(score), 4)
+    return items
+
+async def recommendations_response(etag, row, top_n, constraints=(None, None, None)):
+    response = http_cache.not_modified(etag, RECOMMENDATION_CACHE_CONTROL)
+    if response is not None:
+        return response
+    body = http_cache.get_body(etag)
+    if body is None:
+        payload = []
+        if row is not None:
+            ids, scores = await scored_items(row, top_n, constraints)
+            payload = serialize_recommendations(ids, scores)
+        body = http_cache.put_body(etag, payload, tags=('recommendations',))
+    return http_cache.respond(etag, body, RECOMMENDATION_CACHE_CONTROL)
+
+@app.route('/api/recommendations/search')
+@limiter.limit("60 per minute")
+async def api_recommendations_search():
+    query = request.args.get('q', '').strip()
+    top_n = min(request.args.get('top_n', 10, type=int), 50)
+    if not query:
+        return jsonify({'error': 'Missing query parameter q'}), 400
+    
+    constraints = request_constraints()
+    etag = http_cache.etag_for('rec_search', recommender.version, cache.tag_version('availability'),
+                               normalize_query(query), top_n, *constraints)
+    row = resolve_product(query, fuzzy=True) if not recommender.empty else None
+    return await recommendations_response(etag, row, top_n, constraints)
+
+@app.route('/api/recommendations/product/<int:product_id>')
+@limiter.limit("60 per minute")
+async def api_recommendations_product(product_id):
+    top_n = min(request.args.get('top_n', 10, type=int), 50)
+    constraints = request_constraints()
+    etag = http_cache.etag_for('rec_product', catalog_version(), product_id, top_n, *constraints)
+    response = http_cache.not_modified(etag, RECOMMENDATION_CACHE_CONTROL)
+    if response is not None:
+        return response
+    product = Product.query.get_or_404(product_id)
+    row = recommender.row_for_name(product.name)
+    return await recommendations_response(etag, row, top_n, constraints)
+
+@app.route('/api/recommendations/user/<int:user_id>')
+@login_required
+def api_recommendations_user(user_id):
+    if session['user_id'] != user_id:
+        abort(403)
+    stored = cache.get('user_recs:%s' % user_id)
+    if stored is None:
+        schedule_user_refresh(user_id)
+        return jsonify([])
+    ids, scores = stored
+    # Content hash of the stored result; changes whenever the task refreshes it
+    etag = http_cache.etag_for('rec_user', recommender.version, ids.tobytes())
+    return http_cache.json(etag, lambda: serialize_recommendations(ids, scores), PRIVATE_CACHE_CONTROL)
 
 @app.route('/health')
 def health_check():
     return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
 
+@app.route('/metrics')
+def metrics():
+    return jsonify({'cache': cache.stats(), 'scoring_pool': scoring_pool.stats(),
+                    'event_log': event_log.stats(), 'cart_buffer': cart_buffer.stats(),
+                    'password_hashing': password_hasher.stats(),
+                    'db_pool': db_routing.pool_metrics.snapshot()})
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -379,10 +805,75 @@ def internal_error(error):
 def ratelimit_handler(e):
     return jsonify({'error': 'Rate limit exceeded'}), 429
 
+@app.errorhandler(PoolSaturated)
+def pool_saturated_handler(e):
+    return jsonify({'error': 'Recommendation service busy'}), 503, {'Retry-After': '1'}
+
+@app.errorhandler(HashingOverloaded)
+def hashing_overloaded_handler(e):
+    return render_template('error.html', error_code=503,
+                           error_message="Sign-in is busy, please try again in a moment"), 503, {'Retry-After': '2'}
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_handler(e):
+    return jsonify({'error': 'Recommendation request timed out'}), 504
+
+# Warm-up
+def warm_up_queries(limit=20):
+    """Popular search queries: the trending product names, else the first catalog names"""
+    source = trending_products if 'Name' in trending_products.columns else train_data
+    if source.empty:
+        return []
+    return [str(name) for name in source['Name'].dropna().head(limit)]
+
+def warm_up(queries=None):
+    """Serve popular requests once in this process before it takes traffic
+
+    Loads (or builds and publishes) the availability mask, pages in
+    memory-mapped embeddings, starts the scoring threads, compiles the
+    templates and fills the local cache tier. Rate limits are switched off
+    for the duration so the warm-up does not spend real clients' quota.
+    """
+    if not recommender.empty:
+        try:
+            with app.app_context():
+                load_availability(build=True)
+        except SQLAlchemyError as e:
+            app.logger.warning(f"Warm-up could not load product availability: {e}")
+    queries = warm_up_queries() if queries is None else queries
+    requests = [('/', None), ('/api/products', None)]
+    for query in queries:
+        requests.append(('/api/recommendations/search', {'q': query}))
+        requests.append(('/api/autocomplete', {'q': query[:3]}))
+    timings, errors = [], 0
+    started = time.perf_counter()
+    limiter.enabled = False
+    try:
+        client = app.test_client()
+        for path, params in requests:
+            t = time.perf_counter()
+            try:
+                failed = client.get(path, query_string=params).status_code >= 500
+            except Exception as e:
+                app.logger.warning(f"Warm-up request {path} failed: {e}")
+                failed = True
+            errors += failed
+            timings.append(time.perf_counter() - t)
+    finally:
+        limiter.enabled = True
+    timings.sort()
+    return {'requests': len(requests), 'errors': errors, 'seconds': round(time.perf_counter() - started, 3),
+            'first_ms': round(timings[0] * 1000, 1) if timings else None,
+            'p50_ms': round(timings[len(timings) // 2] * 1000, 1) if timings else None,
+            'max_ms': round(timings[-1] * 1000, 1) if timings else None}
+
 # Initialize database
 def init_db():
     with app.app_context():
         db.create_all()
+        # create_all skips existing tables; add the cart upsert key to databases created before it
+        for index in Cart.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
         
         # Create sample products if none exist
         if Product.query.count() == 0:
@@ -399,6 +890,7 @@ def init_db():
                 db.session.add(product)
             
             db.session.commit()
+            cache.invalidate_tags('catalog', 'availability')
             app.logger.info("Sample products created")
 
 if __name__ == '__main__':
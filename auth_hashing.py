@@ -0,0 +1,144 @@
+"""
+Password hashing off the request threads.
+
+PBKDF2/scrypt verification costs tens to hundreds of milliseconds of CPU.
+Running it inline lets a burst of sign-ins occupy every worker, so the
+hashing runs on a small process pool instead. At most ``max_queue`` jobs
+may be waiting; beyond that callers get ``HashingOverloaded`` at once and
+can answer 503 instead of piling up behind the burst.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full or a job misses its deadline"""
+
+
+def _verify_job(pwhash, password, submitted_at):
+    started = time.time()
+    ok = check_password_hash(pwhash, password)
+    return ok, started - submitted_at, time.time() - started
+
+
+def _hash_job(password, method, submitted_at):
+    started = time.time()
+    pwhash = generate_password_hash(password, method=method)
+    return pwhash, started - submitted_at, time.time() - started
+
+
+class PasswordHasher:
+    """Bounded process pool for password hashing, with rehash-on-login"""
+
+    def __init__(self, app=None, max_workers=None, max_queue=None, method='pbkdf2:sha256:600000', timeout=5.0):
+        self.max_workers = max_workers if max_workers is not None else max(1, (os.cpu_count() or 2) // 2)
+        # At least one slot: inline mode (max_workers=0) still hashes one request at a time
+        self.max_queue = max(1, max_queue or self.max_workers * 8)
+        self.method = method
+        self._prefix = None
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._lock = threading.Lock()
+        self._counters = {'verified': 0, 'hashed': 0, 'rejected': 0, 'rehashed': 0}
+        self._hash_times = []
+        self._wait_times = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS', self.max_workers)
+        self.max_queue = max(1, app.config.get('PASSWORD_HASH_MAX_QUEUE') or self.max_workers * 8)
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self._prefix = None
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        app.extensions['password_hasher'] = self
+
+    def _pool(self):
+        # One pool per process: a pool inherited across gunicorn's fork is unusable
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(self.max_workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._record('rejected')
+            raise HashingOverloaded('password hashing queue is full')
+        try:
+            if self.max_workers == 0:
+                return fn(*args, time.time())
+            future = self._pool().submit(fn, *args, time.time())
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                self._record('rejected')
+                raise HashingOverloaded('password hashing timed out')
+        finally:
+            self._slots.release()
+
+    def _record(self, name, wait=None, elapsed=None):
+        with self._lock:
+            self._counters[name] += 1
+            if elapsed is not None:
+                self._hash_times.append(elapsed)
+                self._wait_times.append(wait)
+                del self._hash_times[:-1000]
+                del self._wait_times[:-1000]
+
+    def hash(self, password):
+        pwhash, wait, elapsed = self._run(_hash_job, password, self.method)
+        self._record('hashed', wait, elapsed)
+        return pwhash
+
+    def verify(self, pwhash, password):
+        ok, wait, elapsed = self._run(_verify_job, pwhash, password)
+        self._record('verified', wait, elapsed)
+        return ok
+
+    @property
+    def prefix(self):
+        """Method prefix of hashes made with the configured method, with werkzeug's defaults filled in"""
+        if self._prefix is None:
+            # 'scrypt' is stored as 'scrypt:32768:8:1', 'pbkdf2' as 'pbkdf2:sha256:600000'
+            self._prefix = generate_password_hash('probe', method=self.method).split('$', 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with a different method or cost than configured"""
+        return pwhash.split('$', 1)[0] != self.prefix
+
+    def verify_and_upgrade(self, pwhash, password):
+        """Return (ok, new_hash); new_hash is set when the stored hash should be replaced"""
+        ok = self.verify(pwhash, password)
+        if ok and self.needs_rehash(pwhash):
+            self._record('rehashed')
+            return True, self.hash(password)
+        return ok, None
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return {}
+        ordered = sorted(values)
+        return {'p50_ms': round(ordered[len(ordered) // 2] * 1000, 2),
+                'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2)}
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._counters)
+            out['hash_time'] = self._percentiles(self._hash_times)
+            out['queue_wait'] = self._percentiles(self._wait_times)
+        out['max_workers'] = self.max_workers
+        out['max_queue'] = self.max_queue
+        return out
@@ -0,0 +1,115 @@
+"""
+Typeahead completions over product names, brands and categories.
+
+Keys are normalised strings in one sorted list, so the keys starting with a
+prefix are a contiguous range found with two bisects. Every prefix whose
+range holds more than ``scan_limit`` keys (the heavy nodes of the implied
+trie) gets its popularity-ordered top-k precomputed at build time; any
+other range is small enough to rank on the spot. A lookup is therefore two
+bisects plus either a dict hit or a sort of at most ``scan_limit`` weights,
+whatever the catalog size.
+
+Names are also keyed from each later word (up to ``max_words``), so
+"lipstick" completes "Matte Lipstick Hot Berry".
+"""
+
+import bisect
+import re
+
+import numpy as np
+
+from recommender import normalize_query
+
+_SPACE = re.compile(r'\s+')
+
+
+class Autocomplete:
+    """Sorted prefix index with top-k completions precomputed at heavy nodes"""
+
+    def __init__(self, entries, k=10, scan_limit=64, max_words=4):
+        """``entries`` are (text, kind, weight); duplicates are merged and their weights summed"""
+        merged = {}
+        for text, kind, weight in entries:
+            text = _SPACE.sub(' ', str(text)).strip()
+            if not text:
+                continue
+            key = (normalize_query(text), kind)
+            if key in merged:
+                merged[key][2] += float(weight)
+            else:
+                merged[key] = [text, kind, float(weight)]
+        self.texts = [m[0] for m in merged.values()]
+        self.kinds = [m[1] for m in merged.values()]
+        self.weights = np.array([m[2] for m in merged.values()], dtype=np.float32)
+        self.k = k
+        self.scan_limit = max(scan_limit, k)
+
+        pairs = []
+        for entry, (normalised, kind) in enumerate(merged):
+            words = normalised.split(' ')
+            for start in range(min(len(words), max_words if kind == 'product' else 1)):
+                pairs.append((' '.join(words[start:]), entry))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.entries = np.array([entry for _, entry in pairs], dtype=np.int32)
+        self.top = {}
+        self._build(0, len(self.keys), '')
+
+    @classmethod
+    def from_catalog(cls, data, **options):
+        """Index clean_data.csv rows; popularity is rows per name plus review count"""
+        if data.empty:
+            return cls([], **options)
+        weight = np.ones(len(data), dtype=np.float32)
+        if 'ReviewCount' in data.columns:
+            weight += data['ReviewCount'].fillna(0).to_numpy(dtype=np.float32)
+        entries = list(zip(data['Name'], ['product'] * len(data), weight))
+        for column, kind in (('Brand', 'brand'), ('Category', 'category')):
+            if column in data.columns:
+                values = data[column].fillna('').astype(str).str.split(',').str[0]
+                entries.extend(zip(values, [kind] * len(data), weight))
+        return cls(entries, **options)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _rank(self, lo, hi):
+        """Distinct entries of keys[lo:hi], most popular first, at most k"""
+        entries = np.unique(self.entries[lo:hi])
+        weights = self.weights[entries]
+        if len(entries) > self.k:
+            keep = np.argpartition(-weights, self.k - 1)[:self.k]
+            entries, weights = entries[keep], weights[keep]
+        return tuple(int(e) for e in entries[np.argsort(-weights, kind='stable')])
+
+    def _build(self, lo, hi, prefix):
+        # Iterative walk over the heavy nodes; each pushes one child per next character
+        stack = [(lo, hi, prefix)]
+        while stack:
+            lo, hi, prefix = stack.pop()
+            if hi - lo <= self.scan_limit:
+                continue
+            if prefix:
+                self.top[prefix] = self._rank(lo, hi)
+            depth = len(prefix)
+            # A key equal to the prefix sorts first and has no child
+            while lo < hi and len(self.keys[lo]) == depth:
+                lo += 1
+            while lo < hi:
+                child = self.keys[lo][:depth + 1]
+                end = bisect.bisect_left(self.keys, child + '\uffff', lo, hi)
+                stack.append((lo, end, child))
+                lo = end
+
+    def complete(self, prefix, limit=None):
+        """[{'text', 'type'}] for the most popular entries matching ``prefix``"""
+        prefix = normalize_query(prefix)
+        limit = min(limit or self.k, self.k)
+        if not prefix:
+            return []
+        entries = self.top.get(prefix)
+        if entries is None:
+            lo = bisect.bisect_left(self.keys, prefix)
+            hi = bisect.bisect_left(self.keys, prefix + '\uffff', lo)
+            entries = self._rank(lo, hi) if hi > lo else ()
+        return [{'text': self.texts[e], 'type': self.kinds[e]} for e in entries[:limit]]
@@ -0,0 +1,170 @@
+"""
+Compare the sparse TF-IDF and dense LSA content backends.
+
+Reports resident memory, build time, single-query latency (p50/p99), batched
+query throughput and how much of the TF-IDF top-k the LSA top-k recovers.
+Memory is the growth of the resident set size of a fresh process that
+builds the model and answers the same queries: ``rss_mb`` is the memory the
+process owns (RssAnon), ``mapped_mb`` the pages of memory-mapped files it has
+read (RssFile), which the kernel can drop and which workers share.
+With ``--quantize`` each LSA size also gets an int8 row whose overlap is
+measured against the float32 LSA results; the run fails if that falls
+below ``--min-agreement``. ``--fanouts`` adds category-sharded TF-IDF rows
+(one per fan-out, 0 meaning every shard) with their overlap against the
+unsharded index.
+
+Usage::
+
+    python benchmark_content.py --data models/clean_data.csv -k 10 --components 64,128
+    python benchmark_content.py --quantize --min-agreement 0.95
+    python benchmark_content.py --fanouts 1,3,0
+"""
+
+import argparse
+import ctypes
+import gc
+import multiprocessing
+import sys
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from evaluate import DEFAULT_DATA, format_table
+from recommender import ContentRecommender, LSARecommender, ShardedRecommender
+
+
+def _percentile_ms(timings, q):
+    ordered = sorted(timings)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)
+
+
+def resident_bytes():
+    """(anonymous, file-backed) resident bytes of this process; peak RSS where /proc is missing"""
+    sizes = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('RssAnon:', 'RssFile:')):
+                    name, value = line.split(':')
+                    sizes[name] = int(value.split()[0]) * 1024
+        return sizes['RssAnon'], sizes['RssFile']
+    except (OSError, ValueError, KeyError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, 0
+
+
+def _resident_job(factory, data, rows, k):
+    gc.collect()
+    before = resident_bytes()
+    engine = factory(data)
+    for row in rows:
+        engine.similar(row, k)
+    gc.collect()
+    try:
+        # Hand memory freed after the build back to the OS so it is not counted
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    after = resident_bytes()
+    return after[0] - before[0], after[1] - before[1]
+
+
+def resident_mb(factory, data, rows, k=10):
+    """{'rss_mb', 'mapped_mb'} growth of a fresh process that builds ``factory(data)`` and queries ``rows``"""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        anon, mapped = pool.apply(_resident_job, (factory, data, rows, k))
+    return {'rss_mb': round(anon / 1e6, 3), 'mapped_mb': round(max(mapped, 0) / 1e6, 3)}
+
+
+def benchmark(engine, rows, k=10, batch_size=64):
+    timings = []
+    for row in rows:
+        started = time.perf_counter()
+        engine.similar(row, k)
+        timings.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        engine.similar_batch(rows[i:i + batch_size], k)
+    batch_seconds = time.perf_counter() - started
+    return {
+        'p50_ms': _percentile_ms(timings, 0.5),
+        'p99_ms': _percentile_ms(timings, 0.99),
+        'batch_queries_per_s': round(len(rows) / batch_seconds, 1) if batch_seconds else None,
+    }
+
+
+def overlap(reference, engine, rows, k=10):
+    """Mean fraction of the reference top-k that ``engine`` also returns"""
+    shares = []
+    for row in rows:
+        expected = set(reference.similar(row, k)[0].tolist())
+        if expected:
+            shares.append(len(expected & set(engine.similar(row, k)[0].tolist())) / len(expected))
+    return round(float(np.mean(shares)), 4) if shares else None
+
+
+def run(data, components=(128,), k=10, queries=500, seed=0, quantize=False, fanouts=()):
+    rows = np.random.default_rng(seed).choice(len(data), size=min(queries, len(data)), replace=False)
+    started = time.perf_counter()
+    sparse = ContentRecommender(data, max_features=5000)
+    reports = [dict(backend='tfidf', build_s=round(time.perf_counter() - started, 3),
+                    **resident_mb(partial(ContentRecommender, max_features=5000), data, rows, k),
+                    **benchmark(sparse, rows, k), overlap=1.0)]
+    for n_components in components:
+        started = time.perf_counter()
+        dense = LSARecommender(data, n_components=n_components)
+        build = round(time.perf_counter() - started, 3)
+        dense_memory = resident_mb(partial(LSARecommender, n_components=n_components), data, rows, k)
+        reports.append(dict(backend='lsa-%d' % dense.embeddings.shape[1], build_s=build, **dense_memory,
+                            **benchmark(dense, rows, k), overlap=overlap(sparse, dense, rows, k)))
+        if quantize:
+            started = time.perf_counter()
+            quantized = LSARecommender(data, n_components=n_components, quantize=True)
+            build = round(time.perf_counter() - started, 3)
+            memory = resident_mb(partial(LSARecommender, n_components=n_components, quantize=True), data, rows, k)
+            report = dict(backend='lsa-%d-int8' % dense.embeddings.shape[1], build_s=build, **memory,
+                          **benchmark(quantized, rows, k), overlap=overlap(sparse, quantized, rows, k))
+            report['agreement'] = overlap(dense, quantized, rows, k)
+            report['memory_ratio'] = (round(dense_memory['rss_mb'] / memory['rss_mb'], 2)
+                                      if memory['rss_mb'] > 0 else None)
+            reports.append(report)
+    for fanout in fanouts:
+        started = time.perf_counter()
+        sharded = ShardedRecommender(data, max_features=5000, fanout=fanout or None)
+        build = round(time.perf_counter() - started, 3)
+        memory = resident_mb(partial(ShardedRecommender, max_features=5000, fanout=fanout or None), data, rows, k)
+        reports.append(dict(backend='sharded-%d/%s' % (len(sharded.shards), fanout or 'all'), build_s=build,
+                            **memory, **benchmark(sharded, rows, k), overlap=overlap(sparse, sharded, rows, k)))
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data', default=DEFAULT_DATA)
+    parser.add_argument('--components', default='128', help='comma-separated LSA dimensions')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--quantize', action='store_true', help='also benchmark int8 quantised LSA')
+    parser.add_argument('--fanouts', default='', help='comma-separated shard fan-outs to benchmark (0 = all)')
+    parser.add_argument('--min-agreement', type=float, default=0.9,
+                        help='minimum int8 vs float32 top-k agreement (with --quantize)')
+    args = parser.parse_args(argv)
+
+    data = pd.read_csv(args.data)
+    data['Tags'] = data['Tags'].fillna('')
+    data['Name'] = data['Name'].fillna('')
+    components = [int(c) for c in args.components.split(',') if c.strip()]
+    fanouts = [int(f) for f in args.fanouts.split(',') if f.strip()]
+    reports = run(data, components, args.k, args.queries, quantize=args.quantize, fanouts=fanouts)
+    print(format_table(reports))
+    failing = [r['backend'] for r in reports if r.get('agreement') is not None and r['agreement'] < args.min_agreement]
+    if failing:
+        print('top-%d agreement below %.2f: %s' % (args.k, args.min_agreement, ', '.join(failing)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Offline all-pairs item similarity with streaming top-k.
+
+Replaces the notebook's dense ``cosine_similarity(tfidf, tfidf)``, which
+needs N x N float64. Rows are processed in blocks on a process pool; each
+block is compared against the catalog one column tile at a time and only
+the running top-k per row is kept, so a worker holds at most
+``block x block`` scores plus ``block x k`` results. Finished blocks are
+written straight into memory-mapped ``.npy`` outputs, so the total memory
+is O(N*k + block^2) and a crash only loses the blocks in flight.
+
+Usage::
+
+    python build_similarity.py --data models/clean_data.csv --out models/neighbours -k 50 --workers 8
+
+writes ``models/neighbours.ids.npy`` (int32, -1 padded) and
+``models/neighbours.scores.npy`` (float32), both N x k and best first;
+open them with ``load_neighbours``.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from evaluate import DEFAULT_DATA
+from recommender import make_recommender
+
+_worker = {}
+
+
+def _init_worker(matrix, ids_path, scores_path):
+    # Runs once per process: the matrix is pickled to each worker only once
+    _worker['matrix'] = matrix
+    _worker['ids'] = np.load(ids_path, mmap_mode='r+')
+    _worker['scores'] = np.load(scores_path, mmap_mode='r+')
+
+
+def _dense(block):
+    return block.toarray() if sp.issparse(block) else np.asarray(block)
+
+
+def block_top_k(matrix, start, stop, k, tile):
+    """Top-k neighbours (ids, scores) of rows start:stop against every row of ``matrix``"""
+    rows = matrix[start:stop]
+    n_rows = stop - start
+    best_ids = np.full((n_rows, k), -1, dtype=np.int32)
+    best_scores = np.full((n_rows, k), -np.inf, dtype=np.float32)
+    local = np.arange(n_rows)
+    for col_start in range(0, matrix.shape[0], tile):
+        col_stop = min(col_start + tile, matrix.shape[0])
+        scores = _dense(rows @ matrix[col_start:col_stop].T).astype(np.float32, copy=False)
+        # Never list an item as its own neighbour
+        own = (local + start >= col_start) & (local + start < col_stop)
+        scores[local[own], local[own] + start - col_start] = -np.inf
+        take = min(k, col_stop - col_start)
+        top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+        # Merge this tile's candidates with the running best
+        merged_ids = np.concatenate([best_ids, (top + col_start).astype(np.int32)], axis=1)
+        merged_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_ids = np.take_along_axis(merged_ids, keep, axis=1)
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best_ids = np.take_along_axis(best_ids, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    # Pad with -1 where fewer than k items share anything with the row
+    empty = ~(best_scores > 0)
+    best_ids[empty] = -1
+    best_scores[empty] = 0.0
+    return best_ids, best_scores
+
+
+def _run_block(start, stop, k, tile):
+    started = time.perf_counter()
+    ids, scores = block_top_k(_worker['matrix'], start, stop, k, tile)
+    _worker['ids'][start:stop] = ids
+    _worker['scores'][start:stop] = scores
+    _worker['ids'].flush()
+    _worker['scores'].flush()
+    return stop - start, time.perf_counter() - started
+
+
+def output_paths(out):
+    return out + '.ids.npy', out + '.scores.npy'
+
+
+def build(matrix, out, k=50, block=1024, workers=None, progress=None):
+    """Write the top-k neighbours of every row of ``matrix`` to ``out``.{ids,scores}.npy"""
+    n = matrix.shape[0]
+    k = min(k, max(1, n - 1))
+    ids_path, scores_path = output_paths(out)
+    directory = os.path.dirname(os.path.abspath(ids_path))
+    os.makedirs(directory, exist_ok=True)
+    np.lib.format.open_memmap(ids_path, mode='w+', dtype=np.int32, shape=(n, k))[:] = -1
+    np.lib.format.open_memmap(scores_path, mode='w+', dtype=np.float32, shape=(n, k))[:] = 0
+    blocks = [(start, min(start + block, n)) for start in range(0, n, block)]
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    done = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(matrix, ids_path, scores_path)) as pool:
+        futures = [pool.submit(_run_block, start, stop, k, block) for start, stop in blocks]
+        for future in as_completed(futures):
+            rows, _ = future.result()
+            done += rows
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                rate = done / elapsed if elapsed else 0.0
+                progress(done, n, rate, (n - done) / rate if rate else 0.0)
+    elapsed = time.perf_counter() - started
+    return {'rows': n, 'k': k, 'blocks': len(blocks), 'workers': workers,
+            'seconds': round(elapsed, 3), 'rows_per_s': round(n / elapsed, 1) if elapsed else None}
+
+
+def load_neighbours(out):
+    """(ids, scores) memory-mapped from a finished build"""
+    ids_path, scores_path = output_paths(out)
+    return np.load(ids_path, mmap_mode='r'), np.load(scores_path, mmap_mode='r')
+
+
+def _print_progress(done, total, rate, eta):
+    sys.stderr.write('\r%d/%d rows  %.0f rows/s  eta %.0fs ' % (done, total, rate, eta))
+    if done == total:
+        sys.stderr.write('\n')
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data', default=DEFAULT_DATA)
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(DEFAULT_DATA), 'neighbours'))
+    parser.add_argument('--backend', default='tfidf', choices=['tfidf', 'lsa'])
+    parser.add_argument('-k', type=int, default=50)
+    parser.add_argument('--block', type=int, default=1024, help='rows per task and columns per tile')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    data = pd.read_csv(args.data)
+    data['Tags'] = data['Tags'].fillna('')
+    data['Name'] = data['Name'].fillna('')
+    engine = make_recommender(data, args.backend)
+    matrix = engine.embeddings if args.backend == 'lsa' else engine.matrix
+    report = build(matrix, args.out, args.k, args.block, args.workers, _print_progress)
+    print(' '.join('%s=%s' % item for item in report.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
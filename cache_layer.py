@@ -0,0 +1,347 @@
+"""
+Two-tier cache for the production app.
+
+A small bounded LRU lives in every worker process and sits in front of a
+shared backend (Redis in production, an in-memory dict for tests and local
+runs). Entries can carry tags such as ``catalog``, ``trending`` or
+``availability``; invalidating a tag bumps its version in the shared backend so
+every worker drops the stale entries on their next shared read.
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+TAG_PREFIX = 'tag:'
+
+
+class LocalLRU:
+    """Bounded per-process LRU with per-entry expiry"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, timeout):
+        expires_at = time.monotonic() + timeout if timeout else 0
+        with self._lock:
+            self._data[key] = (expires_at, entry)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def drop_tagged(self, tag):
+        with self._lock:
+            stale = [k for k, (_, entry) in self._data.items() if tag in entry[1]]
+            for key in stale:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemoryBackend:
+    """Process-local stand-in for the shared store (tests, single worker)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at and expires_at < time.time():
+            del self._data[key]
+            return None
+        return item
+
+    def get_many(self, keys):
+        with self._lock:
+            out = []
+            for key in keys:
+                item = self._live(key)
+                out.append(item[1] if item else None)
+            return out
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.time() + timeout if timeout else 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+
+    def add(self, key, value, timeout=None):
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (time.time() + timeout if timeout else 0, value)
+            return True
+
+    def incr(self, key):
+        with self._lock:
+            item = self._live(key)
+            value = int(item[1]) + 1 if item else 1
+            self._data[key] = (item[0] if item else 0, value)
+            return value
+
+    def get_counters(self, keys):
+        return [v or 0 for v in self.get_many(keys)]
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            item = self._live(key)
+            fields = item[1] if item else {}
+            fields[field] = fields.get(field, 0) + amount
+            self._data[key] = (item[0] if item else 0, fields)
+            return fields[field]
+
+    def hgetall(self, key):
+        with self._lock:
+            item = self._live(key)
+            return dict(item[1]) if item else {}
+
+    def take_hash(self, key):
+        """Read and delete a hash in one step"""
+        with self._lock:
+            item = self._live(key)
+            self._data.pop(key, None)
+            return item[1] if item else {}
+
+    def sadd(self, key, member):
+        with self._lock:
+            item = self._live(key)
+            members = item[1] if item else set()
+            members.add(member)
+            self._data[key] = (item[0] if item else 0, members)
+
+    def take_set(self, key):
+        """Read and delete a set in one step"""
+        with self._lock:
+            item = self._live(key)
+            self._data.pop(key, None)
+            return item[1] if item else set()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """Shared store backed by Redis; values are pickled bytes"""
+
+    def __init__(self, url, prefix='recsys:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _k(self, key):
+        return self.prefix + key
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        raw = self.client.mget([self._k(k) for k in keys])
+        return [pickle.loads(v) if v is not None else None for v in raw]
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self._k(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        ex=int(timeout) if timeout else None)
+
+    def add(self, key, value, timeout=None):
+        return bool(self.client.set(self._k(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                                    ex=int(timeout) if timeout else None, nx=True))
+
+    def incr(self, key):
+        return self.client.incr(self._k(key))
+
+    def get_counters(self, keys):
+        if not keys:
+            return []
+        raw = self.client.mget([self._k(k) for k in keys])
+        return [int(v) if v is not None else 0 for v in raw]
+
+    # Hashes and sets hold plain integers, not pickles, so Redis can add to them
+    def hincrby(self, key, field, amount=1):
+        return self.client.hincrby(self._k(key), field, amount)
+
+    def hgetall(self, key):
+        return {int(f): int(v) for f, v in self.client.hgetall(self._k(key)).items()}
+
+    def take_hash(self, key):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(self._k(key))
+        pipe.delete(self._k(key))
+        return {int(f): int(v) for f, v in pipe.execute()[0].items()}
+
+    def sadd(self, key, member):
+        self.client.sadd(self._k(key), member)
+
+    def take_set(self, key):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.smembers(self._k(key))
+        pipe.delete(self._k(key))
+        return {int(m) for m in pipe.execute()[0]}
+
+    def delete(self, key):
+        self.client.delete(self._k(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class TieredCache:
+    """Local LRU in front of a shared backend, with tag-based invalidation"""
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        self.local = LocalLRU()
+        self.default_timeout = 300
+        self.local_timeout = 5
+        self.stats_counters = {'local_hits': 0, 'local_misses': 0,
+                               'shared_hits': 0, 'shared_misses': 0,
+                               'sets': 0, 'invalidations': 0}
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        self.local_timeout = app.config.get('CACHE_LOCAL_TIMEOUT', 5)
+        self.local = LocalLRU(app.config.get('CACHE_LOCAL_MAXSIZE', 1024))
+        if self.backend is None:
+            redis_url = app.config.get('CACHE_REDIS_URL')
+            if redis_url:
+                try:
+                    self.backend = RedisBackend(redis_url, app.config.get('CACHE_KEY_PREFIX', 'recsys:'))
+                except ImportError:
+                    app.logger.warning("redis package missing, falling back to in-memory cache")
+            if self.backend is None:
+                self.backend = MemoryBackend()
+        app.extensions['tiered_cache'] = self
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats_counters[name] += 1
+
+    def _tag_versions(self, tags):
+        if not tags:
+            return {}
+        versions = self.backend.get_counters([TAG_PREFIX + t for t in tags])
+        return dict(zip(tags, versions))
+
+    def get(self, key):
+        """Return the cached value or None"""
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count('local_hits')
+            return entry[0]
+        self._count('local_misses')
+
+        entry = self.backend.get_many([key])[0]
+        if entry is not None:
+            value, tag_versions = entry
+            if self._tag_versions(list(tag_versions)) == tag_versions:
+                self._count('shared_hits')
+                self.local.set(key, entry, self.local_timeout)
+                return value
+        self._count('shared_misses')
+        return None
+
+    def set(self, key, value, timeout=None, tags=()):
+        timeout = self.default_timeout if timeout is None else timeout
+        entry = (value, self._tag_versions(list(tags)))
+        self.backend.set(key, entry, timeout)
+        self.local.set(key, entry, min(timeout, self.local_timeout) if timeout else self.local_timeout)
+        self._count('sets')
+
+    def add(self, key, value, timeout=None):
+        """Set only if missing in the shared tier; returns True if stored"""
+        timeout = self.default_timeout if timeout is None else timeout
+        return self.backend.add(key, (value, {}), timeout)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.backend.delete(key)
+
+    def get_or_set(self, key, factory, timeout=None, tags=()):
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            if value is not None:
+                self.set(key, value, timeout, tags)
+        return value
+
+    def tag_version(self, tag):
+        """Current version of a tag; changes whenever the tag is invalidated"""
+        return self.backend.get_counters([TAG_PREFIX + tag])[0]
+
+    def invalidate_tags(self, *tags):
+        """Drop every entry carrying any of the given tags, in all workers"""
+        for tag in tags:
+            self.backend.incr(TAG_PREFIX + tag)
+            self.local.drop_tagged(tag)
+            self._count('invalidations')
+
+    def clear(self):
+        self.local.clear()
+        self.backend.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            counters = dict(self.stats_counters)
+        local_total = counters['local_hits'] + counters['local_misses']
+        shared_total = counters['shared_hits'] + counters['shared_misses']
+        counters['local_hit_rate'] = counters['local_hits'] / local_total if local_total else 0.0
+        counters['shared_hit_rate'] = counters['shared_hits'] / shared_total if shared_total else 0.0
+        counters['local_size'] = len(self.local)
+        counters['backend'] = type(self.backend).__name__
+        return counters
+
+    def fragment(self, name, parts, render, timeout=None, tags=()):
+        """Rendered HTML for one page section, shared by every request with the same ``parts``"""
+        from markupsafe import Markup
+        key = 'fragment:%s:%s' % (name, make_key(parts, {}))
+        html = self.get(key)
+        if html is None:
+            html = render()
+            self.set(key, html, timeout, tags)
+        return Markup(html)
+
+
+def make_key(args, kwargs):
+    raw = repr((args, sorted(kwargs.items()))).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def auth_variant():
+    """'user' or 'anon': the only per-visitor difference in shared fragments"""
+    from flask import session
+    return 'user' if session.get('user_id') else 'anon'
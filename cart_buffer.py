@@ -0,0 +1,167 @@
+"""
+Write-behind cart quantities.
+
+``CartBuffer.add`` only increments a per-user hash of pending quantity
+deltas in the shared cache backend (one HINCRBY on Redis), so a burst of
+"+" clicks costs no database round trips. A background thread flushes
+every ``flush_interval`` seconds: the deltas of all dirty users are folded
+into one batch and handed to ``writer`` (a single upsert statement and one
+commit in the app), however many clicks they came from.
+
+Ordering: a user's deltas are only ever taken while holding that user's
+flush lock in the backend, and a failed write puts them back.
+``flush_user`` waits for any flush of that user in progress and then writes
+whatever is left, so once it returns every click recorded in the backend
+before it was called is in the table. Checkout and the cart page call it
+first; readers on the click path (the cart badge, the inline recommendation
+refresh) add ``pending`` to what is in the table instead.
+
+Only a shared backend (Redis) makes this hold across workers: the in-memory
+backend is per process, so there ``flush_user`` sees just the clicks that
+reached this worker, and the others' land on their next timed flush. With
+Redis the pending deltas also survive a worker restart; in memory they are
+flushed on interpreter exit.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'cart:dirty'
+
+
+class CartBuffer:
+    """Coalesces cart quantity changes and writes them to the database in batches"""
+
+    def __init__(self, app=None, backend=None, writer=None, flush_interval=1.0, lock_timeout=30,
+                 wait_timeout=5.0):
+        self.backend = backend
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._closed = False
+        self._counters = {'added': 0, 'flushes': 0, 'rows_written': 0, 'write_errors': 0}
+        if app is not None:
+            self.init_app(app)
+        atexit.register(self.close)
+
+    def init_app(self, app):
+        self.flush_interval = app.config.get('CART_FLUSH_SECONDS', self.flush_interval)
+        app.extensions['cart_buffer'] = self
+
+    def add(self, user_id, product_id, quantity=1):
+        """Record a quantity change; it reaches the database on the next flush"""
+        if self._pid != os.getpid():
+            self._start()
+        # Delta first, then the dirty mark: a flush between the two finds the delta on a later round
+        self.backend.hincrby(self._pending_key(user_id), product_id, quantity)
+        self.backend.sadd(DIRTY_KEY, user_id)
+        self._counters['added'] += 1
+
+    def pending(self, user_id):
+        """{product_id: delta} not yet written for ``user_id``"""
+        return self.backend.hgetall(self._pending_key(user_id))
+
+    def flush(self):
+        """Write the pending deltas of every dirty user in one batch"""
+        with self._flush_lock:
+            users = self.backend.take_set(DIRTY_KEY)
+            locked = []
+            for user_id in users:
+                if self._lock(user_id):
+                    locked.append(user_id)
+                else:
+                    # Someone else is flushing this user; leave them for the next round
+                    self.backend.sadd(DIRTY_KEY, user_id)
+            return self._write(locked)
+
+    def flush_user(self, user_id):
+        """Block until every change for ``user_id`` recorded in the backend is in the database
+
+        With a per-process backend that is only this worker's clicks. Raises
+        ``TimeoutError`` if another flush of the user holds the lock past ``wait_timeout``.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while not self._lock(user_id):
+            if time.monotonic() > deadline:
+                raise TimeoutError('cart flush for user %s is still running' % user_id)
+            time.sleep(0.01)
+        return self._write([user_id])
+
+    def _write(self, user_ids):
+        taken = {}
+        try:
+            for user_id in user_ids:
+                deltas = self.backend.take_hash(self._pending_key(user_id))
+                if deltas:
+                    taken[user_id] = deltas
+            rows = [(user_id, product_id, delta)
+                    for user_id, deltas in taken.items()
+                    for product_id, delta in deltas.items() if delta]
+            if rows:
+                self.writer(rows)
+                self._counters['flushes'] += 1
+                self._counters['rows_written'] += len(rows)
+            return len(rows)
+        except Exception:
+            self._counters['write_errors'] += 1
+            # Put the deltas back so the next flush retries them
+            for user_id, deltas in taken.items():
+                for product_id, delta in deltas.items():
+                    self.backend.hincrby(self._pending_key(user_id), product_id, delta)
+                self.backend.sadd(DIRTY_KEY, user_id)
+            raise
+        finally:
+            for user_id in user_ids:
+                self.backend.delete(self._lock_key(user_id))
+
+    def _lock(self, user_id):
+        return self.backend.add(self._lock_key(user_id), os.getpid(), timeout=self.lock_timeout)
+
+    @staticmethod
+    def _pending_key(user_id):
+        return 'cart:pending:%s' % user_id
+
+    @staticmethod
+    def _lock_key(user_id):
+        return 'cart:flushing:%s' % user_id
+
+    def _start(self):
+        # A flusher thread inherited across gunicorn's fork is not running; start one per process
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='cart-flusher', daemon=True).start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write cart changes')
+
+    def close(self):
+        """Stop the flusher and write what is still pending"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._pid is not None:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write cart changes on shutdown')
+
+    def stats(self):
+        return dict(self._counters)
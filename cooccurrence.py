@@ -0,0 +1,133 @@
+"""
+Streaming item-item co-occurrence with time decay.
+
+Each interaction event is paired with the items the same session touched
+recently, and every pair bumps the co-occurrence score of both items. Per
+item only the ``k`` strongest partners are kept, in fixed-size numpy rows,
+using the space-saving rule: a new partner replaces the weakest slot and
+inherits its score. Memory is therefore ``max_items * k`` slots no matter
+how many events arrive.
+
+Decay uses forward decay: an event at time ``t`` adds
+``weight * 2 ** ((t - landmark) / half_life)``, so old scores never need to
+be touched on update and relative order is preserved. Reads divide by the
+same factor for ``now``. When the factor grows large every score is
+rescaled and the landmark moves forward.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+EMPTY = -1
+# Rescale before 2 ** exponent gets anywhere near float64 overflow
+MAX_EXPONENT = 60.0
+
+
+class CoOccurrence:
+    """Bounded top-k co-occurrence counts per item, fed by session events"""
+
+    def __init__(self, k=20, max_items=100000, half_life=6 * 3600, session_items=20,
+                 session_timeout=1800, max_sessions=100000):
+        self.k = k
+        self.max_items = max_items
+        self.half_life = float(half_life)
+        self.session_items = session_items
+        self.session_timeout = session_timeout
+        self.max_sessions = max_sessions
+        self.landmark = None
+        capacity = min(max_items, 1024)
+        self.partners = np.full((capacity, k), EMPTY, dtype=np.int64)
+        self.scores = np.zeros((capacity, k), dtype=np.float64)
+        self.last_update = np.zeros(capacity, dtype=np.float64)
+        self.items = np.full(capacity, EMPTY, dtype=np.int64)
+        self.rows = {}
+        self.sessions = OrderedDict()
+        self.events = 0
+        self._lock = threading.Lock()
+
+    def _boost(self, now):
+        if self.landmark is None:
+            self.landmark = now
+        exponent = (now - self.landmark) / self.half_life
+        if exponent > MAX_EXPONENT:
+            self.scores *= 2.0 ** -exponent
+            self.landmark = now
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def _row(self, item):
+        row = self.rows.get(item)
+        if row is not None:
+            return row
+        row = len(self.rows)
+        if row >= self.max_items:
+            # Full: recycle the row of the item that has gone quiet the longest
+            row = int(np.argmin(self.last_update))
+            del self.rows[int(self.items[row])]
+            self.partners[row] = EMPTY
+            self.scores[row] = 0.0
+        elif row >= len(self.partners):
+            grow = min(self.max_items, len(self.partners) * 2) - len(self.partners)
+            self.partners = np.vstack([self.partners, np.full((grow, self.k), EMPTY, dtype=np.int64)])
+            self.scores = np.vstack([self.scores, np.zeros((grow, self.k))])
+            self.last_update = np.concatenate([self.last_update, np.zeros(grow)])
+            self.items = np.concatenate([self.items, np.full(grow, EMPTY, dtype=np.int64)])
+        self.rows[item] = row
+        self.items[row] = item
+        return row
+
+    def _bump(self, item, partner, amount, now):
+        row = self._row(item)
+        self.last_update[row] = now
+        partners = self.partners[row]
+        hit = np.flatnonzero(partners == partner)
+        if len(hit):
+            self.scores[row, hit[0]] += amount
+            return
+        # Space-saving: take an empty slot, else evict the weakest and inherit its score
+        slot = int(np.argmin(self.scores[row]))
+        partners[slot] = partner
+        self.scores[row, slot] += amount
+
+    def _session(self, session_id, now):
+        recent = self.sessions.pop(session_id, None)
+        if recent is None or (recent and now - recent[-1][1] > self.session_timeout):
+            recent = deque(maxlen=self.session_items)
+        self.sessions[session_id] = recent
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return recent
+
+    def add(self, session_id, item, weight=1.0, now=None):
+        """Record that ``session_id`` interacted with ``item``"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.events += 1
+            recent = self._session(session_id, now)
+            amount = weight * self._boost(now)
+            for other, _ in recent:
+                if other != item:
+                    self._bump(item, other, amount, now)
+                    self._bump(other, item, amount, now)
+            recent.append((item, now))
+
+    def related(self, item, n=10, now=None):
+        """[(partner, decayed score)] for ``item``, strongest first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self.rows.get(item)
+            if row is None:
+                return []
+            partners = self.partners[row].copy()
+            scores = self.scores[row] / self._boost(now)
+        order = np.argsort(-scores, kind='stable')[:n]
+        return [(int(partners[i]), float(scores[i])) for i in order if partners[i] != EMPTY and scores[i] > 0]
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self.rows), 'sessions': len(self.sessions), 'events': self.events,
+                    'bytes': self.partners.nbytes + self.scores.nbytes + self.last_update.nbytes
+                    + self.items.nbytes}
@@ -0,0 +1,149 @@
+"""
+Connection pooling and read-replica routing for the production app.
+
+Pool sizes are derived from the gunicorn worker/thread counts so that all
+workers together stay under the database's connection limit. Views marked
+with ``@read_only`` send their SELECTs to ``DATABASE_REPLICA_URL`` when one
+is configured; flushes always go to the primary, and a client that just
+wrote is pinned to the primary for a few seconds to read its own writes.
+"""
+
+import inspect
+import os
+import threading
+import time
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import g, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.pool import QueuePool
+
+REPLICA_BIND = 'replica'
+
+
+class PoolMetrics:
+    """Checkout wait times per pool, kept in a bounded window"""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._waits = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            waits = self._waits.setdefault(name, [])
+            waits.append(seconds)
+            if len(waits) > self.window:
+                del waits[:len(waits) - self.window]
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for name, waits in self._waits.items():
+                ordered = sorted(waits)
+                out[name] = {
+                    'checkouts': self._counts[name],
+                    'wait_avg_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+                    'wait_p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+                    'wait_max_ms': round(ordered[-1] * 1000, 3),
+                }
+            return out
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    metrics_name = 'primary'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record(self.metrics_name, time.perf_counter() - started)
+
+
+class ReplicaTimedQueuePool(TimedQueuePool):
+    metrics_name = REPLICA_BIND
+
+
+def pool_options(url, workers=None, threads=None, max_connections=None, pool_class=TimedQueuePool):
+    """Engine options sized so workers * (pool_size + overflow) fits max_connections"""
+    parsed = sa.engine.make_url(url)
+    if parsed.drivername.startswith('sqlite') and parsed.database in (None, '', ':memory:'):
+        # Flask-SQLAlchemy uses a StaticPool here; sizing options do not apply
+        return {}
+
+    workers = workers or int(os.environ.get('WEB_CONCURRENCY', 4))
+    threads = threads or int(os.environ.get('GUNICORN_THREADS', 8))
+    max_connections = max_connections or int(os.environ.get('DB_MAX_CONNECTIONS', 100))
+    # Keep a few connections free for migrations, psql and the Celery worker
+    budget = max(1, (max_connections - 10) // workers)
+    pool_size = max(1, min(threads, budget // 2 or 1))
+    return {
+        'poolclass': pool_class,
+        'pool_size': pool_size,
+        'max_overflow': max(0, min(threads, budget) - pool_size),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+
+def configure(config):
+    """Fill SQLALCHEMY_ENGINE_OPTIONS and the replica bind on a config object"""
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options(config['SQLALCHEMY_DATABASE_URI'])
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = dict(url=replica_url,
+                                   **pool_options(replica_url, pool_class=ReplicaTimedQueuePool))
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+class RoutingSession(Session):
+    """Session that sends reads in @read_only views to the replica engine"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and g and g.get('db_read_only'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_read_only():
+    if session.get('primary_until', 0) < time.time():
+        g.db_read_only = True
+
+
+def read_only(f):
+    """Route this view's queries to the replica unless the client just wrote"""
+    if inspect.iscoroutinefunction(f):
+        @wraps(f)
+        async def async_decorated_function(*args, **kwargs):
+            _mark_read_only()
+            return await f(*args, **kwargs)
+        return async_decorated_function
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        _mark_read_only()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def init_app(app):
+    pin_seconds = app.config.get('DB_REPLICA_PIN_SECONDS', 5)
+
+    @app.after_request
+    def pin_writers_to_primary(response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and app.config.get('DATABASE_REPLICA_URL'):
+            session['primary_until'] = time.time() + pin_seconds
+        return response
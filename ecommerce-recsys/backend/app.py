@@ -1,6 +1,18 @@
+import os
+import sys
+
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+from catalog import Catalog
+from http_cache import cached_json
+from interactions import InteractionStore
+from neighbours import Neighbours
+
+# The typeahead index is shared with the Flask apps at the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from autocomplete import Autocomplete
+
 app = Flask(__name__)
 CORS(app)
 
@@ -65,50 +77,149 @@ products = [
     }
 ]
 
+try:
+    catalog = Catalog.from_csv()
+except OSError:
+    # No dataset checked out: serve the sample products instead
+    catalog = Catalog(products)
+
+neighbours = Neighbours(catalog)
+neighbours.start_background()
+interactions = InteractionStore()
+completions = Autocomplete(catalog.completion_entries())
+
+# Bumps whenever the product data changes, invalidating cached bodies and ETags
+DATA_VERSION = catalog.version
+
+DEFAULT_PAGE_SIZE = 60
+MAX_PAGE_SIZE = 500
+PAGE_SECTIONS = ('product', 'recommendations', 'related', 'reviews')
+
+
+def project(record, fields):
+    if not fields:
+        return record
+    return {key: record[key] for key in fields if key in record}
+
+
+def related_positions(position, limit):
+    """Other products from the same category, best rated first"""
+    category = catalog.records[position]['category']
+    related = []
+    for candidate in catalog.trending_in_category(category):
+        if candidate != position:
+            related.append(candidate)
+            if len(related) == limit:
+                break
+    return related
+
+
+def review_summary(product):
+    rating = product['rating']
+    return {
+        'average_rating': rating,
+        'review_count': product['review_count'],
+        'label': 'Excellent' if rating >= 4.5 else 'Very good' if rating >= 4 else
+                 'Good' if rating >= 3 else 'Mixed' if rating > 0 else 'No reviews yet',
+    }
+
 # Routes
 @app.route('/')
 def home():
-    return jsonify({'message': 'Ecommerce RecSys API is running!'})
+    return jsonify({'message': 'Ecommerce RecSys API is running!', 'products': len(catalog)})
 
 @app.route('/api/products')
 def get_products():
     category = request.args.get('category')
     search = request.args.get('search')
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(MAX_PAGE_SIZE, max(1, request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)))
     
-    filtered_products = products
-    
-    if category:
-        filtered_products = [p for p in filtered_products if p['category'] == category]
-    
-    if search:
-        filtered_products = [p for p in filtered_products if search.lower() in p['name'].lower()]
-    
-    return jsonify(filtered_products)
+    return cached_json(DATA_VERSION, lambda: catalog.filter(category, search, offset, limit))
+
+@app.route('/api/autocomplete')
+def autocomplete():
+    limit = min(completions.k, max(1, request.args.get('limit', 8, type=int)))
+    return cached_json(DATA_VERSION, lambda: completions.complete(request.args.get('q', ''), limit),
+                       'public, max-age=3600')
 
 @app.route('/api/products/<int:product_id>')
 def get_product(product_id):
-    product = next((p for p in products if p['id'] == product_id), None)
+    product = catalog.get(product_id)
     if product:
         return jsonify(product)
     return jsonify({'error': 'Product not found'}), 404
 
+@app.route('/api/products/<int:product_id>/page')
+def get_product_page(product_id):
+    """Everything the product detail page needs in one response"""
+    position = catalog.position_of.get(product_id)
+    if position is None:
+        return jsonify({'error': 'Product not found'}), 404
+    top_n = min(neighbours.top_n, max(1, request.args.get('top_n', 4, type=int)))
+    sections = [f for f in request.args.get('fields', '').split(',') if f in PAGE_SECTIONS] or PAGE_SECTIONS
+    item_fields = [f for f in request.args.get('item_fields', '').split(',') if f]
+
+    def build():
+        product = catalog.records[position]
+        page = {}
+        if 'product' in sections:
+            page['product'] = project(product, item_fields)
+        if 'recommendations' in sections:
+            similar, scores = neighbours.similar(position, top_n)
+            page['recommendations'] = [dict(project(catalog.records[p], item_fields), score=round(score, 4))
+                                       for p, score in zip(similar, scores)]
+        if 'related' in sections:
+            page['related'] = [project(catalog.records[p], item_fields) for p in related_positions(position, top_n)]
+        if 'reviews' in sections:
+            page['reviews'] = review_summary(product)
+        return page
+
+    return cached_json(DATA_VERSION, build, 'public, max-age=300')
+
 @app.route('/api/products/trending')
 def get_trending():
-    return jsonify(sorted(products, key=lambda x: x['rating'], reverse=True)[:3])
+    return cached_json(DATA_VERSION, lambda: catalog.trending(3), 'public, max-age=300')
 
 @app.route('/api/recommendations/product/<int:product_id>')
 def get_recommendations(product_id):
-    product = next((p for p in products if p['id'] == product_id), None)
-    if product:
-        # Simple recommendation: same category, different product
-        recommendations = [p for p in products if p['category'] == product['category'] and p['id'] != product_id]
-        return jsonify(recommendations[:3])
-    return jsonify([])
+    def build():
+        position = catalog.position_of.get(product_id)
+        if position is None:
+            return []
+        similar, _ = neighbours.similar(position, 3)
+        return [catalog.records[p] for p in similar]
+    
+    return cached_json(DATA_VERSION, build, 'public, max-age=300')
+
+@app.route('/api/users/<int:user_id>/interactions', methods=['POST'])
+def record_interaction(user_id):
+    data = request.get_json(silent=True) or {}
+    position = catalog.position_of.get(data.get('product_id'))
+    if position is None:
+        return jsonify({'error': 'Product not found'}), 404
+    try:
+        interactions.record(user_id, position, data.get('type', 'view'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Fill the neighbour rows now so the next recommendation read stays cheap
+    neighbours.ensure([position])
+    return jsonify({'status': 'ok'}), 201
 
 @app.route('/api/recommendations/user/<int:user_id>')
 def get_user_recommendations(user_id):
-    # Return top rated products as user recommendations
-    return jsonify(sorted(products, key=lambda x: x['rating'], reverse=True)[:4])
+    limit = min(MAX_PAGE_SIZE, max(1, request.args.get('limit', 4, type=int)))
+
+    def build():
+        positions, weights = interactions.weighted_history(user_id)
+        recommended, scores = neighbours.recommend(positions, weights, interactions.purchased(user_id), limit)
+        if not recommended:
+            # No history yet: fall back to the best rated products
+            return catalog.trending(limit)
+        return [dict(catalog.records[p], score=round(score, 4)) for p, score in zip(recommended, scores)]
+
+    # The user's interaction version is part of the key, so new activity invalidates it
+    return cached_json('%s:%s' % (DATA_VERSION, interactions.version(user_id)), build, 'private, no-cache')
 
 if __name__ == '__main__':
     print("Starting Ecommerce RecSys Backend on http://localhost:5000")
@@ -0,0 +1,166 @@
+"""
+Indexed in-memory product catalog for the React backend.
+
+Loads the same ``clean_data.csv`` the ML apps use and builds the lookups the
+API needs once at startup: id -> record, category -> ids, a precomputed
+trending order and a token index for search. Every request is then a dict
+lookup or a posting-list intersection instead of a scan over all products.
+"""
+
+import bisect
+import csv
+import hashlib
+import json
+import os
+import re
+import zlib
+
+DEFAULT_CSV = os.path.join(os.path.dirname(__file__), '..', '..',
+                           'E-Commerece-Recommendation-System-Machine-Learning-Product-Recommendation-system-',
+                           'models', 'clean_data.csv')
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _demo_price(name):
+    # clean_data.csv has no prices; give each product a stable demo price
+    # (the Jinja templates use a placeholder price the same way)
+    return round(5 + zlib.crc32(name.encode('utf-8')) % 9500 / 100.0, 2)
+
+
+def record_from_row(product_id, row):
+    """Map a clean_data.csv row onto the product shape the frontend expects"""
+    name = row.get('Name') or ''
+    category = (row.get('Category') or 'unknown').split(',')[0].strip() or 'unknown'
+    return {
+        'id': product_id,
+        'name': name,
+        'brand': (row.get('Brand') or '').split(',')[0].strip(),
+        'price': _float(row.get('Price'), None) or _demo_price(name),
+        'description': row.get('Description') or '',
+        'category': category,
+        'image_url': (row.get('ImageURL') or '').split('|')[0].strip(),
+        'rating': _float(row.get('Rating')),
+        'review_count': int(_float(row.get('ReviewCount'))),
+        'stock': int(_float(row.get('Stock'), 10)),
+    }
+
+
+class Catalog:
+    """Product records plus the indexes used by the API routes"""
+
+    def __init__(self, records, tags=None):
+        self.records = list(records)
+        # Free-text tags used for content similarity; not part of the API payload
+        self.tags = list(tags) if tags is not None else [
+            ' '.join([p['name'], p.get('brand', ''), p['category'], p.get('description', '')]) for p in self.records]
+        self.by_id = {}
+        self.position_of = {}
+        # Category and token posting lists are filled in position order and stay sorted
+        self.by_category = {}
+        self.tokens = {}
+        for position, product in enumerate(self.records):
+            self.by_id[product['id']] = product
+            self.position_of[product['id']] = position
+            self.by_category.setdefault(product['category'], []).append(position)
+            for token in set(tokenize(product['name'])):
+                self.tokens.setdefault(token, []).append(position)
+        self.vocabulary = sorted(self.tokens)
+        self.trending_order = sorted(range(len(self.records)),
+                                     key=lambda i: (self.records[i]['rating'], self.records[i]['review_count']),
+                                     reverse=True)
+        self.trending_by_category = {}
+        for position in self.trending_order:
+            self.trending_by_category.setdefault(self.records[position]['category'], []).append(position)
+        self.version = hashlib.sha1(json.dumps([len(self.records)] + [p['id'] for p in self.records[:1000]])
+                                    .encode('utf-8')).hexdigest()[:12]
+
+    @classmethod
+    def from_csv(cls, path=None):
+        path = path or os.environ.get('CATALOG_CSV', DEFAULT_CSV)
+        records, tags = [], []
+        with open(path, newline='', encoding='utf-8') as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                records.append(record_from_row(i + 1, row))
+                tags.append(row.get('Tags') or '')
+        catalog = cls(records, tags)
+        catalog.version = '%s-%d' % (catalog.version, int(os.path.getmtime(path)))
+        return catalog
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, product_id):
+        return self.by_id.get(product_id)
+
+    def trending(self, limit=10):
+        return [self.records[i] for i in self.trending_order[:limit]]
+
+    def trending_in_category(self, category):
+        """Positions in ``category``, best rated first"""
+        return self.trending_by_category.get(category, [])
+
+    def completion_entries(self):
+        """(text, kind, weight) rows for the typeahead index; popularity is the review count"""
+        entries = []
+        for product in self.records:
+            weight = 1 + product['review_count']
+            entries.append((product['name'], 'product', weight))
+            entries.append((product['brand'], 'brand', weight))
+            entries.append((product['category'], 'category', weight))
+        return entries
+
+    def _token_positions(self, token):
+        """Positions of products with a name token starting with ``token``"""
+        start = bisect.bisect_left(self.vocabulary, token)
+        end = bisect.bisect_left(self.vocabulary, token + '\uffff')
+        if end - start == 1:
+            return set(self.tokens[self.vocabulary[start]])
+        positions = set()
+        for word in self.vocabulary[start:end]:
+            positions.update(self.tokens[word])
+        return positions
+
+    def search_positions(self, query):
+        """Positions matching every query token (the last one as a prefix)"""
+        terms = tokenize(query)
+        if not terms:
+            return None
+        # Start from the shortest posting list so the intersections stay small
+        exact = sorted(set(terms[:-1]), key=lambda t: len(self.tokens.get(t, ())))
+        result = None
+        for term in exact:
+            positions = self.tokens.get(term, ())
+            result = set(positions) if result is None else result.intersection(positions)
+            if not result:
+                return set()
+        prefix = self._token_positions(terms[-1])
+        return prefix if result is None else result & prefix
+
+    def filter(self, category=None, search=None, offset=0, limit=None):
+        """Products in catalog order matching the optional category and search"""
+        # Posting lists are built in catalog order, so a category page is a plain slice
+        ordered = self.by_category.get(category, []) if category else None
+        matches = self.search_positions(search) if search else None
+        if matches is not None:
+            if ordered is None:
+                ordered = sorted(matches)
+            elif len(matches) < len(ordered):
+                ordered = sorted(p for p in matches if self.records[p]['category'] == category)
+            else:
+                ordered = [p for p in ordered if p in matches]
+        if ordered is None:
+            ordered = range(len(self.records))
+        end = None if limit is None else offset + limit
+        return [self.records[i] for i in ordered[offset:end]]
@@ -0,0 +1,50 @@
+"""
+ETag / conditional GET and precompressed JSON bodies for the React API.
+
+Bodies are serialised and gzipped once per (data version, URL) and the
+ETag is a hash of the body, so polling clients get ``304 Not Modified``
+without the server re-encoding anything.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+from flask import request, Response
+
+_bodies = {}
+_lock = threading.Lock()
+MAX_ENTRIES = 4096
+
+
+def _encode(payload):
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    etag = hashlib.sha1(raw).hexdigest()[:24]
+    compressed = gzip.compress(raw, compresslevel=6) if len(raw) >= 512 else None
+    return etag, raw, compressed
+
+
+def cached_json(version, build, cache_control='public, max-age=60'):
+    """Serve ``build()`` as JSON with an ETag, 304 handling and gzip"""
+    key = (version, request.full_path)
+    entry = _bodies.get(key)
+    if entry is None:
+        entry = _encode(build())
+        with _lock:
+            if len(_bodies) >= MAX_ENTRIES:
+                _bodies.clear()
+            _bodies[key] = entry
+    etag, raw, compressed = entry
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    elif compressed is not None and 'gzip' in request.accept_encodings:
+        response = Response(compressed, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(raw, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
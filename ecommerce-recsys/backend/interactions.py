@@ -0,0 +1,57 @@
+"""
+Per-user cart and order history for the React backend.
+
+Keeps the most recent interactions per user plus the set of purchased
+products, and a version counter that bumps on every new interaction so the
+personalised recommendations cached for that user are invalidated.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# How strongly each kind of interaction pulls in its neighbours
+WEIGHTS = {'view': 0.5, 'cart': 1.0, 'order': 2.0}
+
+
+class InteractionStore:
+    """Recent interactions per user, kept in memory"""
+
+    def __init__(self, history=50, half_life=7 * 24 * 3600):
+        self.history = history
+        self.half_life = half_life
+        self._recent = {}
+        self._purchased = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id, position, kind):
+        if kind not in WEIGHTS:
+            raise ValueError('unknown interaction type: %s' % kind)
+        with self._lock:
+            recent = self._recent.setdefault(user_id, deque(maxlen=self.history))
+            recent.append((position, WEIGHTS[kind], time.time()))
+            if kind == 'order':
+                self._purchased.setdefault(user_id, set()).add(position)
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def version(self, user_id):
+        return self._versions.get(user_id, 0)
+
+    def purchased(self, user_id):
+        with self._lock:
+            return set(self._purchased.get(user_id, ()))
+
+    def weighted_history(self, user_id):
+        """(positions, weights) with weights decayed by age; repeats add up"""
+        with self._lock:
+            recent = list(self._recent.get(user_id, ()))
+        if not recent:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        positions = np.fromiter((p for p, _, _ in recent), dtype=np.int32, count=len(recent))
+        weights = np.fromiter((w for _, w, _ in recent), dtype=np.float32, count=len(recent))
+        ages = time.time() - np.fromiter((t for _, _, t in recent), dtype=np.float64, count=len(recent))
+        weights *= np.exp2(-ages / self.half_life).astype(np.float32)
+        return positions, weights
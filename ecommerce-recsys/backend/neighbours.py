@@ -0,0 +1,101 @@
+"""
+Precomputed content-based neighbours for the catalog.
+
+Product tags are vectorised once with TF-IDF and each product's top-N most
+similar products are kept in a dense ``(n, top_n)`` int32 table. The table
+is filled in blocks by a background thread at startup; a product page
+requested before its block is done computes its own row on the spot and
+stores it, so every row is computed at most once.
+"""
+
+import threading
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+MISSING = -1
+
+
+class Neighbours:
+    """Top-N similar catalog positions per product"""
+
+    def __init__(self, catalog, top_n=20, max_features=5000):
+        self.catalog = catalog
+        self.top_n = top_n
+        size = len(catalog)
+        self.positions = np.full((size, top_n), MISSING, dtype=np.int32)
+        self.scores = np.zeros((size, top_n), dtype=np.float32)
+        self._done = np.zeros(size, dtype=bool)
+        self._lock = threading.Lock()
+        if size:
+            vectorizer = TfidfVectorizer(stop_words='english', max_features=max_features, dtype=np.float32)
+            # TF-IDF rows are L2-normalised, so the dot product is the cosine similarity
+            self.matrix = vectorizer.fit_transform(catalog.tags).tocsr()
+        else:
+            self.matrix = None
+
+    def _compute(self, start, stop):
+        similarity = (self.matrix[start:stop] @ self.matrix.T).toarray()
+        rows = np.arange(stop - start)
+        similarity[rows, rows + start] = -1.0
+        k = min(self.top_n, similarity.shape[1] - 1)
+        if k <= 0:
+            return
+        top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        with self._lock:
+            self.positions[start:stop, :k] = np.where(top_scores > 0, top, MISSING)
+            self.scores[start:stop, :k] = np.maximum(top_scores, 0)
+            self._done[start:stop] = True
+
+    def precompute(self, block_size=256):
+        """Fill the whole table; meant to run on a background thread"""
+        for start in range(0, len(self.catalog), block_size):
+            stop = min(start + block_size, len(self.catalog))
+            if not self._done[start:stop].all():
+                self._compute(start, stop)
+
+    def start_background(self, block_size=256):
+        thread = threading.Thread(target=self.precompute, args=(block_size,),
+                                  name='neighbours-precompute', daemon=True)
+        thread.start()
+        return thread
+
+    def ensure(self, positions):
+        """Compute any rows of ``positions`` the background pass has not reached"""
+        for position in np.unique(positions):
+            if not self._done[position]:
+                self._compute(position, position + 1)
+
+    def similar(self, position, limit=None):
+        """(positions, scores) of the products most similar to ``position``"""
+        if self.matrix is None:
+            return [], []
+        self.ensure([position])
+        limit = min(limit or self.top_n, self.top_n)
+        row = self.positions[position, :limit]
+        keep = row != MISSING
+        return row[keep].tolist(), self.scores[position, :limit][keep].tolist()
+
+    def recommend(self, positions, weights, exclude=(), limit=10):
+        """Top products by the weighted sum of the neighbour scores of ``positions``"""
+        if self.matrix is None or not len(positions):
+            return [], []
+        self.ensure(positions)
+        candidates = self.positions[positions].ravel()
+        contributions = (self.scores[positions] * weights[:, None]).ravel()
+        keep = candidates != MISSING
+        candidates, contributions = candidates[keep], contributions[keep]
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=contributions).astype(np.float32)
+        if len(exclude):
+            totals[np.isin(unique, np.fromiter(exclude, dtype=np.int32, count=len(exclude)))] = 0
+        k = min(limit, int(np.count_nonzero(totals > 0)))
+        if not k:
+            return [], []
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top], kind='stable')]
+        return unique[top].tolist(), totals[top].tolist()
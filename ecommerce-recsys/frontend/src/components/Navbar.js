@@ -1,19 +1,33 @@
 import React, { useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
+import { useQuery } from 'react-query';
 import { MagnifyingGlassIcon, ShoppingCartIcon, Bars3Icon, XMarkIcon } from '@heroicons/react/24/outline';
 import useStore from '../store/useStore';
+import { fetchCompletions } from '../utils/api';
 
 const Navbar = () => {
   const [isMenuOpen, setIsMenuOpen] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
   const { cartCount } = useStore();
   const navigate = useNavigate();
+  const prefix = searchQuery.trim().toLowerCase();
+
+  // One cheap request per keystroke; responses are cacheable, so repeats never leave the browser
+  const { data: completions = [] } = useQuery(
+    ['completions', prefix],
+    () => fetchCompletions(prefix),
+    { enabled: prefix.length > 0, staleTime: Infinity, keepPreviousData: true }
+  );
+
+  const goToSearch = (text) => {
+    navigate(`/products?search=${encodeURIComponent(text)}`);
+    setSearchQuery('');
+  };
 
   const handleSearch = (e) => {
     e.preventDefault();
     if (searchQuery.trim()) {
-      navigate(`/products?search=${encodeURIComponent(searchQuery.trim())}`);
-      setSearchQuery('');
+      goToSearch(searchQuery.trim());
     }
   };
 
@@ -41,6 +55,22 @@ const Navbar = () => {
                   className="w-full pl-10 pr-4 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-primary-500 focus:border-transparent"
                 />
                 <MagnifyingGlassIcon className="absolute left-3 top-2.5 h-5 w-5 text-gray-400" />
+                {prefix && completions.length > 0 && (
+                  <ul className="absolute left-0 right-0 mt-1 bg-white border border-gray-200 rounded-lg shadow-lg">
+                    {completions.map((item) => (
+                      <li key={`${item.type}:${item.text}`}>
+                        <button
+                          type="button"
+                          onClick={() => goToSearch(item.text)}
+                          className="w-full flex justify-between px-4 py-2 text-left text-gray-700 hover:bg-gray-50"
+                        >
+                          <span className="truncate">{item.text}</span>
+                          <span className="ml-2 text-xs text-gray-400">{item.type}</span>
+                        </button>
+                      </li>
+                    ))}
+                  </ul>
+                )}
               </div>
             </form>
           </div>
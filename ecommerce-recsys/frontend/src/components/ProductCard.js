@@ -4,16 +4,18 @@ import { motion } from 'framer-motion';
 import { StarIcon, ShoppingCartIcon } from '@heroicons/react/24/solid';
 import { HeartIcon as HeartOutlineIcon } from '@heroicons/react/24/outline';
 import useStore from '../store/useStore';
+import { recordInteraction } from '../utils/api';
 import toast from 'react-hot-toast';
 
 const ProductCard = ({ product }) => {
-  const { addToCart } = useStore();
+  const { addToCart, userId } = useStore();
 
   const handleAddToCart = (e) => {
     e.preventDefault();
     e.stopPropagation();
     
     addToCart(product, 1, 'M', 'Default');
+    recordInteraction(userId, product.id, 'cart').catch(() => {});
     toast.success('Added to cart!');
   };
 
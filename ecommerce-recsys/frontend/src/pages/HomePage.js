@@ -2,12 +2,22 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import { ArrowRightIcon, SparklesIcon, ShieldCheckIcon, TruckIcon } from '@heroicons/react/24/outline';
+import { useQuery } from 'react-query';
 import ProductCard from '../components/ProductCard';
-import { fetchTrendingProducts } from '../utils/api';
+import { fetchTrendingProducts, fetchRecommendations } from '../utils/api';
+import useStore from '../store/useStore';
 
 const HomePage = () => {
   const [trendingProducts, setTrendingProducts] = useState([]);
   const [loading, setLoading] = useState(true);
+  const { userId } = useStore();
+
+  // Built from this visitor's views and cart adds; best rated products until there are some
+  const { data: recommended = [] } = useQuery(
+    ['user-recommendations', userId],
+    () => fetchRecommendations(userId),
+    { staleTime: 60 * 1000 }
+  );
 
   useEffect(() => {
     const loadTrending = async () => {
@@ -152,6 +162,21 @@ const HomePage = () => {
           )}
         </div>
       </section>
+
+      {/* Personalised Recommendations */}
+      {recommended.length > 0 && (
+        <section className="py-16 bg-white">
+          <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8">
+            <h2 className="text-3xl font-bold text-gray-900 mb-2">Recommended for You</h2>
+            <p className="text-gray-600 mb-8">Based on what you've viewed and added to your cart</p>
+            <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6">
+              {recommended.map((product) => (
+                <ProductCard key={product.id} product={product} />
+              ))}
+            </div>
+          </div>
+        </section>
+      )}
     </div>
   );
 };
@@ -1,10 +1,10 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import { StarIcon, HeartIcon, ShoppingCartIcon, TruckIcon, ShieldCheckIcon } from '@heroicons/react/24/outline';
 import { StarIcon as StarSolidIcon, HeartIcon as HeartSolidIcon } from '@heroicons/react/24/solid';
 import { useQuery } from 'react-query';
-import { fetchProduct, fetchProductRecommendations } from '../utils/api';
+import { fetchProductPage, recordInteraction } from '../utils/api';
 import ProductCard from '../components/ProductCard';
 import useStore from '../store/useStore';
 import toast from 'react-hot-toast';
@@ -17,22 +17,20 @@ const ProductDetailPage = () => {
   const [selectedImage, setSelectedImage] = useState(0);
   const [isWishlisted, setIsWishlisted] = useState(false);
 
-  const { addToCart, isAuthenticated } = useStore();
+  const { addToCart, isAuthenticated, userId } = useStore();
 
-  const { data: product, isLoading, error } = useQuery(
-    ['product', id],
-    () => fetchProduct(id),
+  // Product, recommendations and review summary arrive in a single request
+  const { data: page, isLoading, error } = useQuery(
+    ['product-page', id],
+    () => fetchProductPage(id, { top_n: 4, fields: 'product,recommendations' }),
     { staleTime: 5 * 60 * 1000 }
   );
+  const product = page?.product;
+  const recommendations = page?.recommendations;
 
-  const { data: recommendations } = useQuery(
-    ['product-recommendations', id],
-    () => fetchProductRecommendations(id, 4),
-    { 
-      enabled: !!product,
-      staleTime: 5 * 60 * 1000 
-    }
-  );
+  useEffect(() => {
+    recordInteraction(userId, Number(id), 'view').catch(() => {});
+  }, [id, userId]);
 
   const handleAddToCart = () => {
     if (!isAuthenticated) {
@@ -51,6 +49,7 @@ const ProductDetailPage = () => {
     }
 
     addToCart(product, quantity, selectedSize || 'One Size', selectedColor || 'Default');
+    recordInteraction(userId, product.id, 'cart').catch(() => {});
     toast.success('Added to cart!');
   };
 
@@ -4,6 +4,9 @@ import { persist } from 'zustand/middleware';
 const useStore = create(
   persist(
     (set, get) => ({
+      // Anonymous visitor id; interactions and recommendations are keyed by it
+      userId: Math.floor(Math.random() * 2 ** 31),
+
       // Cart state
       cart: [],
       cartCount: 0,
@@ -64,6 +67,7 @@ const useStore = create(
     {
       name: 'ecommerce-store',
       partialize: (state) => ({
+        userId: state.userId,
         cart: state.cart,
         cartCount: state.cartCount,
       }),
@@ -20,6 +20,16 @@ export const fetchProduct = async (id) => {
   return response.data;
 };
 
+export const fetchProductPage = async (id, params = {}) => {
+  const response = await api.get(`/api/products/${id}/page`, { params });
+  return response.data;
+};
+
+export const fetchCompletions = async (q, params = {}) => {
+  const response = await api.get('/api/autocomplete', { params: { q, ...params } });
+  return response.data;
+};
+
 export const fetchTrendingProducts = async () => {
   const response = await api.get('/api/products/trending');
   return response.data;
@@ -30,6 +40,11 @@ export const fetchRecommendations = async (userId) => {
   return response.data;
 };
 
+export const recordInteraction = async (userId, productId, type = 'view') => {
+  const response = await api.post(`/api/users/${userId}/interactions`, { product_id: productId, type });
+  return response.data;
+};
+
 export const fetchProductRecommendations = async (productId) => {
   const response = await api.get(`/api/recommendations/product/${productId}`);
   return response.data;
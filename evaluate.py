@@ -0,0 +1,337 @@
+"""
+Offline evaluation of the recommenders: quality and cost side by side.
+
+Interactions are split by time: everything before the cutoff trains the
+models, and each user's later, not-yet-seen items are the ground truth.
+Every model scores all evaluated users in chunks (in parallel threads,
+since the sparse/dense products release the GIL), and precision@k,
+recall@k, NDCG@k and catalog coverage are computed with array operations
+per chunk. Single-user query latency and model memory are reported in the
+same table so the cheapest model that meets the quality bar is obvious.
+
+Usage::
+
+    python evaluate.py --data models/clean_data.csv -k 10
+    python evaluate.py --events /var/log/recsys/events --models popular,itemknn
+
+With ``--data`` alone the ``ID`` column is used as the user, ``ProdID`` as
+the item and row order as time (the dataset has no timestamps). Event-log
+items are database product ids; they are mapped to catalog rows by exact
+product name, read from ``--database``, and events that match no row are
+dropped.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from recommender import ContentRecommender, LSARecommender, name_index, normalize_query
+
+DEFAULT_DATA = os.path.join('E-Commerece-Recommendation-System-Machine-Learning-Product-Recommendation-system-',
+                            'models', 'clean_data.csv')
+
+
+def load_products(database_url):
+    """(id, name) of every product in the app database"""
+    from sqlalchemy import create_engine
+    engine = create_engine(database_url)
+    try:
+        return pd.read_sql('SELECT id, name FROM product', engine)
+    finally:
+        engine.dispose()
+
+
+def product_rows(products, catalog):
+    """{product id: catalog row} for products whose name matches a catalog name exactly"""
+    rows = name_index(catalog['Name'])
+    out = {}
+    for product_id, name in zip(products['id'], products['name']):
+        row = rows.get(normalize_query(name))
+        if row is not None:
+            out[int(product_id)] = row
+    return out
+
+
+def load_interactions(data, events=None, products=None):
+    """(catalog DataFrame, interactions DataFrame with user, item, ts)
+
+    ``products`` (id and name columns) is required with ``events``.
+    """
+    if 'ProdID' in data.columns:
+        catalog = data.drop_duplicates('ProdID').reset_index(drop=True)
+        position = pd.Series(np.arange(len(catalog)), index=catalog['ProdID'])
+    else:
+        catalog = data.reset_index(drop=True)
+        position = None
+    if events is not None:
+        from event_log import read_events
+        if products is None:
+            raise ValueError('event-log items are product ids; pass products to map them to catalog rows')
+        records = np.concatenate(list(read_events(events)))
+        items = pd.Series(records['item']).map(product_rows(products, catalog))
+        interactions = pd.DataFrame({'user': records['user'], 'item': items, 'ts': records['ts']})
+    else:
+        interactions = pd.DataFrame({
+            'user': data['ID'].to_numpy(),
+            'item': position.loc[data['ProdID']].to_numpy() if position is not None else np.arange(len(data)),
+            'ts': data['Timestamp'].to_numpy() if 'Timestamp' in data.columns else np.arange(len(data)),
+        })
+    return catalog, interactions.dropna()
+
+
+def temporal_split(interactions, n_items, test_fraction=0.2):
+    """Train and test user x item matrices split at a global time cutoff"""
+    cutoff = interactions['ts'].quantile(1 - test_fraction)
+    users, user_index = np.unique(interactions['user'].to_numpy(), return_inverse=True)
+    items = interactions['item'].to_numpy().astype(np.int64)
+    is_train = (interactions['ts'] < cutoff).to_numpy()
+    shape = (len(users), n_items)
+
+    def matrix(mask):
+        m = sp.csr_matrix((np.ones(mask.sum(), dtype=np.float32), (user_index[mask], items[mask])), shape=shape)
+        m.data[:] = 1.0
+        return m
+
+    train = matrix(is_train)
+    test = matrix(~is_train)
+    # Only judge items the user had not already interacted with before the cutoff
+    test = (test - test.multiply(train)).tocsr()
+    test.eliminate_zeros()
+    evaluated = np.flatnonzero((np.diff(train.indptr) > 0) & (np.diff(test.indptr) > 0))
+    return train, test, evaluated
+
+
+def _nbytes(*arrays):
+    total = 0
+    for a in arrays:
+        if sp.issparse(a):
+            a = a.tocsr()
+            total += a.data.nbytes + a.indices.nbytes + a.indptr.nbytes
+        elif a is not None:
+            total += a.nbytes
+    return total
+
+
+class PopularModel:
+    """Most-interacted items in the training window"""
+
+    name = 'popular'
+
+    def fit(self, train, catalog):
+        self.counts = np.asarray(train.sum(axis=0), dtype=np.float32).ravel()
+        return self
+
+    def score(self, history):
+        return np.broadcast_to(self.counts, (history.shape[0], len(self.counts))).copy()
+
+    def nbytes(self):
+        return _nbytes(self.counts)
+
+
+class ContentModel:
+    """TF-IDF profile of each user's history, as in ContentRecommender.similar_to_many"""
+
+    name = 'content'
+
+    def fit(self, train, catalog):
+        self.matrix = ContentRecommender(catalog).matrix
+        return self
+
+    def score(self, history):
+        profiles = history @ self.matrix
+        return np.asarray((profiles @ self.matrix.T).todense(), dtype=np.float32)
+
+    def nbytes(self):
+        return _nbytes(self.matrix)
+
+
+class LSAModel:
+    """Dense LSA embeddings of the tags; user profile is the sum of history embeddings"""
+
+    name = 'lsa'
+
+    def fit(self, train, catalog):
+        self.embeddings = LSARecommender(catalog).embeddings
+        return self
+
+    def score(self, history):
+        return np.asarray((history @ self.embeddings) @ self.embeddings.T, dtype=np.float32)
+
+    def nbytes(self):
+        return _nbytes(self.embeddings)
+
+
+class ItemKNNModel:
+    """Item-item cosine similarity over the training interactions"""
+
+    name = 'itemknn'
+
+    def fit(self, train, catalog):
+        norms = np.sqrt(np.asarray(train.multiply(train).sum(axis=0)).ravel())
+        normalised = train @ sp.diags(1.0 / np.maximum(norms, 1e-9)).astype(np.float32)
+        self.similarity = (normalised.T @ normalised).tocsr().astype(np.float32)
+        self.similarity.setdiag(0)
+        self.similarity.eliminate_zeros()
+        return self
+
+    def score(self, history):
+        return np.asarray((history @ self.similarity).todense(), dtype=np.float32)
+
+    def nbytes(self):
+        return _nbytes(self.similarity)
+
+
+class HybridModel:
+    """Blend of content and item-kNN scores, each max-normalised per user"""
+
+    name = 'hybrid'
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+
+    def fit(self, train, catalog):
+        self.content = ContentModel().fit(train, catalog)
+        self.itemknn = ItemKNNModel().fit(train, catalog)
+        return self
+
+    @staticmethod
+    def _normalise(scores):
+        return scores / np.maximum(scores.max(axis=1, keepdims=True), 1e-9)
+
+    def score(self, history):
+        return (self.alpha * self._normalise(self.content.score(history))
+                + (1 - self.alpha) * self._normalise(self.itemknn.score(history)))
+
+    def nbytes(self):
+        return self.content.nbytes() + self.itemknn.nbytes()
+
+
+MODELS = {cls.name: cls for cls in (PopularModel, ContentModel, LSAModel, ItemKNNModel, HybridModel)}
+
+
+def recommend(model, history, k):
+    """Top-k unseen items per row of ``history``, best first"""
+    scores = model.score(history)
+    rows, cols = history.nonzero()
+    scores[rows, cols] = -np.inf
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+def ranking_metrics(recommended, relevant):
+    """Per-user precision, recall and NDCG for (users, k) ids against a dense 0/1 relevance matrix"""
+    k = recommended.shape[1]
+    hits = np.take_along_axis(relevant, recommended, axis=1).astype(np.float32)
+    n_relevant = relevant.sum(axis=1).astype(np.float32)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, k).astype(np.int64) - 1]
+    return {
+        'precision': hits.sum(axis=1) / k,
+        'recall': hits.sum(axis=1) / np.maximum(n_relevant, 1),
+        'ndcg': (hits * discounts).sum(axis=1) / np.maximum(ideal, 1e-9),
+    }
+
+
+def evaluate_model(model, train, test, users, k=10, chunk_size=512, workers=4, latency_samples=200):
+    """Quality metrics over ``users`` plus latency and memory for one fitted model"""
+
+    def run_chunk(chunk):
+        recommended = recommend(model, train[chunk], k)
+        relevant = test[chunk].toarray() > 0
+        return recommended, ranking_metrics(recommended, relevant)
+
+    chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_chunk, chunks))
+    batch_seconds = time.perf_counter() - started
+
+    report = {'model': model.name, 'users': int(len(users))}
+    for metric in ('precision', 'recall', 'ndcg'):
+        values = np.concatenate([m[metric] for _, m in results]) if results else np.zeros(0)
+        report['%s@%d' % (metric, k)] = round(float(values.mean()), 4) if len(values) else 0.0
+    recommended_items = np.unique(np.concatenate([r.ravel() for r, _ in results])) if results else []
+    report['coverage'] = round(len(recommended_items) / train.shape[1], 4)
+
+    # Latency of answering one user at a time, as the web app would
+    timings = []
+    for user in users[:latency_samples]:
+        t = time.perf_counter()
+        recommend(model, train[[user]], k)
+        timings.append(time.perf_counter() - t)
+    timings.sort()
+    if timings:
+        report['p50_ms'] = round(timings[len(timings) // 2] * 1000, 3)
+        report['p99_ms'] = round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 3)
+    report['batch_users_per_s'] = round(len(users) / batch_seconds, 1) if batch_seconds else None
+    report['model_mb'] = round(model.nbytes() / 1e6, 3)
+    return report
+
+
+def run(data, model_names=('popular', 'content', 'lsa', 'itemknn', 'hybrid'), k=10, test_fraction=0.2,
+        events=None, chunk_size=512, workers=4, max_users=None, products=None):
+    catalog, interactions = load_interactions(data, events, products)
+    train, test, users = temporal_split(interactions, len(catalog), test_fraction)
+    if max_users:
+        users = users[:max_users]
+    reports = []
+    for name in model_names:
+        started = time.perf_counter()
+        model = MODELS[name]().fit(train, catalog)
+        fit_seconds = time.perf_counter() - started
+        report = evaluate_model(model, train, test, users, k, chunk_size, workers)
+        report['fit_s'] = round(fit_seconds, 3)
+        reports.append(report)
+    return reports
+
+
+def format_table(reports):
+    if not reports:
+        return 'no users to evaluate'
+    columns = []
+    for r in reports:
+        columns.extend(c for c in r if c not in columns)
+    widths = [max(len(c), *(len(str(r.get(c, ''))) for r in reports)) for c in columns]
+    lines = ['  '.join(c.ljust(w) for c, w in zip(columns, widths))]
+    for r in reports:
+        lines.append('  '.join(str(r.get(c, '')).ljust(w) for c, w in zip(columns, widths)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--data', default=DEFAULT_DATA, help='catalog CSV (clean_data.csv)')
+    parser.add_argument('--events', help='event log directory to use as interactions instead of the CSV')
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL') or 'sqlite:///instance/ecommerce.db',
+                        help='app database, to map event product ids to catalog rows')
+    parser.add_argument('--models', default=','.join(MODELS), help='comma-separated: %s' % ', '.join(MODELS))
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--test-fraction', type=float, default=0.2)
+    parser.add_argument('--chunk-size', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-users', type=int)
+    parser.add_argument('--json', action='store_true', help='print the reports as JSON')
+    args = parser.parse_args(argv)
+
+    data = pd.read_csv(args.data)
+    for column in ('Tags', 'Name'):
+        if column in data.columns:
+            data[column] = data[column].fillna('')
+    products = load_products(args.database) if args.events else None
+    reports = run(data, [m.strip() for m in args.models.split(',') if m.strip()], args.k, args.test_fraction,
+                  args.events, args.chunk_size, args.workers, args.max_users, products)
+    print(json.dumps(reports, indent=2) if args.json else format_table(reports))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
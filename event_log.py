@@ -0,0 +1,191 @@
+"""
+Append-only interaction event log.
+
+Request handlers call ``EventLog.log``, which only appends a tuple to an
+in-process ring buffer (a bounded deque, so it costs well under a
+microsecond and never blocks). A background thread drains the buffer every
+``flush_interval`` seconds and appends the batch to the current segment
+file as one zlib-compressed frame of numpy records. Segments roll over by
+size; closed segments are immutable and can be shipped or read while the
+app keeps writing.
+
+Segment layout: an 8-byte magic, then frames of
+``<uint32 compressed length><uint32 record count><zlib(records)>``.
+A frame cut short by a crash is ignored by the reader.
+
+If the buffer fills faster than the writer drains it, the oldest events are
+dropped and counted in ``stats()``; on graceful shutdown (``close`` or
+interpreter exit) everything still buffered is flushed.
+"""
+
+import atexit
+import glob
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'EVLOG001'
+FRAME = struct.Struct('<II')
+EVENT_DTYPE = np.dtype([('ts', '<f8'), ('user', '<i8'), ('item', '<i8'), ('kind', 'u1'), ('weight', '<f4')])
+KINDS = {'view': 0, 'wishlist': 1, 'cart': 2, 'order': 3, 'review': 4}
+
+
+def user_key(user):
+    """int64 id for a user; non-integer ids (usernames, session ids) are hashed"""
+    if user is None:
+        return 0
+    if isinstance(user, int):
+        return user
+    return int.from_bytes(hashlib.blake2b(str(user).encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class EventLog:
+    """Ring-buffered event logger with a background segment writer"""
+
+    def __init__(self, app=None, directory=None, flush_interval=1.0, buffer_size=100000,
+                 segment_bytes=64 * 1024 * 1024, compress_level=1):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.segment_bytes = segment_bytes
+        self.compress_level = compress_level
+        self._buffer = deque(maxlen=buffer_size)
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._closed = False
+        self._counters = {'logged': 0, 'written': 0, 'dropped': 0, 'frames': 0, 'segments': 0}
+        if app is not None:
+            self.init_app(app)
+        atexit.register(self.close)
+
+    def init_app(self, app):
+        self.directory = app.config.get('EVENT_LOG_DIR', self.directory)
+        self.flush_interval = app.config.get('EVENT_LOG_FLUSH_SECONDS', self.flush_interval)
+        self.buffer_size = app.config.get('EVENT_LOG_BUFFER', self.buffer_size)
+        self.segment_bytes = app.config.get('EVENT_LOG_SEGMENT_BYTES', self.segment_bytes)
+        self._buffer = deque(maxlen=self.buffer_size)
+        app.extensions['event_log'] = self
+
+    def log(self, user, item, kind, weight=1.0):
+        """Record one interaction; cheap enough to call on every request"""
+        if self.directory is None:
+            return
+        if self._pid != os.getpid():
+            self._start()
+        buffer = self._buffer
+        if len(buffer) == self.buffer_size:
+            self._counters['dropped'] += 1
+        buffer.append((time.time(), user_key(user), item, KINDS[kind], weight))
+        self._counters['logged'] += 1
+
+    def _start(self):
+        # A writer thread inherited across gunicorn's fork is not running; start one per process
+        with self._write_lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                logger.exception('Could not write interaction events')
+
+    def _segment(self):
+        if self._file is not None and self._file.tell() >= self.segment_bytes:
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            # Sortable names; the pid keeps workers sharing a directory apart
+            name = 'events-%d-%d-%06d.seg' % (int(time.time() * 1000), os.getpid(), self._counters['segments'])
+            self._file = open(os.path.join(self.directory, name), 'ab')
+            self._file.write(MAGIC)
+            self._counters['segments'] += 1
+        return self._file
+
+    def flush(self):
+        """Write everything buffered so far as one frame"""
+        with self._write_lock:
+            if self._pid != os.getpid():
+                return 0
+            buffer = self._buffer
+            batch = []
+            for _ in range(len(buffer)):
+                batch.append(buffer.popleft())
+            if not batch:
+                return 0
+            records = np.array(batch, dtype=EVENT_DTYPE)
+            payload = zlib.compress(records.tobytes(), self.compress_level)
+            f = self._segment()
+            f.write(FRAME.pack(len(payload), len(records)) + payload)
+            f.flush()
+            self._counters['written'] += len(records)
+            self._counters['frames'] += 1
+            return len(records)
+
+    def close(self):
+        """Flush what is buffered and stop the writer"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        out = dict(self._counters)
+        out['buffered'] = len(self._buffer)
+        return out
+
+
+def read_segment(path):
+    """Yield record arrays frame by frame from one segment file"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not an event log segment' % path)
+        while True:
+            header = f.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            length, count = FRAME.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            records = np.frombuffer(zlib.decompress(payload), dtype=EVENT_DTYPE)
+            if len(records) != count:
+                raise ValueError('corrupt frame in %s' % path)
+            yield records
+
+
+def read_events(directory, since=None):
+    """Stream record batches from every segment in ``directory``, oldest first"""
+    for path in sorted(glob.glob(os.path.join(directory, 'events-*.seg'))):
+        for records in read_segment(path):
+            if since is not None:
+                records = records[records['ts'] >= since]
+            if len(records):
+                yield records
@@ -0,0 +1,68 @@
+"""
+Misspelling-tolerant product-name lookup.
+
+A character trigram index narrows the catalog to the few names sharing the
+most trigrams with the query (blocking); only those candidates are scored
+with rapidfuzz's ``WRatio``, which handles both typos and a short query
+against a long product name. Very common trigrams are skipped while rarer
+ones are available, so a lookup touches a few short posting lists rather
+than every name.
+"""
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from recommender import normalize_query
+
+
+def trigrams(text):
+    """Character trigrams of each word, padded so short words still produce some"""
+    grams = set()
+    for word in normalize_query(text).split(' '):
+        if word:
+            padded = ' %s ' % word
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class FuzzyResolver:
+    """Trigram blocking plus edit-distance scoring over a list of names"""
+
+    def __init__(self, names, candidates=50, score_cutoff=75, common_fraction=0.1):
+        self.names = [normalize_query(n) for n in names]
+        self.candidates = candidates
+        self.score_cutoff = score_cutoff
+        postings = {}
+        for row, name in enumerate(self.names):
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self.common = max(candidates, int(len(self.names) * common_fraction))
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidate_rows(self, query):
+        """Rows sharing the most trigrams with ``query``, most overlap first"""
+        lists = [self.postings[g] for g in trigrams(query) if g in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        rare = [p for p in lists if len(p) <= self.common]
+        # Only fall back to the long lists when every trigram is common
+        rows, counts = np.unique(np.concatenate(rare or lists), return_counts=True)
+        if len(rows) > self.candidates:
+            keep = np.argpartition(-counts, self.candidates - 1)[:self.candidates]
+            rows, counts = rows[keep], counts[keep]
+        return rows[np.lexsort((rows, -counts))]
+
+    def resolve(self, query):
+        """Row of the best fuzzy match for ``query``, or None below ``score_cutoff``"""
+        needle = normalize_query(query)
+        if not needle:
+            return None
+        rows = self.candidate_rows(needle)
+        if not len(rows):
+            return None
+        match = process.extractOne(needle, [self.names[r] for r in rows], scorer=fuzz.WRatio,
+                                   score_cutoff=self.score_cutoff)
+        return int(rows[match[2]]) if match else None
@@ -0,0 +1,133 @@
+"""
+Gunicorn settings for app_production, sized from the machine it starts on.
+
+Workers follow the CPUs this container may use (affinity and cgroup quota),
+capped by how many fit in the memory budget; threads per worker make up a
+fixed amount of concurrency per core, since most request time is spent
+waiting on the database, Redis or the scoring pool. Every value can be
+overridden through the environment.
+
+The app (catalog, TF-IDF/LSA model, indexes) is loaded once in the master
+and shared copy-on-write by the forked workers. Each worker then serves a
+round of popular requests before it accepts connections, so no client pays
+for its cold caches.
+
+    gunicorn -c gunicorn.conf.py app_production:app
+"""
+
+import fcntl
+import math
+import os
+import tempfile
+
+
+def available_cpus():
+    """CPUs this process may use, honouring affinity and a cgroup v2/v1 quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            limit, period = f.read().split()
+            if limit != 'max':
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                limit = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def memory_budget_mb():
+    """Memory the workers may use: the cgroup limit, else MemAvailable, in MB"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            # cgroup v1 reports "unlimited" as a huge number
+            if value != 'max' and int(value) < 1 << 50:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def worker_settings(cpus, budget_mb, worker_mb=400, reserve_mb=256, threads_per_core=8):
+    """(workers, threads) for the given CPUs and memory budget"""
+    workers = max(2, cpus)
+    if budget_mb is not None:
+        workers = min(workers, max(1, (budget_mb - reserve_mb) // worker_mb))
+    threads = max(2, min(16, math.ceil(cpus * threads_per_core / workers)))
+    return workers, threads
+
+
+_env = os.environ.get
+_cpus = available_cpus()
+_budget = int(_env('WEB_MEMORY_BUDGET_MB', 0)) or memory_budget_mb()
+_workers, _threads = worker_settings(_cpus, _budget, int(_env('WEB_WORKER_MEMORY_MB', 400)))
+
+bind = _env('GUNICORN_BIND', '0.0.0.0:%s' % _env('PORT', '5000'))
+workers = int(_env('WEB_CONCURRENCY', _workers))
+threads = int(_env('GUNICORN_THREADS', _threads))
+# db_routing sizes the connection pool from these; the app is imported after this file runs
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ['GUNICORN_THREADS'] = str(threads)
+worker_class = 'gthread'
+timeout = int(_env('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+preload_app = _env('GUNICORN_PRELOAD', 'true').lower() == 'true'
+warm_up = _env('WARM_UP', 'true').lower() == 'true'
+
+
+def on_starting(server):
+    server.log.info('sizing: cpus=%s memory_budget_mb=%s -> workers=%d threads=%d preload=%s',
+                    _cpus, _budget, workers, threads, preload_app)
+    if preload_app:
+        from app_production import init_db
+        init_db()
+
+
+def init_db_once():
+    """init_db from a worker, one at a time so they do not race to create the same tables"""
+    from app_production import init_db
+    with open(os.path.join(tempfile.gettempdir(), 'recsys-init-db.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        init_db()
+
+
+def post_fork(server, worker):
+    # Connections opened by the master must not be shared with the children
+    from app_production import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Runs in the worker after the app is loaded and before it accepts connections
+    if not preload_app:
+        # The master never imported the app, so the tables and indexes are created here
+        init_db_once()
+    if not warm_up:
+        return
+    from app_production import warm_up as run_warm_up
+    report = run_warm_up()
+    worker.log.info('warm-up pid=%s %s', worker.pid, ' '.join('%s=%s' % item for item in report.items()))
@@ -0,0 +1,77 @@
+"""
+Conditional GET and precompressed JSON bodies for the JSON APIs.
+
+ETags are derived from the route plus the catalog and model versions, so a
+matching ``If-None-Match`` is answered with ``304`` before any query or
+scoring runs. Bodies are serialised and gzipped once per ETag and kept in
+the shared cache; repeat requests only pick the right encoding.
+"""
+
+import gzip
+import hashlib
+import json
+
+from flask import request, Response
+
+
+class HttpCache:
+    """ETag/304 handling backed by a TieredCache for the encoded bodies"""
+
+    def __init__(self, cache, timeout=600, min_gzip_size=512):
+        self.cache = cache
+        self.timeout = timeout
+        self.min_gzip_size = min_gzip_size
+
+    @staticmethod
+    def etag_for(*parts):
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:24]
+
+    def not_modified(self, etag, cache_control):
+        """A 304 response if the client already holds ``etag``, else None"""
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            self._decorate(response, etag, cache_control)
+            return response
+        return None
+
+    def get_body(self, etag):
+        return self.cache.get('http:%s' % etag)
+
+    def put_body(self, etag, payload, tags=()):
+        raw = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        compressed = gzip.compress(raw, compresslevel=6) if len(raw) >= self.min_gzip_size else None
+        body = (raw, compressed)
+        self.cache.set('http:%s' % etag, body, timeout=self.timeout, tags=tags)
+        return body
+
+    def respond(self, etag, body, cache_control):
+        raw, compressed = body
+        if compressed is not None and 'gzip' in request.accept_encodings:
+            response = Response(compressed, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(raw, mimetype='application/json')
+        self._decorate(response, etag, cache_control)
+        return response
+
+    def json(self, etag, build, cache_control, tags=()):
+        """Full conditional flow for views whose payload builder is synchronous"""
+        response = self.not_modified(etag, cache_control)
+        if response is not None:
+            return response
+        body = self.get_body(etag) or self.put_body(etag, build(), tags)
+        return self.respond(etag, body, cache_control)
+
+    def direct(self, etag, build, cache_control):
+        """Conditional flow for payloads cheaper to rebuild than to fetch from the cache"""
+        response = self.not_modified(etag, cache_control)
+        if response is None:
+            response = Response(json.dumps(build(), separators=(',', ':')), mimetype='application/json')
+            self._decorate(response, etag, cache_control)
+        return response
+
+    @staticmethod
+    def _decorate(response, etag, cache_control):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept-Encoding')
@@ -0,0 +1,101 @@
+"""
+Business-rule masks for recommendation scoring.
+
+``ItemFilter`` keeps one boolean per catalog row for availability (in stock
+and active) plus category codes and prices. ``mask()`` combines them into a
+single boolean array that the engines apply to the score vector before
+top-k selection, so filtered lists stay full and cost the same as
+unfiltered ones. Category/price masks are cached. Availability is
+copy-on-write: an update builds a new array and swaps the reference, so a
+mask handed to a scoring thread never changes underneath it.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def top_category(value):
+    """First entry of the comma-joined ``Category`` column"""
+    if not isinstance(value, str):
+        return ''
+    return value.split(',')[0].strip().lower()
+
+
+class ItemFilter:
+    """Availability bitmap plus category and price columns per catalog row"""
+
+    def __init__(self, n_items, categories=None, prices=None, cache_size=64):
+        self.available = np.ones(n_items, dtype=bool)
+        names = [top_category(c) for c in categories] if categories is not None else [''] * n_items
+        self.category_names, codes = np.unique(np.asarray(names, dtype=object), return_inverse=True)
+        self.category_codes = codes.astype(np.int32)
+        self.prices = (np.asarray(prices, dtype=np.float32) if prices is not None
+                       else np.full(n_items, np.nan, dtype=np.float32))
+        self.cache_size = cache_size
+        self._static = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_catalog(cls, data):
+        if data.empty:
+            return cls(0)
+        categories = data['Category'].tolist() if 'Category' in data.columns else None
+        prices = data['Price'].to_numpy(dtype=np.float32) if 'Price' in data.columns else None
+        return cls(len(data), categories, prices)
+
+    def __len__(self):
+        return len(self.available)
+
+    def set_available(self, rows, flags):
+        with self._lock:
+            available = self.available.copy()
+            available[np.asarray(rows, dtype=np.int64)] = flags
+            self.available = available
+
+    def set_prices(self, rows, prices):
+        rows = np.asarray(rows, dtype=np.int64)
+        self.prices[rows] = prices
+        with self._lock:
+            # Price masks depend on these rows; category-only masks do not
+            for key in [k for k in self._static if k[1] is not None or k[2] is not None]:
+                del self._static[key]
+
+    def _constraint_mask(self, category, min_price, max_price):
+        key = (category, min_price, max_price)
+        with self._lock:
+            mask = self._static.get(key)
+            if mask is not None:
+                self._static.move_to_end(key)
+                return mask
+        mask = np.ones(len(self), dtype=bool)
+        if category:
+            code = np.searchsorted(self.category_names, top_category(category))
+            if code < len(self.category_names) and self.category_names[code] == top_category(category):
+                mask &= self.category_codes == code
+            else:
+                mask[:] = False
+        # NaN prices fail both comparisons, so unpriced items drop out of price-filtered lists
+        if min_price is not None:
+            mask &= self.prices >= min_price
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        with self._lock:
+            self._static[key] = mask
+            while len(self._static) > self.cache_size:
+                self._static.popitem(last=False)
+        return mask
+
+    def mask(self, category=None, min_price=None, max_price=None):
+        """Rows allowed by availability and the optional constraints; treat as read-only"""
+        if not category and min_price is None and max_price is None:
+            return self.available
+        return self._constraint_mask(category, min_price, max_price) & self.available
+
+    def packed(self):
+        """Availability as bytes (one bit per row) for sharing between workers"""
+        return np.packbits(self.available).tobytes()
+
+    def load_packed(self, data):
+        self.available = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=len(self)).astype(bool)
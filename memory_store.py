@@ -0,0 +1,206 @@
+"""
+Thread-safe in-memory accounts, carts, wishlists and orders for the lightweight app.
+
+Each user's cart and wishlist are dicts keyed by product id (insertion
+ordered, so pages list items in the order they were added), making add,
+remove and membership checks O(1). Users are spread over a fixed set of
+striped locks: two requests for the same user serialise, requests for
+different users almost never contend. Order (and other) ids come from
+counters behind their own lock, so ids stay unique under ``threaded=True``
+or gthread workers.
+
+With ``snapshot_path`` the whole store is pickled there every
+``snapshot_interval`` seconds when something changed, and on interpreter
+exit; it is reloaded on start. Within one process only: separate gunicorn
+workers each keep their own store.
+"""
+
+import atexit
+import logging
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """Accounts plus per-user carts, wishlists and orders with O(1) item access"""
+
+    def __init__(self, snapshot_path=None, snapshot_interval=5.0, stripes=64, first_ids=None):
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._users = {}
+        self._usernames = {}
+        self._users_lock = threading.Lock()
+        self._carts = {}
+        self._wishlists = {}
+        self._orders = {}
+        self._counters = dict(first_ids or {'order': 1000, 'user': 1})
+        self._id_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._save_lock = threading.Lock()
+        self._thread = None
+        if snapshot_path:
+            self.load()
+            self._thread = threading.Thread(target=self._run, name='store-snapshot', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush)
+
+    def _lock(self, user_id):
+        return self._locks[hash(user_id) % len(self._locks)]
+
+    def next_id(self, name):
+        """Allocate the next id from counter ``name``; safe across threads"""
+        with self._id_lock:
+            value = self._counters.get(name, 1)
+            self._counters[name] = value + 1
+        self._dirty.set()
+        return value
+
+    # Accounts
+    def add_user(self, username, **fields):
+        """Register ``username``; returns the new user id, or None if the name is taken"""
+        with self._users_lock:
+            if username in self._usernames:
+                return None
+            user_id = self.next_id('user')
+            self._users[user_id] = dict(fields, username=username)
+            self._usernames[username] = user_id
+        self._dirty.set()
+        return user_id
+
+    def user(self, user_id):
+        user = self._users.get(user_id)
+        return dict(user) if user is not None else None
+
+    def user_id(self, username):
+        return self._usernames.get(username)
+
+    # Cart
+    def add_to_cart(self, user_id, product, quantity=1):
+        """Add ``quantity`` of ``product`` (a dict with an ``id``); returns the new quantity"""
+        with self._lock(user_id):
+            cart = self._carts.setdefault(user_id, {})
+            item = cart.get(product['id'])
+            if item is None:
+                item = cart[product['id']] = dict(product, quantity=0)
+            item['quantity'] += quantity
+            quantity = item['quantity']
+        self._dirty.set()
+        return quantity
+
+    def remove_from_cart(self, user_id, product_id):
+        with self._lock(user_id):
+            removed = self._carts.get(user_id, {}).pop(product_id, None) is not None
+        if removed:
+            self._dirty.set()
+        return removed
+
+    def cart(self, user_id):
+        """Copies of the cart items, oldest first"""
+        with self._lock(user_id):
+            return [dict(item) for item in self._carts.get(user_id, {}).values()]
+
+    def cart_count(self, user_id):
+        return len(self._carts.get(user_id, ()))
+
+    # Wishlist
+    def add_to_wishlist(self, user_id, product):
+        """Add ``product``; False if it was already there"""
+        with self._lock(user_id):
+            wishlist = self._wishlists.setdefault(user_id, {})
+            if product['id'] in wishlist:
+                return False
+            wishlist[product['id']] = dict(product)
+        self._dirty.set()
+        return True
+
+    def in_wishlist(self, user_id, product_id):
+        return product_id in self._wishlists.get(user_id, ())
+
+    def wishlist(self, user_id):
+        with self._lock(user_id):
+            return [dict(item) for item in self._wishlists.get(user_id, {}).values()]
+
+    # Orders
+    def place_order(self, user_id, status='Processing'):
+        """Turn the cart into an order and empty it, atomically; None if the cart is empty"""
+        with self._lock(user_id):
+            cart = self._carts.pop(user_id, None)
+            if not cart:
+                return None
+            items = list(cart.values())
+            order = {
+                'id': self.next_id('order'),
+                'items': items,
+                'total': sum(item['price'] * item['quantity'] for item in items),
+                'date': datetime.now().strftime('%Y-%m-%d %H:%M'),
+                'status': status,
+            }
+            self._orders.setdefault(user_id, {})[order['id']] = order
+        self._dirty.set()
+        return order
+
+    def orders(self, user_id):
+        with self._lock(user_id):
+            return list(self._orders.get(user_id, {}).values())
+
+    def order(self, user_id, order_id):
+        return self._orders.get(user_id, {}).get(order_id)
+
+    # Snapshots
+    def _state(self):
+        # Copied one user at a time: each user's data is consistent and no writer waits for long
+        with self._users_lock:
+            state = {'users': {user_id: dict(user) for user_id, user in self._users.items()}}
+        for name, source in (('carts', self._carts), ('wishlists', self._wishlists), ('orders', self._orders)):
+            state[name] = {}
+            for user_id in list(source):
+                with self._lock(user_id):
+                    state[name][user_id] = {key: dict(value) for key, value in source.get(user_id, {}).items()}
+        with self._id_lock:
+            state['counters'] = dict(self._counters)
+        return state
+
+    def save(self):
+        """Write a snapshot if anything changed since the last one"""
+        if not self.snapshot_path or not self._dirty.is_set():
+            return False
+        with self._save_lock:
+            self._dirty.clear()
+            state = self._state()
+            tmp = '%s.%d.tmp' % (self.snapshot_path, os.getpid())
+            with open(tmp, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.snapshot_path)
+        return True
+
+    def load(self):
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        self._users = state.get('users', {})
+        self._usernames = {user['username']: user_id for user_id, user in self._users.items()}
+        self._carts = state['carts']
+        self._wishlists = state['wishlists']
+        self._orders = state['orders']
+        self._counters.update(state['counters'])
+        return True
+
+    def _flush(self):
+        try:
+            self.save()
+        except OSError:
+            logger.exception('Could not write store snapshot')
+
+    def _run(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.snapshot_interval)
+            self._flush()
@@ -27,7 +27,7 @@ def check_dependencies():
     """Check if all required dependencies are installed"""
     required_packages = [
         'flask', 'pandas', 'numpy', 
-        'rapidfuzz', 'nltk', 'requests'
+        'rapidfuzz', 'nltk', 'requests', 'gunicorn'
     ]
     
     missing_packages = []
@@ -110,6 +110,16 @@ def initialize_components():
         logger.error(f"Failed to initialize components: {e}")
         return None
 
+def start_gunicorn():
+    """Replace this process with gunicorn; sizing and warm-up live in gunicorn.conf.py"""
+    root = Path(__file__).parent
+    app_module = os.getenv('APP_MODULE', 'app_production:app')
+    os.chdir(root)
+    args = [sys.executable, '-m', 'gunicorn', '-c', str(root / 'gunicorn.conf.py'), app_module]
+    logger.info(f"Starting gunicorn: {' '.join(args[1:])}")
+    logging.shutdown()
+    os.execv(sys.executable, args)
+
 def main():
     """Main startup function"""
     logger.info("Starting E-commerce Recommendation System...")
@@ -131,7 +141,13 @@ def main():
     if not download_nltk_data():
         logger.warning("NLTK data download failed - some features may be limited")
     
-    # Step 4: Initialize components
+    debug_mode = os.getenv('DEBUG', 'False').lower() == 'true'
+    if not debug_mode:
+        # Step 4: Hand over to gunicorn, which preloads the app, sizes the
+        # worker pool and warms every worker before it accepts connections
+        start_gunicorn()
+    
+    # Development: initialise in-process and use Flask's reloading server
     logger.info("Initializing system components...")
     app = initialize_components()
     
@@ -139,11 +155,7 @@ def main():
         logger.error("Component initialization failed. Exiting.")
         sys.exit(1)
     
-    # Step 5: Start the application
-    logger.info("Starting Flask application...")
-    
-    # Get configuration from environment
-    debug_mode = os.getenv('DEBUG', 'True').lower() == 'true'
+    logger.info("Starting Flask development server...")
     port = int(os.getenv('PORT', 8080))
     host = os.getenv('HOST', '127.0.0.1')
     
@@ -0,0 +1,359 @@
+"""
+Content-based recommendation engine shared by the Flask apps.
+
+The TF-IDF model over ``Tags`` is fitted once at load time. Lookups return
+compact ``int32`` row ids plus ``float32`` scores so results are cheap to
+cache; display fields are hydrated from the catalog DataFrame at render time.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(text):
+    """Case-fold and collapse whitespace so equivalent queries share a key"""
+    return _WHITESPACE.sub(' ', str(text)).strip().lower()
+
+
+def name_index(names):
+    """{normalised name: first row} for exact product-name lookups"""
+    index = {}
+    for row, name in enumerate(names):
+        index.setdefault(normalize_query(name), row)
+    return index
+
+
+def top_k(scores, k, exclude=None, mask=None):
+    """Indices of the k highest scores, best first; ``mask`` is False for disallowed items"""
+    if exclude is not None or mask is not None:
+        scores = scores.copy()
+        if mask is not None:
+            scores[~mask] = -np.inf
+        if exclude is not None:
+            scores[exclude] = -np.inf
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int32)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx], kind='stable')]
+    return idx[np.isfinite(scores[idx])].astype(np.int32)
+
+
+class ContentRecommender:
+    """TF-IDF content similarity over the catalog ``Tags`` column"""
+
+    def __init__(self, data, max_features=1000, fit=True):
+        self.data = data
+        self.names = data['Name'].fillna('').map(normalize_query).reset_index(drop=True) if not data.empty else pd.Series(dtype=object)
+        self.rows_by_name = name_index(self.names)
+        self.version = self._fingerprint(data)
+        self.max_features = max_features
+        self.matrix = None
+        self.vectorizer = None
+        if fit and not data.empty:
+            self.fit()
+
+    def fit(self):
+        """Fit the TF-IDF vectorizer and matrix over ``Tags``"""
+        self.vectorizer = TfidfVectorizer(stop_words='english', max_features=self.max_features)
+        self.matrix = self.vectorizer.fit_transform(self.data['Tags'].fillna('')).astype(np.float32).tocsr()
+
+    @staticmethod
+    def _fingerprint(data):
+        digest = hashlib.sha1()
+        digest.update(str(data.shape).encode('utf-8'))
+        if not data.empty:
+            digest.update(pd.util.hash_pandas_object(data['Name'], index=False).values.tobytes())
+        return digest.hexdigest()[:12]
+
+    @property
+    def empty(self):
+        return self.matrix is None
+
+    def row_for_name(self, name):
+        """Row of the product whose name equals ``name`` after normalisation, or None"""
+        return None if self.empty else self.rows_by_name.get(normalize_query(name))
+
+    def resolve(self, query):
+        """Row of the product named ``query``, else the first whose name contains it, or None"""
+        needle = normalize_query(query)
+        if not needle or self.empty:
+            return None
+        row = self.rows_by_name.get(needle)
+        if row is not None:
+            return row
+        hits = np.flatnonzero(self.names.str.contains(needle, regex=False).to_numpy())
+        return int(hits[0]) if len(hits) else None
+
+    def similar(self, row, top_n=10, mask=None):
+        """Ids and scores of the items most similar to ``row``, excluding itself"""
+        scores = (self.matrix @ self.matrix[row].T).toarray().ravel()
+        ids = top_k(scores, top_n, exclude=row, mask=mask)
+        return ids, scores[ids].astype(np.float32)
+
+    def similar_to_many(self, rows, weights=None, top_n=10, mask=None):
+        """Top items for a weighted set of rows, excluding the rows themselves"""
+        rows = np.asarray(rows, dtype=np.int64)
+        weights = np.ones(len(rows), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        profile = self.matrix[rows].T @ weights
+        scores = np.asarray(self.matrix @ profile, dtype=np.float32).ravel()
+        ids = top_k(scores, top_n, exclude=rows, mask=mask)
+        return ids, scores[ids]
+
+    def similar_batch(self, rows, top_n=10, mask=None):
+        """Top items for each of ``rows`` in one pass; a list of (ids, scores)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return self._top_rows((self.matrix[rows] @ self.matrix.T).toarray().astype(np.float32), rows, top_n, mask)
+
+    @staticmethod
+    def _top_rows(scores, rows, top_n, mask=None):
+        results = []
+        for i, row in enumerate(rows):
+            ids = top_k(scores[i], top_n, exclude=row, mask=mask)
+            results.append((ids, scores[i, ids]))
+        return results
+
+    @property
+    def nbytes(self):
+        if self.empty:
+            return 0
+        return self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+    def hydrate(self, ids):
+        """Catalog rows for the given ids, in order"""
+        return self.data.iloc[np.asarray(ids, dtype=np.int64)]
+
+
+class LSARecommender(ContentRecommender):
+    """Content similarity over dense LSA embeddings (TruncatedSVD of the TF-IDF)
+
+    Rows are L2-normalised float32 vectors in one contiguous array, so a
+    lookup is a single BLAS matrix-vector product. With ``embeddings_path``
+    the array is saved once as ``.npy`` and memory-mapped on later starts,
+    letting every worker share the same pages. Queries never need the TF-IDF
+    matrix, so it is only fitted when the embeddings have to be computed.
+    """
+
+    def __init__(self, data, max_features=5000, n_components=128, embeddings_path=None, random_state=0,
+                 quantize=False):
+        super().__init__(data, max_features=max_features, fit=False)
+        self.version = '%s-lsa%d' % (self.version, n_components)
+        self.embeddings = None
+        self.store = None
+        if data.empty:
+            return
+        path = embeddings_path and '%s.%s.npy' % (os.path.splitext(embeddings_path)[0], self.version)
+        if path and os.path.exists(path):
+            self.embeddings = np.load(path, mmap_mode='r')
+        else:
+            self.fit()
+            n_components = max(1, min(n_components, self.matrix.shape[1] - 1, self.matrix.shape[0] - 1))
+            svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=random_state)
+            embeddings = svd.fit_transform(self.matrix).astype(np.float32)
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+            self.embeddings = np.ascontiguousarray(embeddings)
+            if path:
+                # Write then rename so a concurrent worker never maps a partial file
+                tmp = '%s.%d.tmp' % (path, os.getpid())
+                with open(tmp, 'wb') as f:
+                    np.save(f, self.embeddings)
+                os.replace(tmp, path)
+                self.embeddings = np.load(path, mmap_mode='r')
+        # The sparse matrix and vectorizer are only needed for fitting
+        self.matrix = None
+        self.vectorizer = None
+        if quantize:
+            # Scan int8 codes; the float32 rows are only read to re-rank candidates. They come
+            # from the saved .npy (or a temporary one), and the in-RAM copy is dropped
+            from vector_store import QuantizedVectorStore
+            self.store = QuantizedVectorStore.from_vectors(self.embeddings, full_path=path)
+            self.embeddings = self.store.full
+
+    @property
+    def empty(self):
+        return self.embeddings is None
+
+    def similar(self, row, top_n=10, mask=None):
+        if self.store is not None:
+            return self.store.search(self.embeddings[row], top_n, exclude=row, mask=mask)
+        scores = self.embeddings @ self.embeddings[row]
+        ids = top_k(scores, top_n, exclude=row, mask=mask)
+        return ids, scores[ids]
+
+    def similar_to_many(self, rows, weights=None, top_n=10, mask=None):
+        rows = np.asarray(rows, dtype=np.int64)
+        weights = np.ones(len(rows), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        query = weights @ self.embeddings[rows]
+        if self.store is not None:
+            return self.store.search(query, top_n, exclude=rows, mask=mask)
+        scores = self.embeddings @ query
+        ids = top_k(scores, top_n, exclude=rows, mask=mask)
+        return ids, scores[ids]
+
+    def similar_batch(self, rows, top_n=10, mask=None):
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.store is not None:
+            return self.store.search_batch(self.embeddings[rows], top_n, excludes=list(rows), mask=mask)
+        return self._top_rows(self.embeddings[rows] @ self.embeddings.T, rows, top_n, mask)
+
+    @property
+    def nbytes(self):
+        if self.store is not None:
+            return self.store.nbytes
+        return 0 if self.empty else self.embeddings.nbytes
+
+
+class Shard:
+    """One partition of the TF-IDF index: global row ids plus their rows of the matrix"""
+
+    def __init__(self, name, rows, matrix):
+        self.name = name
+        self.rows = rows
+        self.matrix = matrix
+        centroid = np.asarray(matrix.sum(axis=0), dtype=np.float32).ravel()
+        self.centroid = centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+
+    def top(self, query, top_n, exclude, mask):
+        """(global ids, scores) of this shard's best ``top_n`` rows for a dense query vector"""
+        scores = np.asarray(self.matrix @ query, dtype=np.float32).ravel()
+        # exclude holds global ids; keep those that live in this shard, as local positions
+        local = np.searchsorted(self.rows, exclude)
+        inside = local < len(self.rows)
+        local = local[inside][self.rows[local[inside]] == exclude[inside]]
+        ids = top_k(scores, top_n, exclude=local, mask=None if mask is None else mask[self.rows])
+        return self.rows[ids], scores[ids]
+
+
+class ShardedRecommender(ContentRecommender):
+    """TF-IDF similarity over per-category (or hashed) shards, queried scatter-gather
+
+    The vectorizer is fitted once on the whole catalog so scores from
+    different shards are comparable; each shard then keeps only its own rows.
+    A query scores its own shard plus the ``fanout - 1`` shards whose
+    centroids are closest to it (all shards with ``fanout=None`` or hash
+    sharding), on a thread pool when enough rows are involved, and the
+    per-shard top-k lists are merged. A shard can be re-vectorised alone with
+    ``rebuild_shard`` after its products change.
+    """
+
+    def __init__(self, data, max_features=1000, shard_by='category', n_shards=8, fanout=3, workers=None,
+                 parallel_rows=20000):
+        super().__init__(data, max_features=max_features)
+        self.shard_by = shard_by
+        self.fanout = None if shard_by == 'hash' else fanout
+        self.version = '%s-%s%s' % (self.version, shard_by, '' if self.fanout is None else '-f%d' % self.fanout)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.parallel_rows = parallel_rows
+        self.shards = []
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if self.matrix is None:
+            return
+        if shard_by == 'category':
+            from item_filters import top_category
+            keys = np.asarray([top_category(c) for c in data['Category']] if 'Category' in data.columns
+                              else [''] * len(data), dtype=object)
+        elif shard_by == 'hash':
+            keys = np.arange(len(data)) % n_shards
+        else:
+            raise ValueError('unknown shard key: %s' % shard_by)
+        names, shard_of = np.unique(keys, return_inverse=True)
+        self.shard_of = shard_of.astype(np.int32)
+        # Position of each row inside its shard, for fetching its vector
+        self.local_of = np.empty(len(data), dtype=np.int32)
+        for index, name in enumerate(names):
+            rows = np.flatnonzero(self.shard_of == index).astype(np.int32)
+            self.local_of[rows] = np.arange(len(rows), dtype=np.int32)
+            self.shards.append(Shard(name, rows, self.matrix[rows]))
+        self.matrix = None
+        self._update_neighbours()
+
+    def _update_neighbours(self):
+        centroids = np.vstack([shard.centroid for shard in self.shards])
+        affinity = centroids @ centroids.T
+        np.fill_diagonal(affinity, np.inf)
+        self.related = np.argsort(-affinity, axis=1, kind='stable').astype(np.int32)
+
+    @property
+    def empty(self):
+        return not self.shards
+
+    def rebuild_shard(self, name):
+        """Re-vectorise one shard's rows from ``self.data`` and swap it in"""
+        index = int(np.flatnonzero(np.asarray([s.name for s in self.shards], dtype=object) == name)[0])
+        rows = self.shards[index].rows
+        matrix = self.vectorizer.transform(self.data['Tags'].iloc[rows].fillna('')).astype(np.float32).tocsr()
+        self.shards[index] = Shard(name, rows, matrix)
+        self._update_neighbours()
+
+    def _vectors(self, rows):
+        """Dense TF-IDF vectors of global ``rows``, one per row"""
+        return [self.shards[self.shard_of[r]].matrix[self.local_of[r]].toarray().ravel() for r in rows]
+
+    def _targets(self, rows):
+        if self.fanout is None or self.fanout >= len(self.shards):
+            return list(range(len(self.shards)))
+        targets = []
+        for shard in np.unique(self.shard_of[rows]):
+            targets.extend(int(s) for s in self.related[shard, :self.fanout])
+        return sorted(set(targets))
+
+    def _pool(self):
+        # One pool per process, created lazily so forked workers get their own threads
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='shard')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _search(self, query, rows, top_n, mask):
+        targets = [self.shards[i] for i in self._targets(rows)]
+        exclude = np.unique(np.asarray(rows, dtype=np.int32))
+        if len(targets) > 1 and self.workers > 1 and sum(len(s.rows) for s in targets) >= self.parallel_rows:
+            parts = list(self._pool().map(lambda s: s.top(query, top_n, exclude, mask), targets))
+        else:
+            parts = [s.top(query, top_n, exclude, mask) for s in targets]
+        ids = np.concatenate([p[0] for p in parts]).astype(np.int32)
+        scores = np.concatenate([p[1] for p in parts]).astype(np.float32)
+        best = top_k(scores, top_n)
+        return ids[best], scores[best]
+
+    def similar(self, row, top_n=10, mask=None):
+        return self._search(self._vectors([row])[0], [row], top_n, mask)
+
+    def similar_to_many(self, rows, weights=None, top_n=10, mask=None):
+        rows = np.asarray(rows, dtype=np.int64)
+        weights = np.ones(len(rows), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        profile = sum(w * v for w, v in zip(weights, self._vectors(rows)))
+        return self._search(profile, rows, top_n, mask)
+
+    def similar_batch(self, rows, top_n=10, mask=None):
+        return [self.similar(int(row), top_n, mask) for row in rows]
+
+    @property
+    def nbytes(self):
+        return sum(s.matrix.data.nbytes + s.matrix.indices.nbytes + s.matrix.indptr.nbytes for s in self.shards)
+
+
+BACKENDS = {'tfidf': ContentRecommender, 'lsa': LSARecommender, 'sharded': ShardedRecommender}
+
+
+def make_recommender(data, backend='tfidf', **options):
+    """Build the content engine named by ``backend`` ('tfidf', 'lsa' or 'sharded')"""
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError('unknown recommender backend: %s' % backend)
+    return cls(data, **options)
@@ -0,0 +1,118 @@
+"""
+Bounded worker pool for CPU-bound recommendation scoring.
+
+NumPy/SciPy release the GIL inside their kernels, so a thread pool lets
+heavy similarity computations run next to I/O-bound requests instead of
+pinning the request thread. The pool admits at most ``max_pending`` jobs;
+beyond that callers are rejected immediately (back-pressure) rather than
+queueing behind work that will miss its deadline anyway.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class PoolSaturated(Exception):
+    """Raised when the scoring queue is full"""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a scoring job does not finish within its deadline"""
+
+
+class ScoringPool:
+    """Thread pool with an admission limit and per-call deadlines"""
+
+    def __init__(self, app=None, max_workers=None, max_pending=None, deadline=2.0):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.max_workers * 4
+        self.deadline = deadline
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counters = {'submitted': 0, 'rejected': 0, 'timed_out': 0, 'completed': 0}
+        self._latencies = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('SCORING_POOL_WORKERS', self.max_workers)
+        self.max_pending = app.config.get('SCORING_POOL_MAX_PENDING', self.max_workers * 4)
+        self.deadline = app.config.get('SCORING_DEADLINE', self.deadline)
+        app.extensions['scoring_pool'] = self
+
+    def _ensure_executor(self):
+        # Keyed by pid: threads of a pool used in the preloaded master do not survive
+        # gunicorn's fork, so each worker builds its own on first use
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='scoring')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule ``fn``; raises PoolSaturated when no slot is free"""
+        executor = self._ensure_executor()
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise PoolSaturated('scoring queue is full')
+        self._count('submitted')
+        started = time.perf_counter()
+
+        def release(_future):
+            self._slots.release()
+            with self._lock:
+                self._counters['completed'] += 1
+                self._latencies.append(time.perf_counter() - started)
+                del self._latencies[:-1000]
+
+        future = executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(release)
+        return future
+
+    def run(self, fn, *args, deadline=None, **kwargs):
+        """Run ``fn`` on the pool and wait for it at most ``deadline`` seconds"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=deadline or self.deadline)
+        except FutureTimeout:
+            future.cancel()
+            self._count('timed_out')
+            raise DeadlineExceeded('scoring took longer than %.2fs' % (deadline or self.deadline))
+
+    async def run_async(self, fn, *args, deadline=None, **kwargs):
+        """Awaitable variant of run() for async views"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline or self.deadline)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self._count('timed_out')
+            raise DeadlineExceeded('scoring took longer than %.2fs' % (deadline or self.deadline))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies)
+        counters['max_workers'] = self.max_workers
+        counters['max_pending'] = self.max_pending
+        if latencies:
+            counters['p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 2)
+            counters['p99_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+        return counters
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
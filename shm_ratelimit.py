@@ -0,0 +1,211 @@
+"""
+Host-wide rate-limit storage in a shared memory-mapped counter table.
+
+Every gunicorn worker on a host maps the same file (``/dev/shm`` by
+default), so a limit of N per minute means N for the host rather than N per
+worker. The table has a fixed number of buckets with a few slots each, so
+memory never grows with the number of clients; when a bucket is full the
+stalest slot is recycled.
+
+Each slot keeps the counts for the current and previous fixed window.
+``incr``/``get`` report the sliding-window estimate
+``prev * (1 - elapsed / window) + cur``, which lets Flask-Limiter's
+fixed-window strategy enforce a smooth sliding limit without a burst at
+window boundaries.
+
+Registered under the ``shm://`` scheme, e.g.
+``RATELIMIT_STORAGE_URI = 'shm:///dev/shm/recsys-ratelimit?buckets=16384'``.
+For limits shared across hosts use a ``redis://`` URI instead.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+
+from limits.storage import Storage
+
+MAGIC = b'RLSHM001'
+HEADER = struct.Struct('<8sII')           # magic, buckets, ways
+SLOT = struct.Struct('<QdIII4x')          # key hash, window start, window, cur, prev
+LOCK_STRIPES = 64
+
+
+def _key_hash(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+def _default_path():
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'recsys-ratelimit')
+
+
+class SharedMemoryStorage(Storage):
+    """Fixed-size sliding-window counter table shared by all local workers"""
+
+    STORAGE_SCHEME = ['shm']
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        parsed = urlparse(uri or 'shm://')
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        self.path = parsed.path or _default_path()
+        self.buckets = int(query.get('buckets', options.get('buckets', 16384)))
+        self.ways = int(query.get('ways', options.get('ways', 4)))
+        self._size = HEADER.size + self.buckets * self.ways * SLOT.size
+        self._thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._open()
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size != self._size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, self._size)
+                os.pwrite(fd, HEADER.pack(MAGIC, self.buckets, self.ways), 0)
+            else:
+                magic, buckets, ways = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+                if (magic, buckets, ways) != (MAGIC, self.buckets, self.ways):
+                    os.pwrite(fd, b'\0' * self._size, 0)
+                    os.pwrite(fd, HEADER.pack(MAGIC, self.buckets, self.ways), 0)
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+            self._fd = fd
+            self._map = mmap.mmap(fd, self._size)
+        except Exception:
+            os.close(fd)
+            raise
+
+    @contextmanager
+    def _bucket_lock(self, bucket):
+        """Thread lock plus an fcntl byte-range lock over one bucket"""
+        offset = HEADER.size + bucket * self.ways * SLOT.size
+        length = self.ways * SLOT.size
+        with self._thread_locks[bucket % LOCK_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+            try:
+                yield offset
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
+
+    def _find(self, base, key_hash, now, create):
+        """Slot offset for key_hash in the bucket at ``base``"""
+        empty = expired = oldest = None
+        oldest_start = None
+        # The key may sit in any way, so look at all of them before recycling one
+        for way in range(self.ways):
+            offset = base + way * SLOT.size
+            slot_hash, start, window, _, _ = SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset
+            if slot_hash == 0:
+                empty = offset if empty is None else empty
+            elif start + 2 * window <= now:
+                expired = offset if expired is None else expired
+            elif oldest is None or start < oldest_start:
+                oldest, oldest_start = offset, start
+        if not create:
+            return None
+        for victim in (empty, expired, oldest):
+            if victim is not None:
+                return self._claim(victim, key_hash)
+
+    def _claim(self, offset, key_hash):
+        SLOT.pack_into(self._map, offset, key_hash, 0.0, 0, 0, 0)
+        return offset
+
+    @staticmethod
+    def _roll(start, window, cur, prev, now, expiry):
+        """Advance the stored windows to the one containing ``now``"""
+        if window != expiry or start == 0.0:
+            return math.floor(now / expiry) * expiry, expiry, 0, 0
+        if now >= start + window:
+            elapsed_windows = int((now - start) // window)
+            prev = cur if elapsed_windows == 1 else 0
+            cur = 0
+            start += elapsed_windows * window
+        return start, window, cur, prev
+
+    @staticmethod
+    def _estimate(start, window, cur, prev, now):
+        weight = max(0.0, 1.0 - (now - start) / window) if window else 0.0
+        return int(math.ceil(prev * weight + cur))
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        key_hash = _key_hash(key)
+        now = time.time()
+        expiry = max(1, int(expiry))
+        bucket = key_hash % self.buckets
+        with self._bucket_lock(bucket) as base:
+            offset = self._find(base, key_hash, now, create=True)
+            _, start, window, cur, prev = SLOT.unpack_from(self._map, offset)
+            start, window, cur, prev = self._roll(start, window, cur, prev, now, expiry)
+            cur = min(cur + amount, 0xFFFFFFFF)
+            SLOT.pack_into(self._map, offset, key_hash, start, window, cur, prev)
+            return self._estimate(start, window, cur, prev, now)
+
+    def get(self, key):
+        key_hash = _key_hash(key)
+        now = time.time()
+        with self._bucket_lock(key_hash % self.buckets) as base:
+            offset = self._find(base, key_hash, now, create=False)
+            if offset is None:
+                return 0
+            _, start, window, cur, prev = SLOT.unpack_from(self._map, offset)
+            if not window:
+                return 0
+            start, window, cur, prev = self._roll(start, window, cur, prev, now, window)
+            return self._estimate(start, window, cur, prev, now)
+
+    def get_expiry(self, key):
+        key_hash = _key_hash(key)
+        now = time.time()
+        with self._bucket_lock(key_hash % self.buckets) as base:
+            offset = self._find(base, key_hash, now, create=False)
+            if offset is None:
+                return now
+            _, start, window, cur, prev = SLOT.unpack_from(self._map, offset)
+            if not window:
+                return now
+            start, window, _, _ = self._roll(start, window, cur, prev, now, window)
+            return start + window
+
+    def check(self):
+        return not self._map.closed
+
+    def reset(self):
+        for lock in self._thread_locks:
+            lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                self._map[HEADER.size:] = b'\0' * (self._size - HEADER.size)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        finally:
+            for lock in reversed(self._thread_locks):
+                lock.release()
+        return None
+
+    def clear(self, key):
+        key_hash = _key_hash(key)
+        with self._bucket_lock(key_hash % self.buckets) as base:
+            offset = self._find(base, key_hash, time.time(), create=False)
+            if offset is not None:
+                SLOT.pack_into(self._map, offset, 0, 0.0, 0, 0, 0)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
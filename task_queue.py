@@ -0,0 +1,41 @@
+"""
+Celery wiring for background work in the production app.
+
+Run a worker with ``celery -A app_production.celery worker``. Without a
+broker configured the tasks run eagerly in-process, which is what the
+tests and single-process local runs use.
+"""
+
+from celery import Celery
+
+
+def make_celery(app):
+    """Create a Celery app whose tasks run inside the Flask app context"""
+    broker = app.config.get('CELERY_BROKER_URL') or 'memory://'
+    celery = Celery(app.import_name, broker=broker,
+                    backend=app.config.get('CELERY_RESULT_BACKEND'))
+    celery.conf.update(
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', broker == 'memory://'),
+        task_eager_propagates=False,
+        task_acks_late=True,
+        task_ignore_result=True,
+        worker_prefetch_multiplier=1,
+    )
+
+    class ContextTask(celery.Task):
+        def __call__(self, *args, **kwargs):
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    celery.Task = ContextTask
+    app.extensions['celery'] = celery
+    return celery
+
+
+def coalesce(cache, key, window):
+    """True for the first caller in ``window`` seconds; later callers are folded into it"""
+    return cache.add('task:%s' % key, 1, timeout=window)
+
+
+def release(cache, key):
+    cache.delete('task:%s' % key)
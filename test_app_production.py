@@ -0,0 +1,62 @@
+import os
+import unittest
+from unittest import mock
+
+# No broker, Redis or real database: tasks run eagerly against an in-memory SQLite
+with mock.patch.dict(os.environ, {'DATABASE_URL': 'sqlite://', 'RATELIMIT_STORAGE_URI': 'memory://'}):
+    for name in ('REDIS_URL', 'CELERY_BROKER_URL', 'EVENT_LOG_DIR'):
+        os.environ.pop(name, None)
+    import app_production
+
+
+class UserRefreshTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app_production.app
+        with self.app.app_context():
+            app_production.db.create_all()
+            user = app_production.User(username='u%d' % id(self), email='%d@example.com' % id(self),
+                                       password_hash='x')
+            app_production.db.session.add(user)
+            app_production.db.session.commit()
+            self.user_id = user.id
+        recommender = mock.MagicMock(empty=False)
+        recommender.similar_to_many.return_value = ([], [])
+        patcher = mock.patch.object(app_production, 'recommender', recommender)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_of_events_runs_one_refresh(self):
+        """Events inside the coalescing window fold into the refresh already scheduled"""
+        history = mock.Mock(wraps=app_production.user_history_rows)
+        with mock.patch.object(app_production, 'user_history_rows', history):
+            for _ in range(5):
+                app_production.schedule_user_refresh(self.user_id)
+        self.assertEqual(history.call_count, 1)
+
+    def test_clicks_do_not_flush_the_cart(self):
+        """The inline refresh reads buffered cart deltas; only the timed flusher writes them"""
+        with self.app.app_context():
+            product = app_production.Product(name='Shampoo', price=5.0, stock=10)
+            app_production.db.session.add(product)
+            app_production.db.session.commit()
+            product_id = product.id
+        app_production.recommender.row_for_name.side_effect = lambda name: 0 if name == 'Shampoo' else None
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = self.user_id
+        flushes = app_production.cart_buffer.stats()['flushes']
+        history = mock.Mock(wraps=app_production.user_history_rows)
+        with mock.patch.object(app_production, 'user_history_rows', history), \
+                mock.patch.object(app_production.cart_buffer, 'flush_user') as flush_user:
+            for _ in range(4):
+                client.post('/add_to_cart/%d' % product_id)
+        flush_user.assert_not_called()
+        self.assertLessEqual(app_production.cart_buffer.stats()['flushes'] - flushes, 1)
+        self.assertEqual(history.call_count, 1)
+        with self.app.app_context():
+            self.assertEqual(app_production.user_history_rows(self.user_id), ([0], [4.0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
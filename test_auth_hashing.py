@@ -0,0 +1,56 @@
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+from auth_hashing import PasswordHasher, HashingOverloaded
+
+
+class PasswordHasherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(max_workers=1, max_queue=2, method='pbkdf2:sha256:1000')
+
+    def test_hash_and_verify_on_pool(self):
+        pwhash = self.hasher.hash('secret123')
+        self.assertTrue(pwhash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(self.hasher.verify(pwhash, 'secret123'))
+        self.assertFalse(self.hasher.verify(pwhash, 'wrong'))
+        stats = self.hasher.stats()
+        self.assertEqual(stats['verified'], 2)
+        self.assertIn('p50_ms', stats['hash_time'])
+
+    def test_rehash_on_login(self):
+        """Hashes made at an old cost are replaced after a successful login"""
+        old = generate_password_hash('secret123', method='pbkdf2:sha256:500')
+        ok, new_hash = self.hasher.verify_and_upgrade(old, 'secret123')
+        self.assertTrue(ok)
+        self.assertTrue(new_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertEqual(self.hasher.verify_and_upgrade(new_hash, 'secret123'), (True, None))
+        self.assertEqual(self.hasher.verify_and_upgrade(old, 'wrong'), (False, None))
+
+    def test_short_method_names_do_not_rehash(self):
+        """'scrypt' and 'pbkdf2' match the full prefixes werkzeug stores for them"""
+        for method in ('scrypt', 'pbkdf2'):
+            hasher = PasswordHasher(max_workers=0, method=method)
+            self.assertEqual(hasher.verify_and_upgrade(hasher.hash('secret123'), 'secret123'), (True, None))
+
+    def test_inline_mode_accepts_work(self):
+        hasher = PasswordHasher(max_workers=0, method='pbkdf2:sha256:1000')
+        self.assertEqual(hasher.max_queue, 1)
+        self.assertTrue(hasher.verify(hasher.hash('secret123'), 'secret123'))
+
+    def test_rejects_when_queue_full(self):
+        """Callers beyond max_queue fail fast instead of waiting"""
+        self.hasher._slots.acquire()
+        self.hasher._slots.acquire()
+        try:
+            with self.assertRaises(HashingOverloaded):
+                self.hasher.hash('secret123')
+        finally:
+            self.hasher._slots.release()
+            self.hasher._slots.release()
+        self.assertEqual(self.hasher.stats()['rejected'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import pandas as pd
+
+from autocomplete import Autocomplete
+
+
+def brute_force(entries, prefix, k):
+    totals, display = {}, {}
+    for text, kind, weight in entries:
+        words = text.lower().split()
+        starts = range(len(words)) if kind == 'product' else range(1)
+        if any(' '.join(words[i:]).startswith(prefix) for i in starts):
+            key = (' '.join(words), kind)
+            display.setdefault(key, text)
+            totals[key] = totals.get(key, 0) + weight
+    return [(display[key], key[1]) for key in sorted(totals, key=lambda key: -totals[key])[:k]]
+
+
+class AutocompleteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = [('Matte Lipstick %d' % i, 'product', i) for i in range(100)]
+        self.entries += [('Nail Polish Red', 'product', 500), ('nail  polish red', 'product', 1),
+                         ('Maybelline', 'brand', 50), ('Makeup', 'category', 300)]
+        self.index = Autocomplete(self.entries, k=5, scan_limit=8)
+
+    def test_most_popular_first(self):
+        self.assertEqual([c['text'] for c in self.index.complete('ma')],
+                         ['Makeup', 'Matte Lipstick 99', 'Matte Lipstick 98', 'Matte Lipstick 97', 'Matte Lipstick 96'])
+
+    def test_matches_brute_force_on_heavy_and_light_prefixes(self):
+        for prefix in ('m', 'mat', 'matte lipstick 4', 'lip', 'lipstick 1', 'nail', 'red'):
+            expected = brute_force(self.entries, prefix, 5)
+            got = [(c['text'], c['type']) for c in self.index.complete(prefix)]
+            self.assertEqual([t for t, _ in got], [t for t, _ in expected], prefix)
+
+    def test_heavy_nodes_are_precomputed(self):
+        self.assertIn('matte lipstick', self.index.top)
+        self.assertNotIn('nail', self.index.top)
+
+    def test_duplicates_merge_and_normalise(self):
+        results = self.index.complete('  NAIL ')
+        self.assertEqual(results, [{'text': 'Nail Polish Red', 'type': 'product'}])
+
+    def test_no_match_and_empty_query(self):
+        self.assertEqual(self.index.complete('zzz'), [])
+        self.assertEqual(self.index.complete(''), [])
+
+    def test_from_catalog(self):
+        data = pd.DataFrame({'Name': ['OPI Nail Lacquer', 'OPI Nail Lacquer', 'Olay Cream'],
+                             'Brand': ['opi', 'opi', 'olay'], 'Category': ['Beauty, Nail', 'Beauty, Nail', 'Beauty'],
+                             'ReviewCount': [10, 5, 3]})
+        index = Autocomplete.from_catalog(data)
+        self.assertEqual(index.complete('o'), [{'text': 'OPI Nail Lacquer', 'type': 'product'},
+                                               {'text': 'opi', 'type': 'brand'},
+                                               {'text': 'Olay Cream', 'type': 'product'},
+                                               {'text': 'olay', 'type': 'brand'}])
+        self.assertEqual(index.complete('beau'), [{'text': 'Beauty', 'type': 'category'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
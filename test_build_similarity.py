@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+import build_similarity
+
+
+class BuildSimilarityTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.matrix = sp.random(300, 80, density=0.05, random_state=1, format='csr', dtype=np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def brute_force(self, k):
+        scores = (self.matrix @ self.matrix.T).toarray()
+        np.fill_diagonal(scores, -np.inf)
+        return -np.sort(-scores, axis=1)[:, :k]
+
+    def test_matches_brute_force_across_blocks(self):
+        out = os.path.join(self.tmp, 'neighbours')
+        report = build_similarity.build(self.matrix, out, k=5, block=64, workers=2)
+        self.assertEqual(report['blocks'], 5)
+        ids, scores = build_similarity.load_neighbours(out)
+        self.assertEqual(ids.shape, (300, 5))
+        expected = np.maximum(self.brute_force(5), 0)
+        np.testing.assert_allclose(scores, expected, atol=1e-6)
+        self.assertFalse((ids == np.arange(300)[:, None]).any())
+        self.assertTrue(np.all(ids[scores == 0] == -1))
+
+    def test_block_top_k_on_dense_rows(self):
+        vectors = np.eye(4, dtype=np.float32) + 0.1
+        ids, scores = build_similarity.block_top_k(vectors, 0, 4, k=2, tile=3)
+        self.assertEqual(ids.shape, (4, 2))
+        self.assertFalse((ids == np.arange(4)[:, None]).any())
+        self.assertTrue(np.all(np.diff(scores, axis=1) <= 0))
+
+    def test_progress_is_reported(self):
+        seen = []
+        build_similarity.build(self.matrix, os.path.join(self.tmp, 'n'), k=3, block=100, workers=1,
+                               progress=lambda done, total, rate, eta: seen.append((done, total)))
+        self.assertEqual(seen[-1], (300, 300))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from cache_layer import TieredCache, MemoryBackend, LocalLRU
+
+
+class TieredCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.shared = MemoryBackend()
+        self.cache = TieredCache(backend=self.shared)
+
+    def test_local_tier_serves_repeat_reads(self):
+        """Second read is answered by the in-process LRU"""
+        self.cache.set('k', 'v')
+        self.assertEqual(self.cache.get('k'), 'v')
+        stats = self.cache.stats()
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['shared_hits'], 0)
+
+    def test_shared_tier_is_seen_by_other_workers(self):
+        """A second cache over the same backend reads entries written by the first"""
+        other = TieredCache(backend=self.shared)
+        self.cache.set('k', 'v')
+        self.assertEqual(other.get('k'), 'v')
+        self.assertEqual(other.stats()['shared_hits'], 1)
+
+    def test_tag_invalidation_crosses_workers(self):
+        """Bumping a tag drops entries cached under its old version everywhere"""
+        other = TieredCache(backend=self.shared)
+        self.cache.set('page', 'html', tags=('product:1',))
+        self.cache.set('unrelated', 'x', tags=('product:2',))
+        other.invalidate_tags('product:1')
+        self.assertIsNone(other.get('page'))
+        self.assertEqual(other.get('unrelated'), 'x')
+        # The writer's local copy is only dropped by its own invalidation or expiry
+        self.cache.local.clear()
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_fragment_is_rendered_once_per_key(self):
+        """Fragments are shared across renders until their key or tags change"""
+        renders = []
+
+        def render():
+            renders.append(1)
+            return '<li>%d</li>' % len(renders)
+
+        first = self.cache.fragment('grid', ('v1', 'anon'), render, tags=('catalog',))
+        self.assertEqual(self.cache.fragment('grid', ('v1', 'anon'), render, tags=('catalog',)), first)
+        self.assertEqual(str(first), '<li>1</li>')
+        self.assertTrue(hasattr(first, '__html__'))
+        self.cache.fragment('grid', ('v1', 'user'), render, tags=('catalog',))
+        self.cache.invalidate_tags('catalog')
+        self.assertEqual(str(self.cache.fragment('grid', ('v1', 'anon'), render, tags=('catalog',))), '<li>3</li>')
+
+    def test_lru_is_bounded(self):
+        """Local tier evicts least recently used entries"""
+        lru = LocalLRU(maxsize=2)
+        lru.set('a', (1, {}), 60)
+        lru.set('b', (2, {}), 60)
+        lru.get('a')
+        lru.set('c', (3, {}), 60)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), (1, {}))
+        self.assertEqual(len(lru), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
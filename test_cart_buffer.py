@@ -0,0 +1,71 @@
+import unittest
+
+from cache_layer import MemoryBackend
+from cart_buffer import CartBuffer
+
+
+class CartBufferTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = MemoryBackend()
+        self.batches = []
+        self.buffer = CartBuffer(backend=self.backend, writer=self.write, flush_interval=3600)
+
+    def tearDown(self):
+        self.buffer.close()
+
+    def write(self, rows):
+        self.batches.append(sorted(rows))
+
+    def test_clicks_are_coalesced_into_one_batch(self):
+        """Repeated adds reach the writer as one delta per cart line"""
+        for _ in range(5):
+            self.buffer.add(1, 10)
+        self.buffer.add(1, 11)
+        self.buffer.add(2, 10, 3)
+        self.assertEqual(self.buffer.pending(1), {10: 5, 11: 1})
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(self.batches, [[(1, 10, 5), (1, 11, 1), (2, 10, 3)]])
+        self.assertEqual(self.buffer.pending(1), {})
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.batches), 1)
+
+    def test_flush_user_only_writes_that_user(self):
+        self.buffer.add(1, 10)
+        self.buffer.add(2, 10)
+        self.buffer.flush_user(1)
+        self.assertEqual(self.batches, [[(1, 10, 1)]])
+        self.buffer.flush()
+        self.assertEqual(self.batches[-1], [(2, 10, 1)])
+
+    def test_failed_write_keeps_deltas(self):
+        """Deltas taken for a write that fails are retried by the next flush"""
+        def fail(rows):
+            raise RuntimeError('database down')
+
+        self.buffer.writer = fail
+        self.buffer.add(1, 10, 2)
+        with self.assertRaises(RuntimeError):
+            self.buffer.flush()
+        self.buffer.add(1, 10)
+        self.buffer.writer = self.write
+        self.buffer.flush()
+        self.assertEqual(self.batches, [[(1, 10, 3)]])
+        self.assertEqual(self.buffer.stats()['write_errors'], 1)
+
+    def test_flush_user_waits_for_a_flush_in_progress(self):
+        """A user being flushed elsewhere is skipped by the timer and waited for by flush_user"""
+        self.buffer.add(1, 10)
+        self.backend.add('cart:flushing:1', 'other-worker')
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending(1), {10: 1})
+        self.buffer.wait_timeout = 0.05
+        with self.assertRaises(TimeoutError):
+            self.buffer.flush_user(1)
+        self.backend.delete('cart:flushing:1')
+        self.buffer.flush()
+        self.assertEqual(self.batches, [[(1, 10, 1)]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from cooccurrence import CoOccurrence
+
+
+class CoOccurrenceTestCase(unittest.TestCase):
+
+    def test_items_in_same_session_are_related(self):
+        model = CoOccurrence()
+        for session in range(3):
+            model.add(session, 1, now=0)
+            model.add(session, 2, now=1)
+        model.add('other', 1, now=2)
+        model.add('other', 3, now=3)
+        self.assertEqual([item for item, _ in model.related(1, now=3)], [2, 3])
+        self.assertEqual([item for item, _ in model.related(3, now=3)], [1])
+
+    def test_recent_trend_overtakes_old_pairs(self):
+        model = CoOccurrence(half_life=60)
+        for session in range(5):
+            model.add(session, 1, now=0)
+            model.add(session, 2, now=0)
+        for session in range(10, 12):
+            model.add(session, 1, now=600)
+            model.add(session, 4, now=600)
+        self.assertEqual(model.related(1, now=600)[0][0], 4)
+
+    def test_memory_is_bounded(self):
+        model = CoOccurrence(k=3, max_items=50, max_sessions=10)
+        for event in range(5000):
+            model.add(event % 37, event % 211, now=event)
+        stats = model.stats()
+        self.assertLessEqual(stats['items'], 50)
+        self.assertLessEqual(stats['sessions'], 10)
+        self.assertEqual(model.partners.shape, (50, 3))
+        self.assertTrue(all(len(model.related(item, now=5000)) <= 3 for item in list(model.rows)))
+
+    def test_rescaling_keeps_scores(self):
+        model = CoOccurrence(half_life=1)
+        model.add('a', 1, now=0)
+        model.add('a', 2, now=0)
+        model.add('b', 1, now=100)
+        model.add('b', 2, now=100)
+        [(partner, score)] = model.related(1, now=100)
+        self.assertEqual(partner, 2)
+        self.assertAlmostEqual(score, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+
+import db_routing
+from db_routing import read_only
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Primary and replica are two SQLite files holding different rows"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'test'
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmp, 'primary.db')
+        app.config['DATABASE_REPLICA_URL'] = 'sqlite:///' + os.path.join(self.tmp, 'replica.db')
+        db_routing.configure(app.config)
+        db = SQLAlchemy(app, session_options={'class_': db_routing.RoutingSession})
+        db_routing.init_app(app)
+
+        class Item(db.Model):
+            id = db.Column(db.Integer, primary_key=True)
+            name = db.Column(db.String(50))
+
+        @app.route('/read')
+        @read_only
+        def read():
+            return jsonify([i.name for i in Item.query.all()])
+
+        @app.route('/write', methods=['POST'])
+        def write():
+            db.session.add(Item(name='new'))
+            db.session.commit()
+            return jsonify([i.name for i in Item.query.all()])
+
+        with app.app_context():
+            db.create_all()
+            with db.engines['replica'].begin() as conn:
+                Item.__table__.create(conn, checkfirst=True)
+                conn.execute(Item.__table__.insert().values(name='from-replica'))
+            db.session.add(Item(name='from-primary'))
+            db.session.commit()
+
+        self.app = app
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_read_only_views_use_replica(self):
+        self.assertEqual(self.client.get('/read').json, ['from-replica'])
+
+    def test_writes_go_to_primary_and_pin_reads(self):
+        """After a write the same client reads from the primary"""
+        self.assertEqual(self.client.post('/write').json, ['from-primary', 'new'])
+        self.assertEqual(self.client.get('/read').json, ['from-primary', 'new'])
+
+    def test_pool_wait_metrics(self):
+        self.client.get('/read')
+        snapshot = db_routing.pool_metrics.snapshot()
+        self.assertIn('replica', snapshot)
+        self.assertGreater(snapshot['replica']['checkouts'], 0)
+
+    def test_pool_sizing_fits_connection_budget(self):
+        options = db_routing.pool_options('postgresql://db/app', workers=4, threads=8, max_connections=50)
+        self.assertLessEqual(4 * (options['pool_size'] + options['max_overflow']), 50)
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(db_routing.pool_options('sqlite://'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+import evaluate
+from event_log import EventLog
+
+
+def sample_interactions():
+    """Two taste clusters; each user's later items come from their own cluster"""
+    names = ['nail polish %d' % i for i in range(6)] + ['lipstick %d' % i for i in range(6)]
+    tags = ['opi, nail, polish'] * 6 + ['lipstick, matte, lip'] * 6
+    rows = []
+    for user in range(20):
+        cluster = 0 if user % 2 == 0 else 6
+        for offset in range(6):
+            rows.append({'ID': user, 'ProdID': cluster + (user + offset) % 6})
+    data = pd.DataFrame(rows)
+    data['Name'] = [names[p] for p in data['ProdID']]
+    data['Tags'] = [tags[p] for p in data['ProdID']]
+    # Interleave users so the time cutoff splits everyone's history
+    data['Timestamp'] = [offset * 100 + user for user in range(20) for offset in range(6)]
+    return data
+
+
+class RankingMetricsTestCase(unittest.TestCase):
+
+    def test_metrics_match_hand_computed_values(self):
+        recommended = np.array([[0, 1, 2], [3, 4, 5]])
+        relevant = np.zeros((2, 6), dtype=bool)
+        relevant[0, [0, 2]] = True
+        relevant[1, [5]] = True
+        metrics = evaluate.ranking_metrics(recommended, relevant)
+        np.testing.assert_allclose(metrics['precision'], [2 / 3, 1 / 3])
+        np.testing.assert_allclose(metrics['recall'], [1.0, 1.0])
+        ideal = 1 + 1 / np.log2(3)
+        np.testing.assert_allclose(metrics['ndcg'], [(1 + 1 / np.log2(4)) / ideal, (1 / np.log2(4)) / 1.0],
+                                   rtol=1e-6)
+
+    def test_recommend_skips_seen_items(self):
+        catalog, interactions = evaluate.load_interactions(sample_interactions())
+        train, _, users = evaluate.temporal_split(interactions, len(catalog))
+        model = evaluate.PopularModel().fit(train, catalog)
+        recommended = evaluate.recommend(model, train[users], 3)
+        seen = train[users].toarray() > 0
+        self.assertFalse(np.take_along_axis(seen, recommended, axis=1).any())
+
+
+class TemporalSplitTestCase(unittest.TestCase):
+
+    def test_test_items_are_later_and_unseen(self):
+        catalog, interactions = evaluate.load_interactions(sample_interactions())
+        train, test, users = evaluate.temporal_split(interactions, len(catalog), test_fraction=0.3)
+        self.assertEqual(len(catalog), 12)
+        self.assertGreater(len(users), 0)
+        self.assertEqual(train.multiply(test).nnz, 0)
+
+
+    def test_event_items_are_mapped_through_product_names(self):
+        """Event-log product ids become the catalog rows of their names; unknown ones are dropped"""
+        data = sample_interactions()
+        catalog, _ = evaluate.load_interactions(data)
+        products = pd.DataFrame({'id': [500, 501, 502], 'name': [catalog['Name'][3], catalog['Name'][0].upper(),
+                                                                 'not in the catalog']})
+        tmp = tempfile.mkdtemp()
+        try:
+            log = EventLog(directory=tmp, flush_interval=60)
+            for item in (500, 501, 502, 3):
+                log.log(1, item, 'view')
+            log.close()
+            with self.assertRaises(ValueError):
+                evaluate.load_interactions(data, events=tmp)
+            _, interactions = evaluate.load_interactions(data, events=tmp, products=products)
+        finally:
+            shutil.rmtree(tmp)
+        self.assertEqual(interactions['item'].tolist(), [3, 0])
+
+
+class RunTestCase(unittest.TestCase):
+
+    def test_collaborative_model_beats_popularity(self):
+        reports = {r['model']: r for r in evaluate.run(sample_interactions(), k=3, test_fraction=0.3, workers=2)}
+        self.assertEqual(set(reports), set(evaluate.MODELS))
+        self.assertGreater(reports['itemknn']['recall@3'], reports['popular']['recall@3'])
+        for report in reports.values():
+            self.assertIn('p99_ms', report)
+            self.assertGreaterEqual(report['model_mb'], 0)
+
+    def test_cli_prints_table(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            sample_interactions().to_csv(f, index=False)
+        try:
+            out = io.StringIO()
+            with redirect_stdout(out):
+                evaluate.main(['--data', f.name, '--models', 'popular,content', '-k', '3', '--workers', '1'])
+            self.assertIn('precision@3', out.getvalue())
+            self.assertIn('content', out.getvalue())
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
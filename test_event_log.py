@@ -0,0 +1,72 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from event_log import EventLog, read_events, user_key
+
+
+class EventLogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read_all(self):
+        return np.concatenate(list(read_events(self.tmp)))
+
+    def test_close_flushes_buffered_events(self):
+        log = EventLog(directory=self.tmp, flush_interval=60)
+        for item in range(100):
+            log.log('alice', item, 'view')
+        log.log(7, 3, 'order', 2.0)
+        log.close()
+        records = self.read_all()
+        self.assertEqual(len(records), 101)
+        self.assertEqual(records['item'][:100].tolist(), list(range(100)))
+        self.assertEqual(records['user'][0], user_key('alice'))
+        self.assertEqual((records['user'][-1], records['weight'][-1]), (7, 2.0))
+
+    def test_segments_roll_over_and_read_in_order(self):
+        log = EventLog(directory=self.tmp, flush_interval=60, segment_bytes=64)
+        for batch in range(3):
+            for item in range(10):
+                log.log(1, batch * 10 + item, 'cart')
+            log.flush()
+        log.close()
+        self.assertEqual(len(glob.glob(os.path.join(self.tmp, '*.seg'))), 3)
+        self.assertEqual(self.read_all()['item'].tolist(), list(range(30)))
+
+    def test_full_buffer_drops_oldest(self):
+        log = EventLog(directory=self.tmp, flush_interval=60, buffer_size=5)
+        for item in range(8):
+            log.log(1, item, 'view')
+        log.close()
+        self.assertEqual(log.stats()['dropped'], 3)
+        self.assertEqual(self.read_all()['item'].tolist(), [3, 4, 5, 6, 7])
+
+    def test_reader_ignores_truncated_frame(self):
+        log = EventLog(directory=self.tmp, flush_interval=60)
+        log.log(1, 1, 'view')
+        log.flush()
+        log.log(1, 2, 'view')
+        log.close()
+        [path] = glob.glob(os.path.join(self.tmp, '*.seg'))
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)
+        self.assertEqual(self.read_all()['item'].tolist(), [1])
+
+    def test_disabled_without_directory(self):
+        log = EventLog()
+        log.log(1, 1, 'view')
+        log.close()
+        self.assertEqual(log.stats()['logged'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
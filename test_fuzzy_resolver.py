@@ -0,0 +1,33 @@
+import unittest
+
+from fuzzy_resolver import FuzzyResolver, trigrams
+from test_recommender import sample_catalog
+
+
+class FuzzyResolverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = FuzzyResolver(sample_catalog()['Name'])
+
+    def test_trigrams_are_padded_per_word(self):
+        self.assertEqual(trigrams('Ab'), {' ab', 'ab '})
+        self.assertIn(' li', trigrams('matte lipstick'))
+
+    def test_misspelled_queries(self):
+        self.assertIn(self.resolver.resolve('lipstik'), (2, 3))
+        self.assertIn(self.resolver.resolve('nail polsh'), (0, 1))
+        self.assertEqual(self.resolver.resolve('gilete razer'), 4)
+
+    def test_unrelated_query_is_not_matched(self):
+        self.assertIsNone(self.resolver.resolve('xyzzy'))
+        self.assertIsNone(self.resolver.resolve('   '))
+
+    def test_candidates_are_limited(self):
+        resolver = FuzzyResolver(['nail polish shade %d' % i for i in range(500)], candidates=20)
+        rows = resolver.candidate_rows('nail polsh shade 7')
+        self.assertLessEqual(len(rows), 20)
+        self.assertEqual(resolver.resolve('nail polsh shade 7'), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
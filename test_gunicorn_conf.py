@@ -0,0 +1,52 @@
+import importlib.util
+import os
+import unittest
+from unittest import mock
+
+spec = importlib.util.spec_from_file_location('gunicorn_conf', os.path.join(os.path.dirname(__file__), 'gunicorn.conf.py'))
+gunicorn_conf = importlib.util.module_from_spec(spec)
+with mock.patch.dict(os.environ):
+    spec.loader.exec_module(gunicorn_conf)
+    exported = (os.environ['WEB_CONCURRENCY'], os.environ['GUNICORN_THREADS'])
+
+
+class WorkerSettingsTestCase(unittest.TestCase):
+
+    def test_one_worker_per_cpu_when_memory_allows(self):
+        self.assertEqual(gunicorn_conf.worker_settings(8, 16000), (8, 8))
+
+    def test_memory_budget_caps_workers(self):
+        workers, threads = gunicorn_conf.worker_settings(8, 1500, worker_mb=400)
+        self.assertEqual(workers, 3)
+        # Fewer workers get more threads each, up to the cap
+        self.assertEqual(threads, 16)
+
+    def test_small_machine_keeps_two_workers(self):
+        self.assertEqual(gunicorn_conf.worker_settings(1, None), (2, 4))
+
+    def test_detected_resources_are_sane(self):
+        self.assertGreaterEqual(gunicorn_conf.available_cpus(), 1)
+        budget = gunicorn_conf.memory_budget_mb()
+        self.assertTrue(budget is None or budget > 0)
+        self.assertGreaterEqual(gunicorn_conf.workers, 1)
+        self.assertGreaterEqual(gunicorn_conf.threads, 2)
+
+    def test_sizing_is_exported_for_the_pool(self):
+        """db_routing reads the chosen sizing from the environment"""
+        self.assertEqual(exported, (str(gunicorn_conf.workers), str(gunicorn_conf.threads)))
+
+
+class HooksTestCase(unittest.TestCase):
+
+    def test_workers_create_tables_without_preload(self):
+        """With preload off the master never runs init_db, so each worker does before serving"""
+        with mock.patch.multiple(gunicorn_conf, preload_app=False, warm_up=False, init_db_once=mock.DEFAULT) as hooks:
+            gunicorn_conf.post_worker_init(mock.Mock())
+        hooks['init_db_once'].assert_called_once_with()
+        with mock.patch.multiple(gunicorn_conf, preload_app=True, warm_up=False, init_db_once=mock.DEFAULT) as hooks:
+            gunicorn_conf.post_worker_init(mock.Mock())
+        hooks['init_db_once'].assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from item_filters import ItemFilter, top_category
+from recommender import ContentRecommender, top_k
+from test_recommender import sample_catalog
+
+
+def priced_catalog():
+    return pd.DataFrame({
+        'Category': ['Beauty, Nail', 'Beauty, Hair', 'Home, Kitchen', 'Home, Bath', 'Beauty'],
+        'Price': [5.0, 12.5, 30.0, np.nan, 8.0],
+    })
+
+
+class ItemFilterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filter = ItemFilter.from_catalog(priced_catalog())
+
+    def test_top_category(self):
+        self.assertEqual(top_category(' Beauty, Nail'), 'beauty')
+        self.assertEqual(top_category(float('nan')), '')
+
+    def test_category_mask(self):
+        self.assertEqual(list(np.flatnonzero(self.filter.mask(category='Home'))), [2, 3])
+        self.assertFalse(self.filter.mask(category='toys').any())
+
+    def test_price_mask_drops_unpriced_rows(self):
+        self.assertEqual(list(np.flatnonzero(self.filter.mask(max_price=10))), [0, 4])
+        self.assertEqual(list(np.flatnonzero(self.filter.mask(category='home', min_price=1))), [2])
+
+    def test_availability_applies_to_cached_masks(self):
+        self.filter.mask(category='beauty')
+        self.filter.set_available([1], False)
+        self.assertEqual(list(np.flatnonzero(self.filter.mask(category='beauty'))), [0, 4])
+        self.assertFalse(self.filter.mask()[1])
+
+    def test_set_prices_drops_cached_price_masks(self):
+        self.assertFalse(self.filter.mask(max_price=10)[3])
+        self.filter.set_prices([3], [9.0])
+        self.assertTrue(self.filter.mask(max_price=10)[3])
+
+    def test_masks_handed_out_are_not_changed_by_updates(self):
+        """Scoring threads keep a consistent mask while stock changes"""
+        before = self.filter.mask()
+        self.filter.set_available([0], False)
+        self.filter.load_packed(ItemFilter.from_catalog(priced_catalog()).packed())
+        self.assertTrue(before.all())
+        self.assertFalse(self.filter.mask() is before)
+
+    def test_packed_round_trip(self):
+        self.filter.set_available([0, 3], False)
+        other = ItemFilter.from_catalog(priced_catalog())
+        other.load_packed(self.filter.packed())
+        np.testing.assert_array_equal(other.available, self.filter.available)
+
+
+class MaskedScoringTestCase(unittest.TestCase):
+
+    def test_top_k_skips_masked_rows(self):
+        scores = np.array([0.9, 0.8, 0.7, 0.6, 0.5])
+        mask = np.array([False, True, False, True, True])
+        self.assertEqual(list(top_k(scores, 2, mask=mask)), [1, 3])
+        self.assertEqual(list(top_k(scores, 5, mask=mask)), [1, 3, 4])
+
+    def test_filtered_list_stays_full(self):
+        engine = ContentRecommender(sample_catalog())
+        mask = np.ones(len(sample_catalog()), dtype=bool)
+        mask[3] = False
+        ids, _ = engine.similar(2, top_n=2, mask=mask)
+        self.assertNotIn(3, ids)
+        self.assertEqual(len(ids), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from memory_store import MemoryStore
+
+HEADPHONES = {'id': 1, 'name': 'Wireless Headphones', 'price': 100.0}
+SHOES = {'id': 3, 'name': 'Running Shoes', 'price': 50.0}
+
+
+class MemoryStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStore()
+
+    def test_usernames_are_unique(self):
+        user_id = self.store.add_user('alice', email='a@example.com', password='pw')
+        self.assertIsNone(self.store.add_user('alice', email='other@example.com', password='x'))
+        self.assertEqual(self.store.user_id('alice'), user_id)
+        self.assertEqual(self.store.user(user_id)['email'], 'a@example.com')
+        self.assertIsNone(self.store.user_id('bob'))
+        self.assertIsNone(self.store.user(user_id + 1))
+
+    def test_cart_merges_quantities_and_keeps_order(self):
+        self.assertEqual(self.store.add_to_cart(7, SHOES), 1)
+        self.assertEqual(self.store.add_to_cart(7, HEADPHONES), 1)
+        self.assertEqual(self.store.add_to_cart(7, SHOES, 2), 3)
+        self.assertEqual([(i['id'], i['quantity']) for i in self.store.cart(7)], [(3, 3), (1, 1)])
+        self.assertEqual(self.store.cart_count(7), 2)
+        self.assertTrue(self.store.remove_from_cart(7, 3))
+        self.assertFalse(self.store.remove_from_cart(7, 3))
+        self.assertEqual(self.store.cart(8), [])
+
+    def test_cart_returns_copies(self):
+        self.store.add_to_cart(7, SHOES)
+        self.store.cart(7)[0]['quantity'] = 99
+        self.assertEqual(self.store.cart(7)[0]['quantity'], 1)
+        self.assertNotIn('quantity', SHOES)
+
+    def test_wishlist_membership(self):
+        self.assertTrue(self.store.add_to_wishlist(7, SHOES))
+        self.assertFalse(self.store.add_to_wishlist(7, SHOES))
+        self.assertTrue(self.store.in_wishlist(7, 3))
+        self.assertFalse(self.store.in_wishlist(8, 3))
+        self.assertEqual(self.store.wishlist(7), [SHOES])
+
+    def test_place_order_empties_cart(self):
+        self.assertIsNone(self.store.place_order(7))
+        self.store.add_to_cart(7, HEADPHONES, 2)
+        self.store.add_to_cart(7, SHOES)
+        order = self.store.place_order(7)
+        self.assertEqual(order['id'], 1000)
+        self.assertEqual(order['total'], 250.0)
+        self.assertEqual(self.store.cart(7), [])
+        self.assertIs(self.store.order(7, 1000), order)
+        self.assertIsNone(self.store.order(8, 1000))
+        self.assertEqual(self.store.orders(7), [order])
+
+    def test_concurrent_updates_lose_nothing(self):
+        def shop(user_id):
+            for _ in range(200):
+                self.store.add_to_cart(user_id % 3, SHOES)
+            self.store.next_id('user')
+
+        threads = [threading.Thread(target=shop, args=(i,)) for i in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([self.store.cart(u)[0]['quantity'] for u in range(3)], [800, 800, 800])
+        self.assertEqual(self.store.next_id('user'), 13)
+
+    def test_concurrent_orders_get_unique_ids(self):
+        ids = []
+
+        def buy(user_id):
+            for _ in range(50):
+                self.store.add_to_cart(user_id, SHOES)
+                order = self.store.place_order(user_id)
+                if order:
+                    ids.append(order['id'])
+
+        threads = [threading.Thread(target=buy, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(ids), 400)
+        self.assertEqual(len(set(ids)), 400)
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'store.pickle')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_snapshot_round_trip(self):
+        store = MemoryStore(snapshot_path=self.path, snapshot_interval=3600)
+        alice = store.add_user('alice', email='a@example.com', password='pw')
+        store.add_to_cart('alice', SHOES)
+        store.add_to_wishlist('alice', HEADPHONES)
+        store.add_to_cart('bob', HEADPHONES)
+        order = store.place_order('bob')
+        self.assertTrue(store.save())
+        self.assertFalse(store.save())
+
+        restored = MemoryStore(snapshot_path=self.path, snapshot_interval=3600)
+        self.assertEqual(restored.user(alice), store.user(alice))
+        self.assertEqual(restored.user_id('alice'), alice)
+        self.assertIsNone(restored.add_user('alice', password='x'))
+        self.assertEqual(restored.add_user('carol', password='x'), alice + 1)
+        self.assertEqual(restored.cart('alice'), store.cart('alice'))
+        self.assertTrue(restored.in_wishlist('alice', 1))
+        self.assertEqual(restored.order('bob', order['id']), order)
+        restored.add_to_cart('bob', SHOES)
+        self.assertEqual(restored.place_order('bob')['id'], order['id'] + 1)
+        self.assertTrue(restored.save())
+
+
+if __name__ == '__main__':
+    unittest.main()
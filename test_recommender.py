@@ -0,0 +1,180 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from recommender import (ContentRecommender, LSARecommender, ShardedRecommender, make_recommender, normalize_query,
+                         top_k)
+
+
+def sample_catalog():
+    return pd.DataFrame({
+        'Name': ['OPI Infinite Shine Nail Polish', 'OPI Nail Lacquer', 'Matte Lipstick Hot Berry',
+                 'Matte Lipstick Firecracker', 'Gillette Razor Blades', 'Garden Mint Room Spray'],
+        'Tags': ['opi, nail, polish, lacquer', 'opi, nail, lacquer, polish', 'lipstick, matte, lip, berry',
+                 'lipstick, matte, lip, red', 'razor, blades, shave', 'room, spray, mint'],
+        'Brand': ['opi', 'opi', 'kokie', 'kokie', 'gillette', 'garden'],
+    })
+
+
+class ContentRecommenderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = ContentRecommender(sample_catalog())
+
+    def test_normalize_query(self):
+        """Case and whitespace variants normalise to one key"""
+        self.assertEqual(normalize_query('Lipstick'), normalize_query('  LIPSTICK '))
+        self.assertEqual(normalize_query('nail   polish'), 'nail polish')
+
+    def test_resolve(self):
+        """Queries resolve to the first matching row, misses to None"""
+        self.assertEqual(self.engine.resolve('lipstick '), 2)
+        self.assertEqual(self.engine.resolve('OPI'), 0)
+        self.assertIsNone(self.engine.resolve('toaster'))
+        self.assertIsNone(self.engine.resolve('(['))
+
+    def test_names_match_exactly_before_substrings(self):
+        """A full product name wins over an earlier row that merely contains it"""
+        engine = ContentRecommender(pd.DataFrame({'Name': ['Herbal Shampoo Deluxe', 'Shampoo'],
+                                                  'Tags': ['shampoo, herbal', 'shampoo']}))
+        self.assertEqual(engine.resolve('shampoo'), 1)
+        self.assertEqual(engine.row_for_name(' SHAMPOO '), 1)
+        self.assertIsNone(engine.row_for_name('Herbal Shampoo'))
+        self.assertEqual(engine.resolve('herbal shampoo'), 0)
+
+    def test_similar_returns_compact_arrays(self):
+        """Results are int32 ids and float32 scores, excluding the query item"""
+        ids, scores = self.engine.similar(2, top_n=3)
+        self.assertEqual(ids.dtype, np.int32)
+        self.assertEqual(scores.dtype, np.float32)
+        self.assertNotIn(2, ids)
+        self.assertEqual(ids[0], 3)
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_similar_to_many_excludes_history(self):
+        """Profile recommendations never repeat the items they were built from"""
+        ids, scores = self.engine.similar_to_many([0, 2], [2.0, 1.0], top_n=10)
+        self.assertEqual(len(ids), 4)
+        self.assertNotIn(0, ids)
+        self.assertNotIn(2, ids)
+        self.assertIn(ids[0], (1, 3))
+
+    def test_hydrate(self):
+        """Ids hydrate back to catalog rows in order"""
+        rows = self.engine.hydrate(np.array([3, 0], dtype=np.int32))
+        self.assertEqual(list(rows['Brand']), ['kokie', 'opi'])
+
+    def test_similar_batch_matches_similar(self):
+        batch = self.engine.similar_batch([0, 2], top_n=3)
+        for row, (ids, scores) in zip([0, 2], batch):
+            expected_ids, expected_scores = self.engine.similar(row, top_n=3)
+            self.assertEqual(list(ids), list(expected_ids))
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+    def test_top_k(self):
+        scores = np.array([0.1, 0.9, 0.5, 0.7])
+        self.assertEqual(list(top_k(scores, 2)), [1, 3])
+        self.assertEqual(list(top_k(scores, 2, exclude=1)), [3, 2])
+
+
+class LSARecommenderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_embeddings_are_normalised_float32(self):
+        engine = LSARecommender(sample_catalog(), n_components=4)
+        self.assertEqual(engine.embeddings.dtype, np.float32)
+        self.assertTrue(engine.embeddings.flags['C_CONTIGUOUS'])
+        np.testing.assert_allclose(np.linalg.norm(engine.embeddings, axis=1), 1.0, rtol=1e-5)
+        self.assertIsNone(engine.matrix)
+
+    def test_similar_finds_the_same_neighbours(self):
+        engine = LSARecommender(sample_catalog(), n_components=4)
+        self.assertEqual(engine.similar(2, top_n=1)[0][0], 3)
+        self.assertEqual(engine.similar(0, top_n=1)[0][0], 1)
+        ids, _ = engine.similar_to_many([0, 2], top_n=10)
+        self.assertNotIn(0, ids)
+        self.assertNotIn(2, ids)
+        self.assertEqual([ids for ids, _ in engine.similar_batch([2], top_n=1)][0][0], 3)
+
+    def test_embeddings_are_memory_mapped_on_reload(self):
+        path = os.path.join(self.tmp, 'lsa.npy')
+        first = LSARecommender(sample_catalog(), n_components=4, embeddings_path=path)
+        second = LSARecommender(sample_catalog(), n_components=4, embeddings_path=path)
+        self.assertIsInstance(second.embeddings, np.memmap)
+        np.testing.assert_array_equal(first.embeddings, second.embeddings)
+
+    def test_reload_skips_the_tfidf_fit(self):
+        """Saved embeddings are all a restart needs; the TF-IDF is not refitted"""
+        path = os.path.join(self.tmp, 'lsa.npy')
+        LSARecommender(sample_catalog(), n_components=4, embeddings_path=path)
+        with mock.patch.object(LSARecommender, 'fit', side_effect=AssertionError('refitted')):
+            engine = LSARecommender(sample_catalog(), n_components=4, embeddings_path=path)
+        self.assertIsNone(engine.vectorizer)
+        self.assertFalse(engine.empty)
+        self.assertEqual(engine.similar(2, top_n=1)[0][0], 3)
+        self.assertEqual(engine.row_for_name(engine.names[2]), 2)
+
+    def test_make_recommender_selects_backend(self):
+        self.assertIsInstance(make_recommender(sample_catalog(), 'lsa', n_components=4), LSARecommender)
+        self.assertNotIsInstance(make_recommender(sample_catalog()), LSARecommender)
+        with self.assertRaises(ValueError):
+            make_recommender(sample_catalog(), 'bogus')
+
+
+def categorised_catalog():
+    data = sample_catalog()
+    data['Category'] = ['Beauty, Nail', 'Beauty, Nail', 'Makeup, Lip', 'Makeup, Lip', 'Personal Care', 'Home']
+    return data
+
+
+class ShardedRecommenderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.exact = ContentRecommender(categorised_catalog())
+
+    def test_all_shards_match_the_unsharded_index(self):
+        engine = ShardedRecommender(categorised_catalog(), fanout=None)
+        self.assertEqual(sorted(s.name for s in engine.shards), ['beauty', 'home', 'makeup', 'personal care'])
+        for row in range(6):
+            ids, scores = engine.similar(row, top_n=5)
+            expected_ids, expected_scores = self.exact.similar(row, top_n=5)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+            self.assertEqual(set(ids[scores > 0]), set(expected_ids[expected_scores > 0]))
+        ids, _ = engine.similar_to_many([0, 2], [2.0, 1.0], top_n=10)
+        self.assertEqual(set(ids), {1, 3, 4, 5})
+
+    def test_fanout_limits_the_shards_searched(self):
+        engine = ShardedRecommender(categorised_catalog(), fanout=1)
+        ids, _ = engine.similar(2, top_n=5)
+        self.assertEqual(list(ids), [3])
+        mask = np.ones(6, dtype=bool)
+        mask[3] = False
+        self.assertEqual(len(engine.similar(2, top_n=5, mask=mask)[0]), 0)
+
+    def test_parallel_hash_shards(self):
+        engine = ShardedRecommender(categorised_catalog(), shard_by='hash', n_shards=3, workers=2, parallel_rows=0)
+        self.assertEqual(len(engine.shards), 3)
+        ids, scores = engine.similar(2, top_n=1)
+        self.assertEqual(list(ids), [3])
+        self.assertEqual([list(ids) for ids, _ in engine.similar_batch([0, 2], top_n=1)], [[1], [3]])
+
+    def test_rebuild_shard(self):
+        engine = ShardedRecommender(categorised_catalog(), fanout=None)
+        engine.data.loc[3, 'Tags'] = 'razor, blades, shave'
+        engine.rebuild_shard('makeup')
+        self.assertEqual(engine.similar(4, top_n=1)[0][0], 3)
+        self.assertIsInstance(make_recommender(categorised_catalog(), 'sharded'), ShardedRecommender)
+
+
+if __name__ == '__main__':
+    unittest.main()
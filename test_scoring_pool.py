@@ -0,0 +1,52 @@
+import os
+import threading
+import unittest
+
+from scoring_pool import ScoringPool, PoolSaturated, DeadlineExceeded
+
+
+class ScoringPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ScoringPool(max_workers=1, max_pending=1, deadline=0.5)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_run_returns_result(self):
+        self.assertEqual(self.pool.run(sum, [1, 2, 3]), 6)
+        self.assertEqual(self.pool.stats()['submitted'], 1)
+
+    def test_rejects_when_full(self):
+        """Jobs beyond max_pending fail fast instead of queueing"""
+        gate = threading.Event()
+        future = self.pool.submit(gate.wait)
+        with self.assertRaises(PoolSaturated):
+            self.pool.submit(sum, [1])
+        gate.set()
+        future.result(timeout=1)
+        self.assertEqual(self.pool.stats()['rejected'], 1)
+
+    def test_deadline(self):
+        """Slow jobs raise DeadlineExceeded once their deadline passes"""
+        gate = threading.Event()
+        with self.assertRaises(DeadlineExceeded):
+            self.pool.run(gate.wait, deadline=0.05)
+        gate.set()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_forked_child_gets_its_own_threads(self):
+        """A pool used before fork still runs jobs in the child"""
+        self.assertEqual(self.pool.run(sum, [1]), 1)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os._exit(0 if self.pool.run(sum, [2, 3], deadline=2) == 5 else 1)
+            except BaseException:
+                os._exit(2)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from multiprocessing import Process
+from unittest import mock
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from shm_ratelimit import SharedMemoryStorage
+
+
+def _hit_many(uri, key, n):
+    storage = storage_from_string(uri)
+    for _ in range(n):
+        storage.incr(key, 60)
+
+
+class SharedMemoryStorageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.uri = 'shm://%s?buckets=8&ways=2' % os.path.join(self.tmp, 'limits')
+        self.storage = storage_from_string(self.uri)
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.tmp)
+
+    def test_registered_scheme(self):
+        self.assertIsInstance(self.storage, SharedMemoryStorage)
+        self.assertTrue(self.storage.check())
+
+    def test_limit_is_shared_across_processes(self):
+        """Counts from other worker processes land in the same table"""
+        workers = [Process(target=_hit_many, args=(self.uri, 'ip/1', 5)) for _ in range(3)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+        self.assertEqual(self.storage.get('ip/1'), 15)
+
+    def test_fixed_window_strategy_enforces_limit(self):
+        limiter = FixedWindowRateLimiter(self.storage)
+        limit = parse('3/minute')
+        self.assertEqual([limiter.hit(limit, 'client') for _ in range(4)], [True, True, True, False])
+        self.storage.clear(limit.key_for('client'))
+        self.assertTrue(limiter.hit(limit, 'client'))
+
+    def test_sliding_estimate_decays_previous_window(self):
+        """Half-way into the next window, half of the previous count still applies"""
+        with mock.patch('shm_ratelimit.time.time', return_value=600.0):
+            for _ in range(10):
+                self.storage.incr('k', 60)
+        with mock.patch('shm_ratelimit.time.time', return_value=690.0):
+            self.assertEqual(self.storage.get('k'), 5)
+            self.assertEqual(self.storage.incr('k', 60), 6)
+        with mock.patch('shm_ratelimit.time.time', return_value=900.0):
+            self.assertEqual(self.storage.get('k'), 0)
+
+    def test_table_is_bounded(self):
+        """More keys than slots recycle old slots instead of growing"""
+        size = os.path.getsize(os.path.join(self.tmp, 'limits'))
+        for i in range(200):
+            self.storage.incr('key-%d' % i, 60)
+        self.assertEqual(os.path.getsize(os.path.join(self.tmp, 'limits')), size)
+        self.assertEqual(self.storage.get('key-199'), 1)
+
+    def test_key_in_later_way_survives_a_freed_earlier_way(self):
+        """Clearing a key ahead of another in its bucket must not restart the other's count"""
+        path = os.path.join(self.tmp, 'one-bucket')
+        storage = SharedMemoryStorage('shm://%s?buckets=1&ways=2' % path)
+        self.addCleanup(storage.close)
+        storage.incr('a', 60)
+        for _ in range(10):
+            storage.incr('b', 60)
+        storage.clear('a')
+        self.assertEqual(storage.incr('b', 60), 11)
+        self.assertEqual(storage.incr('a', 60), 1)
+        self.assertEqual(storage.get('b'), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from recommender import LSARecommender
+from test_recommender import sample_catalog
+from vector_store import QuantizedVectorStore, quantize
+
+
+def random_vectors(n=2000, d=128, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, d)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class QuantizeTestCase(unittest.TestCase):
+
+    def test_round_trip_error_is_within_half_a_step(self):
+        vectors = random_vectors(100)
+        codes, scales = quantize(vectors)
+        self.assertEqual(codes.dtype, np.int8)
+        error = np.abs(codes * scales[:, None] - vectors)
+        self.assertTrue(np.all(error <= scales[:, None] / 2 + 1e-7))
+
+    def test_zero_vector(self):
+        codes, scales = quantize(np.zeros((1, 4)))
+        self.assertFalse(codes.any())
+        self.assertTrue(np.isfinite(scales).all())
+
+
+class QuantizedVectorStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.vectors = random_vectors()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_top_k_matches_exact_search(self):
+        store = QuantizedVectorStore.from_vectors(self.vectors)
+        agreement = []
+        for row in range(50):
+            exact = np.argsort(-(self.vectors @ self.vectors[row]), kind='stable')
+            exact = [i for i in exact if i != row][:10]
+            ids, scores = store.search(self.vectors[row], k=10, exclude=row)
+            agreement.append(len(set(exact) & set(ids.tolist())) / 10)
+            np.testing.assert_allclose(scores, self.vectors[ids] @ self.vectors[row], rtol=1e-5)
+        self.assertGreaterEqual(np.mean(agreement), 0.95)
+
+    def test_resident_memory_is_a_quarter(self):
+        store = QuantizedVectorStore.from_vectors(self.vectors, full_path=os.path.join(self.tmp, 'full.npy'))
+        self.assertGreaterEqual(self.vectors.nbytes / store.nbytes, 3.8)
+
+    def test_full_vectors_are_memory_mapped_lazily(self):
+        path = os.path.join(self.tmp, 'full.npy')
+        store = QuantizedVectorStore.from_vectors(self.vectors, full_path=path)
+        self.assertIsNone(store._full)
+        store.search(self.vectors[0], k=5)
+        self.assertIsInstance(store.full, np.memmap)
+
+    def test_full_vectors_are_never_held_in_memory(self):
+        """Without full_path the float32 copy still goes to a (temporary) memory-mapped file"""
+        store = QuantizedVectorStore.from_vectors(self.vectors)
+        self.assertIsInstance(store.full, np.memmap)
+        np.testing.assert_array_equal(store.full[7], self.vectors[7])
+
+    def test_batch_matches_single_queries(self):
+        store = QuantizedVectorStore.from_vectors(self.vectors)
+        batch = store.search_batch(self.vectors[:3], k=5, excludes=[0, 1, 2])
+        for row, (ids, _) in enumerate(batch):
+            self.assertEqual(list(ids), list(store.search(self.vectors[row], k=5, exclude=row)[0]))
+            self.assertNotIn(row, ids)
+
+
+class QuantizedLSATestCase(unittest.TestCase):
+
+    def test_quantized_recommender_finds_the_same_neighbours(self):
+        engine = LSARecommender(sample_catalog(), n_components=4, quantize=True)
+        self.assertIsNotNone(engine.store)
+        self.assertIsInstance(engine.embeddings, np.memmap)
+        self.assertEqual(engine.similar(2, top_n=1)[0][0], 3)
+        ids, _ = engine.similar_to_many([0, 2], top_n=10)
+        self.assertNotIn(0, ids)
+        self.assertNotIn(2, ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
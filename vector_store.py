@@ -0,0 +1,140 @@
+"""
+Int8-quantised item vectors with exact re-ranking.
+
+Each vector is stored as int8 codes plus one float32 scale
+(``v ~= codes * scale``), a quarter of the float32 size. A search scores
+every item against the quantised query, then re-ranks the best
+``candidates`` with the full-precision vectors. Those always live in a
+memory-mapped ``.npy`` file (``full_path``, or an unlinked temporary file)
+and only the re-ranked rows are paged in, so the codes are all that stays
+resident.
+
+The first pass upcasts L2-sized blocks of codes to float32 and uses BLAS.
+NumPy has no fast int8 matmul, and an int8 x int8 dot over up to 1024
+dimensions is below 2**24, so the float32 result is the exact integer dot
+product. Reading a quarter of the bytes from memory is what makes the scan
+faster than a float32 matrix-vector product over the same items.
+"""
+
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from recommender import top_k
+
+# float32 staging block per scan step; small enough to stay in L2 between the copy and the dot
+BLOCK_BYTES = 768 * 1024
+# Rows quantised at a time when building, bounding the float32 temporaries
+QUANTIZE_ROWS = 65536
+
+
+def quantize(vectors):
+    """(int8 codes, float32 scales) with one symmetric scale per row"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedVectorStore:
+    """Int8 scan plus float32 re-rank over a fixed set of vectors"""
+
+    def __init__(self, codes, scales, full=None, full_path=None, oversample=10):
+        self.codes = codes
+        self.scales = scales
+        self.oversample = oversample
+        self._full = full
+        self._full_path = full_path
+        self._local = threading.local()
+
+    @classmethod
+    def from_vectors(cls, vectors, full_path=None, oversample=10):
+        """Quantise ``vectors`` and keep the float32 copy on disk, memory-mapped
+
+        ``full_path`` is written unless it already exists; without it the
+        vectors go to a temporary file that is unlinked once mapped.
+        """
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        scales = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), QUANTIZE_ROWS):
+            codes[start:start + QUANTIZE_ROWS], scales[start:start + QUANTIZE_ROWS] = \
+                quantize(vectors[start:start + QUANTIZE_ROWS])
+        if full_path is not None:
+            if not os.path.exists(full_path):
+                tmp = '%s.%d.tmp' % (full_path, os.getpid())
+                with open(tmp, 'wb') as f:
+                    np.save(f, np.asarray(vectors, dtype=np.float32))
+                os.replace(tmp, full_path)
+            return cls(codes, scales, full_path=full_path, oversample=oversample)
+        fd, path = tempfile.mkstemp(suffix='.npy')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(vectors, dtype=np.float32))
+            full = np.load(path, mmap_mode='r')
+        finally:
+            # The mapping keeps the data reachable; the file goes away with the process
+            os.unlink(path)
+        return cls(codes, scales, full=full, oversample=oversample)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def full(self):
+        if self._full is None:
+            self._full = np.load(self._full_path, mmap_mode='r')
+        return self._full
+
+    @property
+    def nbytes(self):
+        """Resident bytes: codes and scales only, not the memory-mapped vectors"""
+        return self.codes.nbytes + self.scales.nbytes
+
+    def approximate_scores(self, queries):
+        """(n_queries, n_items) scores from the int8 codes"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        query_codes, query_scales = quantize(queries)
+        weights = query_codes.astype(np.float32)
+        out = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        # One staging block per thread; the scoring pool searches concurrently
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            rows = max(64, BLOCK_BYTES // (4 * self.codes.shape[1]))
+            buffer = self._local.buffer = np.empty((rows, self.codes.shape[1]), dtype=np.float32)
+        single = len(queries) == 1
+        for start in range(0, len(self.codes), len(buffer)):
+            block = self.codes[start:start + len(buffer)]
+            staged = buffer[:len(block)]
+            np.copyto(staged, block, casting='unsafe')
+            if single:
+                np.dot(staged, weights[0], out=out[0, start:start + len(block)])
+            else:
+                out[:, start:start + len(block)] = weights @ staged.T
+        out *= self.scales[None, :]
+        out *= query_scales[:, None]
+        return out
+
+    def _rerank(self, query, approx, k, exclude, mask):
+        candidates = top_k(approx, k * self.oversample, exclude=exclude, mask=mask)
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+        # Sorted row order keeps the memory-mapped reads sequential
+        candidates = np.sort(candidates)
+        exact = self.full[candidates] @ query
+        best = top_k(exact, k)
+        return candidates[best], exact[best].astype(np.float32)
+
+    def search(self, query, k=10, exclude=None, mask=None):
+        """Ids and exact scores of the ``k`` best allowed items for one query vector"""
+        query = np.asarray(query, dtype=np.float32)
+        return self._rerank(query, self.approximate_scores(query)[0], k, exclude, mask)
+
+    def search_batch(self, queries, k=10, excludes=None, mask=None):
+        """``search`` for several queries sharing one pass over the codes"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        approx = self.approximate_scores(queries)
+        excludes = excludes if excludes is not None else [None] * len(queries)
+        return [self._rerank(q, approx[i], k, ex, mask) for i, (q, ex) in enumerate(zip(queries, excludes))]